@@ -2,3 +2,14 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from .models import API_Model
+        from .serializers import build_serializer_plans
+        from .registry import build_model_registry
+        from . import signals
+
+        model_types = [model for model in self.get_models() if issubclass(model, API_Model)]
+
+        build_model_registry(model_types)
+        build_serializer_plans(model_types)
@@ -0,0 +1,174 @@
+from .executor import run_blocking
+from io import BytesIO
+import asyncio, sys
+
+_finished = object()
+
+class ASGI_Handler:
+    ''' ASGI 3 application serving the project. The event loop only reads request bodies and sends
+        responses; every request is run through the full WSGI handler and middleware stack (host
+        validation, CSRF, profiling, ...) on the bounded blocking thread pool, so a slow query or
+        template read never ties up the event loop and at most API_BLOCKING_THREADS requests touch the
+        database at once. Streamed responses are pulled chunk by chunk on the same pool.
+
+        Django 2.2 middleware is synchronous (and the profiler records the queries of the thread it
+        runs on), so the middleware and the view run together on one pool thread. Serving the project
+        over ASGI therefore brings no more concurrency than a threaded WSGI server with
+        API_BLOCKING_THREADS threads: one request (or open stream) still holds one thread throughout.
+
+        While a response is sent the handler listens for the client disconnecting: it stops pulling
+        chunks and calls the callbacks views register in environ['api.disconnect_callbacks'] (e.g. to
+        end a change feed stream waiting for changes, see change_feed.Change_Stream).
+
+        * @wsgi_application is the project's WSGI application (get_wsgi_application()) *
+    '''
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope: dict, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+
+        environ = self.environ(scope, await self.read_body(receive))
+
+        await self.send_wsgi_response(environ, send, receive)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive) -> bytes:
+        body = []
+
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+
+            body.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+
+        return b''.join(body)
+
+    @staticmethod
+    def environ(scope: dict, body: bytes) -> dict:
+        ''' Build the WSGI environ of an ASGI HTTP request.
+
+            --> scope : The ASGI connection scope.
+
+            --> body : The request body.
+
+            <-- The WSGI environ dictionary.
+        '''
+
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'REMOTE_ADDR': str(client[0]),
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'api.disconnect_callbacks': [],
+        }
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = 'HTTP_' + name
+
+            # Repeated headers are joined into one (cookies with their own separator)
+            if name in environ and name.startswith('HTTP_'):
+                value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+
+            environ[name] = value
+
+        return environ
+
+    async def send_wsgi_response(self, environ: dict, send, receive):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+        body = await run_blocking(self.wsgi_application, environ, start_response)
+
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            await self.send_chunks(iter(body), send, receive, environ['api.disconnect_callbacks'])
+
+        finally:
+            if hasattr(body, 'close'):
+                await run_blocking(body.close)
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send_chunks(self, chunks, send, receive, disconnect_callbacks: list):
+        ''' Send the chunks of a response body until they run out or the client disconnects.
+
+            --> chunks : An iterator of the body's chunks (pulled on the blocking thread pool).
+
+            --> send : The ASGI send callable.
+
+            --> receive : The ASGI receive callable (the request body was already read).
+
+            --> disconnect_callbacks : Functions called on the event loop if the client disconnects.
+        '''
+
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+
+        try:
+            while True:
+                chunk = asyncio.ensure_future(run_blocking(next, chunks, _finished))
+                await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+
+                if disconnected.done():
+                    for callback in disconnect_callbacks:
+                        callback()
+
+                    # The body is closed once the pool thread is done with it
+                    await asyncio.gather(chunk, return_exceptions=True)
+                    return
+
+                chunk = chunk.result()
+                if chunk is _finished:
+                    break
+
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+            await send({'type': 'http.response.body', 'body': b''})
+
+        finally:
+            disconnected.cancel()
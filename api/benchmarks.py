@@ -0,0 +1,90 @@
+from django.test.utils import setup_databases, teardown_databases
+from django.db import connections
+from contextlib import contextmanager
+from .models import Category, Project, Widget
+import statistics, time
+
+WIDGET_NAMES = ['header', 'sidebar', 'page', 'footer']
+
+@contextmanager
+def benchmark_database(name: str = None):
+    ''' Run a benchmark against throwaway test databases (created like the test runner's) so
+        the real database is never seeded or written to.
+
+        --> name : The file to create the default test database in. Optional - SQLite test databases
+                   are created in memory by default (use a file to benchmark concurrent writes).
+    '''
+
+    test_settings = connections['default'].settings_dict['TEST']
+    test_name = test_settings.get('NAME')
+
+    if name is not None:
+        test_settings['NAME'] = name
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+
+    try:
+        yield
+
+    finally:
+        # Mirrors (e.g. the read alias) would otherwise keep their connections to this test database
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        test_settings['NAME'] = test_name
+
+
+def seed_models(categories: int = 0, projects: int = 0, widgets: int = 0):
+    ''' Seed the database with API models to benchmark against.
+
+        --> categories : The number of Category models to create.
+
+        --> projects : The number of Project models to create (spread over the categories).
+
+        --> widgets : The number of Widget models to create (cycling through the bundled widget templates).
+    '''
+
+    for index in range(categories):
+        Category.objects.create(name='Category {}'.format(index), icon='icon_{}'.format(index % 50))
+
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    for index in range(projects):
+        Project.objects.create(project_category_id=category_ids[index % len(category_ids)])
+
+    for index in range(widgets):
+        Widget.objects.create(name=WIDGET_NAMES[index % len(WIDGET_NAMES)])
+
+
+def time_call(function, repeat: int = 5) -> dict:
+    ''' Time repeated calls to a function.
+
+        --> function : The function to call (with no arguments).
+
+        --> repeat : The number of times to call it.
+
+        <-- The fastest, median and mean call times in milliseconds.
+    '''
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {'min': min(timings), 'median': statistics.median(timings), 'mean': statistics.mean(timings)}
+
+
+def latency_percentiles(timings: list, percentiles: tuple = (50, 90, 99)) -> dict:
+    ''' Summarize request latencies.
+
+        --> timings : The latencies in milliseconds.
+
+        --> percentiles : The percentiles to report.
+
+        <-- The requested percentiles ({ 'p<<percentile>>': <<milliseconds>> }) and the maximum latency.
+    '''
+
+    timings = sorted(timings)
+    summary = {'p{}'.format(percentile): timings[min(len(timings) - 1, int(len(timings) * percentile / 100))] for percentile in percentiles}
+    summary['max'] = timings[-1]
+
+    return summary
@@ -0,0 +1,139 @@
+from django.conf import settings
+from .utilities import accepted_encodings, brotli
+import gzip, hashlib, os, threading, time
+
+# Formats a widget bundle is served in (/api/bundle/?format=<<format>>). Widget templates are not
+# bundled, they reach the page with the widget models' batch request (see js/libraries/batching.js)
+BUNDLE_FORMATS = {
+    'css': 'text/css; charset=utf-8',
+}
+
+class Bundle_Payload:
+    ''' One format of a widget bundle, compressed once when the bundle is built.
+
+        * @content is the uncompressed payload, @encodings maps each content coding (gzip, br) to the compressed payload *
+    '''
+
+    def __init__(self, content: bytes, content_type: str):
+        self.content = content
+        self.content_type = content_type
+
+        self.encodings = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(content, quality=11)
+
+    def encode(self, accept_encoding: str) -> tuple:
+        ''' Pick the smallest encoding of the payload the client accepts.
+
+            --> accept_encoding : The Accept-Encoding header sent with the request.
+
+            <-- The content coding (None if uncompressed) and the encoded payload.
+        '''
+
+        accepted = accepted_encodings(accept_encoding)
+        encodings = [(len(body), coding, body) for coding, body in self.encodings.items() if coding in accepted]
+
+        if not encodings:
+            return None, self.content
+
+        _, coding, body = min(encodings)
+
+        return coding, body
+
+
+class Widget_Bundle:
+    ''' Every widget style sheet (.css) in a directory concatenated into one versioned CSS payload. The
+        bundle is built on first use, precompressed (gzip and, if installed, brotli) and only rebuilt when
+        a style sheet is added, removed or modified. The directory is re-scanned at most once every
+        @check_interval seconds.
+
+        * @directory is the widget directory (e.g. <<STATIC_ROOT>>/widgets) *
+        * The bundle's version is the content hash of its sources *
+    '''
+
+    def __init__(self, directory: str, check_interval: float = 1.0):
+        self.directory = directory
+        self.check_interval = check_interval
+
+        self.version = None
+        self.payloads = {}
+        self.builds = 0
+
+        self._signature = None
+        self._last_checked = None
+        self._lock = threading.Lock()
+
+    def current(self) -> 'Widget_Bundle':
+        ''' Ensure the bundle is built from the current source files.
+
+            <-- The bundle.
+        '''
+
+        now = time.monotonic()
+        if self._last_checked is not None and now - self._last_checked < self.check_interval:
+            return self
+
+        with self._lock:
+            signature = self._scan()
+            if signature != self._signature:
+                self._build(signature)
+
+            self._last_checked = now
+
+        return self
+
+    def _scan(self) -> tuple:
+        signature = []
+
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.css'):
+                    stat = entry.stat()
+                    signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            pass
+
+        return tuple(sorted(signature))
+
+    def _build(self, signature: tuple):
+        styles = []
+
+        for name, _, _ in signature:
+            with open(os.path.join(self.directory, name), encoding='utf-8') as source:
+                styles.append('/* {} */\n{}'.format(name, source.read()))
+
+        styles = '\n'.join(styles).encode('utf-8')
+        version = hashlib.sha256(styles).hexdigest()[:16]
+
+        self.payloads = {
+            'css': Bundle_Payload(styles, BUNDLE_FORMATS['css']),
+        }
+        self.version = version
+        self.builds += 1
+
+        self._signature = signature
+
+    def stats(self) -> dict:
+        return {
+            'version': self.version,
+            'builds': self.builds,
+            'bytes': {name: {'identity': len(payload.content), **{coding: len(body) for coding, body in payload.encodings.items()}} for name, payload in self.payloads.items()},
+        }
+
+
+_bundles = {}
+
+def widget_bundle() -> Widget_Bundle:
+    ''' Fetch the (current) bundle of the widgets in <<STATIC_ROOT>>/widgets.
+
+        <-- The widget bundle.
+    '''
+
+    directory = os.path.join(settings.STATIC_ROOT, 'widgets')
+
+    bundle = _bundles.get(directory)
+    if bundle is None:
+        bundle = _bundles.setdefault(directory, Widget_Bundle(directory, getattr(settings, 'API_TEMPLATE_CACHE_CHECK_INTERVAL', 1.0)))
+
+    return bundle.current()
+
@@ -0,0 +1,340 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from collections import OrderedDict
+import hashlib, json, os, shutil, tempfile, threading, time, uuid
+
+class Local_Memory_Backend:
+    ''' Response cache backend holding entries in this process's memory (LRU, size bounded). Writes
+        handled by other worker processes do not invalidate its entries (see load_response_cache()).
+    '''
+
+    # Entries are only invalidated by this process's writes
+    per_process = True
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # (model, generation, key) -> (expires, value)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, model_name: str) -> str:
+        return self._generations.get(model_name, '0')
+
+    def bump(self, model_name: str):
+        with self._lock:
+            self._generations[model_name] = str(int(self.generation(model_name)) + 1)
+
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == model_name]:
+                del self._entries[entry_key]
+
+    def get(self, model_name: str, generation: str, key: str):
+        with self._lock:
+            entry = self._entries.get((model_name, generation, key))
+            if entry is None:
+                return None
+
+            if entry[0] < time.time():
+                del self._entries[(model_name, generation, key)]
+                return None
+
+            self._entries.move_to_end((model_name, generation, key))
+            return entry[1]
+
+    def set(self, model_name: str, generation: str, key: str, value, timeout: float):
+        with self._lock:
+            if generation != self.generation(model_name):
+                return
+
+            self._entries[(model_name, generation, key)] = (time.time() + timeout, value)
+            self._entries.move_to_end((model_name, generation, key))
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class File_Backend:
+    ''' Response cache backend storing entries as JSON files (shared by every process on the host).
+        Values are encoded like API responses (dates, decimals and UUIDs as strings).
+
+        Layout: <<location>>/<<model>>/<<generation>>/<<key>>.json
+    '''
+
+    def __init__(self, location: str = None):
+        self.location = location or os.path.join(tempfile.gettempdir(), 'api_response_cache')
+
+    def generation(self, model_name: str) -> str:
+        try:
+            with open(os.path.join(self.location, model_name, 'generation')) as generation:
+                return generation.read()
+        except OSError:
+            return '0'
+
+    def bump(self, model_name: str):
+        directory = os.path.join(self.location, model_name)
+        old_generation = self.generation(model_name)
+
+        os.makedirs(directory, exist_ok=True)
+        self._write(os.path.join(directory, 'generation'), uuid.uuid4().hex)
+
+        shutil.rmtree(os.path.join(directory, old_generation), ignore_errors=True)
+
+    def get(self, model_name: str, generation: str, key: str):
+        try:
+            with open(os.path.join(self.location, model_name, generation, key + '.json')) as entry:
+                expires, value = json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+        return value if expires >= time.time() else None
+
+    def set(self, model_name: str, generation: str, key: str, value, timeout: float):
+        if generation != self.generation(model_name):
+            return
+
+        directory = os.path.join(self.location, model_name, generation)
+
+        os.makedirs(directory, exist_ok=True)
+        self._write(os.path.join(directory, key + '.json'), json.dumps([time.time() + timeout, value], cls=DjangoJSONEncoder))
+
+    def clear(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    @staticmethod
+    def _write(path: str, contents: str):
+        ''' Write a file atomically so concurrent readers never see a partial entry. '''
+
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, 'w') as temp_file:
+            temp_file.write(contents)
+
+        os.replace(temp_path, path)
+
+
+class Django_Cache_Backend:
+    ''' Response cache backend storing entries in one of the caches configured in settings.CACHES. '''
+
+    def __init__(self, alias: str = 'default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self, model_name: str) -> str:
+        return self.cache.get('api:generation:{}'.format(model_name), '0')
+
+    def bump(self, model_name: str):
+        self.cache.set('api:generation:{}'.format(model_name), uuid.uuid4().hex, None)
+
+    def get(self, model_name: str, generation: str, key: str):
+        return self.cache.get('api:{}:{}:{}'.format(model_name, generation, key))
+
+    def set(self, model_name: str, generation: str, key: str, value, timeout: float):
+        self.cache.set('api:{}:{}:{}'.format(model_name, generation, key), value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class Shared_Memory_Backend:
+    ''' Response cache backend storing entries in the memory-mapped store shared by every worker process
+        on the host (see settings.API_SHARED_MEMORY). Each entry is held once and read by every worker,
+        and bumping a generation in one worker invalidates the entries of every worker. Values are encoded
+        like API responses (dates, decimals and UUIDs as strings).
+    '''
+
+    # Prefix of the store's counters holding generations
+    PREFIX = 'cache:'
+
+    @property
+    def store(self):
+        from .shared_memory import shared_memory_store
+
+        store = shared_memory_store()
+        if store is None:
+            raise ImproperlyConfigured('Shared_Memory_Backend requires settings.API_SHARED_MEMORY')
+
+        return store
+
+    def generation(self, model_name: str) -> str:
+        return str(self.store.counter(self.PREFIX + model_name))
+
+    def bump(self, model_name: str):
+        self.store.bump([self.PREFIX + model_name])
+
+    def get(self, model_name: str, generation: str, key: str):
+        payload = self.store.get('{}:{}:{}'.format(model_name, generation, key))
+
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, model_name: str, generation: str, key: str, value, timeout: float):
+        if generation != self.generation(model_name):
+            return
+
+        self.store.set('{}:{}:{}'.format(model_name, generation, key), json.dumps(value, cls=DjangoJSONEncoder).encode('utf-8'), timeout)
+
+    def clear(self):
+        self.store.clear()
+
+
+class Response_Cache:
+    ''' A cache of GET query results in front of the database, keyed by the normalized model, filter
+        and sort of the query.
+
+        Every model type has a generation (stored by the backend) that is part of each of its keys.
+        Writing to a model bumps its generation, so stale entries can never be read again, even if they
+        were stored by a read that raced the write.
+
+        * @backend stores the entries (see Local_Memory_Backend, File_Backend and Django_Cache_Backend) *
+        * @timeout is the number of seconds an entry is kept *
+    '''
+
+    def __init__(self, backend = None, timeout: float = 300):
+        self.backend = backend
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, model_type, request_params: dict, related_types: list = []) -> tuple:
+        ''' Build the normalized cache key of a GET query.
+
+            --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+            --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+            --> related_types : The types (classes) of any related models embedded in the response. Optional.
+
+            <-- The model name, the model's current generation and the hashed query (including the 
+                generations of any related models).
+        '''
+
+        from .query_plans import compile_query
+
+        plan = compile_query(model_type, request_params)
+
+        query = [
+            sorted([str(field), str(value)] for field, value in plan.filter_kwargs),
+            list(plan.sort),
+            str(request_params.get('fields', '')),
+            str(request_params.get('expand', '')),
+            str(request_params.get('limit', '')),
+            str(request_params.get('cursor', '')),
+            [str(request_params.get(param, '')) for param in ('count', 'exists', 'aggregate', 'group_by')],
+            [self.backend.generation(related_type.__name__) for related_type in related_types],
+        ]
+
+        model_name = model_type.__name__
+
+        return model_name, self.backend.generation(model_name), hashlib.sha1(json.dumps(query, cls=DjangoJSONEncoder).encode('utf-8')).hexdigest()
+
+    def get(self, key: tuple):
+        ''' Fetch a cached query result.
+
+            --> key : The query's key (see key()).
+
+            <-- The cached result or None on a miss.
+        '''
+
+        value = self.backend.get(*key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key: tuple, value):
+        ''' Cache a query result. Ignored if the model was written to since the key was built.
+
+            --> key : The query's key (see key()).
+
+            --> value : The JSON serializable query result.
+        '''
+
+        self.backend.set(*key, value, self.timeout)
+
+    def invalidate(self, model_types: list):
+        ''' Invalidate every cached query of one or more model types.
+
+            --> model_types : The types (classes) of the models written to (see signals.affected_model_types()).
+        '''
+
+        if not self.enabled:
+            return
+
+        for model_type in model_types:
+            self.backend.bump(model_type.__name__)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        ''' Snapshot the cache counters.
+
+            <-- The hit, miss and invalidation counts and the backend in use.
+        '''
+
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
+
+
+def load_response_cache() -> Response_Cache:
+    ''' Build the response cache configured by settings.API_RESPONSE_CACHE (disabled if not set).
+
+        A per-process backend misses the writes of other workers until its entries expire, so with more
+        than one worker (settings.API_WORKER_PROCESSES) its timeout is capped at API_LOCAL_CACHE_MAX_TIMEOUT.
+
+        <-- The configured response cache.
+    '''
+
+    config = getattr(settings, 'API_RESPONSE_CACHE', None)
+    if not config:
+        return Response_Cache()
+
+    backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+    timeout = config.get('TIMEOUT', 300)
+    if getattr(backend, 'per_process', False) and getattr(settings, 'API_WORKER_PROCESSES', 1) > 1:
+        timeout = min(timeout, getattr(settings, 'API_LOCAL_CACHE_MAX_TIMEOUT', 5.0))
+
+    return Response_Cache(backend, timeout)
+
+
+response_cache = load_response_cache()
+
+
+def get_response_cache() -> Response_Cache:
+    ''' Fetch the process-wide response cache (rebuilt if settings.API_RESPONSE_CACHE changes).
+
+        <-- The configured response cache.
+    '''
+
+    return response_cache
+
+
+def _reload_response_cache(setting, **kwargs):
+    global response_cache
+
+    if setting in ('API_RESPONSE_CACHE', 'API_WORKER_PROCESSES', 'API_LOCAL_CACHE_MAX_TIMEOUT'):
+        response_cache = load_response_cache()
+
+setting_changed.connect(_reload_response_cache)
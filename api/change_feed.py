@@ -0,0 +1,276 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from collections import deque
+from .errors import API_Error
+import logging, threading, time, uuid
+
+logger = logging.getLogger(__name__)
+
+class Change_Event:
+    ''' One committed change to a model: a single model created, updated or deleted (with the model's
+        serialized data, see API_Model.to_json(), None if it could not be serialized), or a refresh when
+        any number of models of the type changed at once (e.g. bulk requests) and clients must refetch them.
+    '''
+
+    __slots__ = ('id', 'sequence', 'model', 'action', 'pk', 'data')
+
+    def __init__(self, id: str, sequence: int, model: str, action: str, pk = None, data: dict = None):
+        self.id = id
+        self.sequence = sequence
+        self.model = model
+        self.action = action
+        self.pk = pk
+        self.data = data
+
+    def encode(self, encoder) -> str:
+        ''' Format the event as a server-sent event (id, event type and one line of JSON data). '''
+
+        payload = {'model': self.model, 'action': self.action, 'pk': self.pk, 'data': self.data}
+
+        return 'id: {}\nevent: change\ndata: {}\n\n'.format(self.id, encoder(payload).decode('utf-8'))
+
+
+class Event_Log:
+    ''' A bounded, in-process log of committed model changes that change feed streams read from and
+        resume in (see views.changes()). Event ids are <<token>>-<<sequence>>: the token is unique to the
+        log (so to the process), the sequence increases by one per event. An id from another worker
+        process (or from before a restart) is never mistaken for one of this log's events. The oldest
+        events are dropped once the log holds @max_events.
+
+        * @max_events bounds the number of events kept (how far back a client can resume) *
+    '''
+
+    def __init__(self, max_events: int = 1000):
+        self.max_events = max_events
+
+        self.appended = 0
+
+        self.token = uuid.uuid4().hex
+
+        self._events = deque(maxlen=max_events)
+        self._sequence = 0
+        self._changed = threading.Condition()
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    @property
+    def last_id(self) -> str:
+        return self.event_id(self._sequence)
+
+    def event_id(self, sequence: int) -> str:
+        return '{}-{}'.format(self.token, sequence)
+
+    def parse_id(self, event_id: str) -> int:
+        ''' Find the sequence of an event id sent by a client (Last-Event-ID).
+
+            <-- The sequence or None if the id is not one of this log's (sent by another process or
+                before a restart, or malformed).
+        '''
+
+        token, _, sequence = str(event_id).rpartition('-')
+
+        if token != self.token or not sequence.isdigit():
+            return None
+
+        return int(sequence)
+
+    def append(self, model: str, action: str, pk = None, data: dict = None) -> Change_Event:
+        ''' Record a change and wake every stream waiting for one.
+
+            --> model : The name of the model type (class) changed.
+
+            --> action : create, update, delete or refresh.
+
+            --> pk : The primary key of the model changed (None for refresh).
+
+            --> data : The model's serialized data (None for delete and refresh).
+
+            <-- The recorded event.
+        '''
+
+        with self._changed:
+            self._sequence += 1
+            event = Change_Event(self.event_id(self._sequence), self._sequence, model, action, pk, data)
+
+            self._events.append(event)
+            self.appended += 1
+            self._changed.notify_all()
+
+        return event
+
+    def since(self, sequence: int) -> list:
+        ''' Fetch every event recorded after an event.
+
+            --> sequence : The sequence of the last event the client received (see parse_id()).
+
+            <-- The events after it (oldest first) or None if it is unknown or events after it were
+                already dropped (the client missed changes and must refetch).
+        '''
+
+        with self._changed:
+            if sequence is None or sequence > self._sequence:
+                return None
+
+            if self._events and sequence < self._events[0].sequence - 1:
+                return None
+
+            return [event for event in self._events if event.sequence > sequence]
+
+    def wait(self, sequence: int, timeout: float, closed: threading.Event = None) -> bool:
+        ''' Wait for an event after @sequence to be recorded (or @closed to be set, see wake()).
+
+            <-- True if one was recorded before the timeout.
+        '''
+
+        with self._changed:
+            self._changed.wait_for(lambda: self._sequence > sequence or (closed is not None and closed.is_set()), timeout)
+
+            return self._sequence > sequence
+
+    def wake(self):
+        ''' Wake every stream waiting for an event (so closed streams end). '''
+
+        with self._changed:
+            self._changed.notify_all()
+
+    def stats(self) -> dict:
+        with self._changed:
+            return {'last_id': self.last_id, 'events': len(self._events), 'max_events': self.max_events, 'appended': self.appended}
+
+
+event_log = Event_Log(getattr(settings, 'API_CHANGE_FEED_MAX_EVENTS', 1000))
+
+# Every open stream holds a thread (a WSGI worker thread or an ASGI blocking pool thread, see executor.py)
+stream_slots = threading.BoundedSemaphore(getattr(settings, 'API_CHANGE_FEED_MAX_STREAMS', 4))
+
+
+def record_change(model_type, action: str, model = None):
+    ''' Record a change in the event log once it is committed (changes rolled back are never streamed).
+
+        --> model_type Type[API_Model] : The type (class) of the model changed.
+
+        --> action : create, update, delete or refresh.
+
+        --> model : The model instance changed (None for refresh).
+    '''
+
+    pk = model.pk if model is not None else None
+
+    def append():
+        data = None
+
+        # Serialized once committed (not on every save), a model that fails to serialize is sent without data
+        if model is not None and action != 'delete':
+            try:
+                data = model.to_json()
+            except Exception:
+                logger.exception('Change feed could not serialize %s %s', model_type.__name__, pk)
+
+        event_log.append(model_type.__name__, action, pk, data)
+
+    transaction.on_commit(append)
+
+
+class Change_Stream:
+    ''' An open change feed stream (see change_stream()), holding one of the API_CHANGE_FEED_MAX_STREAMS
+        stream slots until it is closed. Closing it (when the response is closed, or from the event loop
+        when an ASGI client disconnects) wakes a stream waiting for changes so it ends right away.
+    '''
+
+    def __init__(self, model_names: set, sequence: int, encoder, heartbeat: float, duration: float):
+        if not stream_slots.acquire(blocking=False):
+            raise API_Error('Too many open change feed streams, retry later', 503)
+
+        self.closed = threading.Event()
+
+        self._lock = threading.Lock()
+        self._events = change_stream(model_names, sequence, encoder, heartbeat, duration, self.closed)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._events)
+
+    def close(self):
+        with self._lock:
+            if self.closed.is_set():
+                return
+
+            self.closed.set()
+
+        event_log.wake()
+        stream_slots.release()
+
+
+def change_stream(model_names: set, sequence: int, encoder, heartbeat: float, duration: float, closed: threading.Event = None):
+    ''' Stream committed changes as server-sent events.
+
+        --> model_names : The names of the model types (classes) to stream changes of (every model if empty).
+
+        --> sequence : The sequence of the last event the client received (the stream resumes after it,
+                       None if the client's event id is unknown, see Event_Log.parse_id()).
+
+        --> encoder : The JSON encoder of event data (see utilities.encode_json()).
+
+        --> heartbeat : The number of seconds between keep-alive comments while nothing changes.
+
+        --> duration : The number of seconds before the stream ends (clients reconnect with Last-Event-ID).
+
+        --> closed : Set when the stream is closed (it ends without waiting for the next change). Optional.
+
+        <-- A generator of server-sent events.
+    '''
+
+    deadline = time.monotonic() + duration
+
+    yield 'retry: 1000\n\n'
+
+    while True:
+        events = event_log.since(sequence)
+
+        if events is None:
+            # Changes were missed (the log moved on or the id is from another process), the client must refetch everything
+            sequence = event_log.sequence
+            yield 'id: {}\nevent: reset\ndata: {{}}\n\n'.format(event_log.event_id(sequence))
+            continue
+
+        for event in events:
+            sequence = event.sequence
+
+            if not model_names or event.model in model_names:
+                yield event.encode(encoder)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+
+        changed = event_log.wait(sequence, min(heartbeat, remaining), closed)
+
+        if closed is not None and closed.is_set():
+            return
+
+        if not changed:
+            yield ': keep-alive\n\n'
+
+
+def _model_saved(sender, instance, created, raw = False, **kwargs):
+    from .models import API_Model
+
+    if issubclass(sender, API_Model) and not raw:
+        record_change(sender, 'create' if created else 'update', instance)
+
+
+def _model_deleted(sender, instance, **kwargs):
+    from .models import API_Model
+
+    # Deleting a model also deletes its API_Model (parent) row, which is not a change of its own
+    if issubclass(sender, API_Model) and sender is not API_Model:
+        record_change(sender, 'delete', instance)
+
+# Every saved or deleted model instance is recorded (writes that skip model signals record a refresh, see signals.model_written())
+post_save.connect(_model_saved, dispatch_uid='api_change_feed_save')
+post_delete.connect(_model_deleted, dispatch_uid='api_change_feed_delete')
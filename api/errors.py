@@ -3,4 +3,12 @@ class API_Error(Exception):
     
     def __init__(self, message, code):
         super(Exception, self).__init__(message)
-        self.code = code
\ No newline at end of file
+        self.code = code
+
+
+class API_Bulk_Error(API_Error):
+    ''' Error thrown by the API when one or more items of a bulk request are invalid. '''
+
+    def __init__(self, message, code, errors):
+        super(API_Bulk_Error, self).__init__(message, code)
+        self.errors = errors
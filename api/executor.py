@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import close_old_connections
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+
+_executor = None
+
+def blocking_executor() -> ThreadPoolExecutor:
+    ''' Fetch the bounded thread pool blocking work (ORM queries, file reads) is offloaded to from
+        async code. Sized by settings.API_BLOCKING_THREADS, so no more than that many database 
+        connections are open at once however many requests are in flight.
+
+        <-- The thread pool.
+    '''
+
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(getattr(settings, 'API_BLOCKING_THREADS', 8), thread_name_prefix='api-blocking')
+
+    return _executor
+
+
+def _run_blocking(function, *args, **kwargs):
+    # Pool threads outlive requests, so expired or broken database connections are recycled the
+    # same way Django does at the start and end of every request
+    close_old_connections()
+
+    try:
+        return function(*args, **kwargs)
+
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(function, *args, **kwargs):
+    ''' Run a blocking function on the bounded thread pool without blocking the event loop.
+
+        --> function : The function to run.
+
+        --> args, kwargs : The arguments to call it with.
+
+        <-- The function's return value.
+    '''
+
+    loop = asyncio.get_event_loop()
+
+    return await loop.run_in_executor(blocking_executor(), partial(_run_blocking, function, *args, **kwargs))
@@ -0,0 +1,287 @@
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.middleware.csrf import get_token
+from django.http import HttpRequest
+from django.test import RequestFactory
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from .benchmarks import latency_percentiles
+from .views import api
+from urllib.parse import urlencode
+import http.client, json, random, threading, time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Default share of each method in a workload
+DEFAULT_MIX = {'GET': 70, 'POST': 10, 'PUT': 15, 'DELETE': 5}
+
+# GET queries a workload picks from (like the page and its widgets send)
+GET_QUERIES = [
+    {'model': 'category', 'sort': 'name', 'limit': '50'},
+    {'model': 'category', 'filter': 'name:Category {row}'},
+    {'model': 'widget', 'filter': 'name:header'},
+    {'model': 'project', 'expand': 'project_category', 'limit': '50'},
+]
+
+def parse_mix(mix: str) -> dict:
+    ''' Parse a workload mix (e.g. GET=70,POST=10,PUT=15,DELETE=5).
+
+        --> mix : The share of each method.
+
+        <-- The share of each method keyed by method.
+    '''
+
+    shares = {}
+
+    for pair in mix.split(','):
+        method, _, share = pair.partition('=')
+        shares[method.strip().upper()] = float(share)
+
+    unknown = set(shares) - set(DEFAULT_MIX)
+    if unknown or not sum(shares.values()):
+        raise ValueError('Invalid workload mix: {}'.format(mix))
+
+    return shares
+
+
+def build_workload(requests: int, mix: dict, rows: int, seed: int = 0) -> list:
+    ''' Build a reproducible list of API requests.
+
+        --> requests : The number of requests.
+
+        --> mix : The share of each method (see parse_mix()).
+
+        --> rows : The number of seeded Category rows (filters and updates pick from them).
+
+        --> seed : The random seed.
+
+        <-- A list of (method, query string parameters, JSON body) tuples.
+    '''
+
+    generator = random.Random(seed)
+    methods, weights = list(mix), list(mix.values())
+    workload, created = [], 0
+
+    for index in range(requests):
+        method = generator.choices(methods, weights)[0]
+        row = generator.randrange(max(rows, 1))
+
+        if method == 'GET':
+            query = {key: value.format(row=row) for key, value in generator.choice(GET_QUERIES).items()}
+            workload.append((method, query, None))
+
+        elif method == 'POST':
+            workload.append((method, {}, {'model': 'category', 'fields': {'name': 'Bench {}'.format(index), 'icon': 'bench'}}))
+            created = index
+
+        elif method == 'PUT':
+            workload.append((method, {}, {'model': 'category', 'bulk': True, 'filter': {'name': 'Category {}'.format(row)}, 'fields': {'icon': 'icon_{}'.format(index)}}))
+
+        else:
+            workload.append((method, {}, {'model': 'category', 'bulk': True, 'filter': {'name': 'Bench {}'.format(created)}}))
+
+    return workload
+
+
+class Query_Counter:
+    ''' Counts the SQL queries run per request (on every connection of the thread serving it), by method. '''
+
+    def __init__(self):
+        self.queries = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def count(self, method: str, function, *args):
+        ''' Call a function serving a request, counting the queries it runs. '''
+
+        queries = [0]
+
+        def execute_wrapper(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(execute_wrapper))
+
+            result = function(*args)
+
+        with self._lock:
+            self.queries[method] = self.queries.get(method, 0) + queries[0]
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+        return result
+
+    def per_request(self) -> dict:
+        return {method: self.queries[method] / self.requests[method] for method in self.queries}
+
+
+def run_in_process(workload: list, concurrency: int) -> dict:
+    ''' Send a workload straight to the api view (no middleware or network) from @concurrency threads.
+
+        <-- The results (see summarize()).
+    '''
+
+    factory, counter = RequestFactory(), Query_Counter()
+
+    def request(item):
+        method, query, body = item
+
+        if method == 'GET':
+            http_request = factory.get('/api/', query)
+        else:
+            http_request = getattr(factory, method.lower())('/api/', json.dumps(body), content_type='application/json')
+
+        start = time.perf_counter()
+        try:
+            status = counter.count(method, api, http_request).status_code
+        finally:
+            connections.close_all()
+
+        return method, (time.perf_counter() - start) * 1000, status
+
+    return run_workload(workload, concurrency, request, counter)
+
+
+class Threading_WSGI_Server(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class Quiet_Request_Handler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def run_over_http(workload: list, concurrency: int) -> dict:
+    ''' Send a workload to the full application (middleware included) over HTTP, served by a local
+        threaded WSGI server, from @concurrency client threads.
+
+        <-- The results (see summarize()).
+    '''
+
+    counter, application = Query_Counter(), get_wsgi_application()
+
+    def counted_application(environ, start_response):
+        return counter.count(environ['REQUEST_METHOD'], application, environ, start_response)
+
+    server = make_server('127.0.0.1', 0, counted_application, server_class=Threading_WSGI_Server, handler_class=Quiet_Request_Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # Unsafe methods need a CSRF token like any other client
+    token_request = HttpRequest()
+    token = get_token(token_request)
+    headers = {'Content-Type': 'application/json', 'X-CSRFToken': token, 'Cookie': 'csrftoken={}'.format(token_request.META['CSRF_COOKIE'])}
+
+    local = threading.local()
+
+    def request(item):
+        method, query, body = item
+
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+
+        path = '/api/?' + urlencode(query)
+
+        start = time.perf_counter()
+        local.connection.request(method, path, json.dumps(body) if body else None, headers)
+        response = local.connection.getresponse()
+        response.read()
+
+        return method, (time.perf_counter() - start) * 1000, response.status
+
+    try:
+        return run_workload(workload, concurrency, request, counter)
+
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_workload(workload: list, concurrency: int, request, counter: Query_Counter) -> dict:
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(request, workload))
+
+    return summarize(results, time.perf_counter() - start, counter)
+
+
+def summarize(results: list, elapsed: float, counter: Query_Counter) -> dict:
+    ''' Summarize a workload run.
+
+        --> results : The (method, latency in milliseconds, status code) of each request.
+
+        --> elapsed : The wall time of the run in seconds.
+
+        --> counter : The query counts of the run.
+
+        <-- The throughput, latency percentiles, errors (5xx), status codes, queries per request and peak memory.
+    '''
+
+    percentiles = (50, 95, 99)
+    queries = counter.per_request()
+
+    summary = {
+        'requests': len(results),
+        'rps': len(results) / elapsed,
+        'latency_ms': latency_percentiles([latency for _, latency, _ in results], percentiles),
+        'errors': sum(status >= 500 for _, _, status in results),
+        'statuses': {},
+        'methods': {},
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+    }
+
+    for method, _, status in results:
+        summary['statuses'][str(status)] = summary['statuses'].get(str(status), 0) + 1
+
+    for method in sorted(set(method for method, _, _ in results)):
+        latencies = [latency for result_method, latency, _ in results if result_method == method]
+
+        summary['methods'][method] = dict(latency_percentiles(latencies, percentiles), count=len(latencies), queries=queries.get(method))
+
+    return summary
+
+
+# Metrics compared between runs: (path, True if higher is better)
+COMPARED_METRICS = [
+    (('rps',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p95'), False),
+    (('latency_ms', 'p99'), False),
+]
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list:
+    ''' Compare two saved benchmark runs.
+
+        --> baseline : The results of the earlier run.
+
+        --> current : The results of this run.
+
+        --> threshold : The relative change (e.g. 0.1 for 10%) a metric may get worse by before it is a regression.
+
+        <-- A list of (mode, metric, baseline value, current value, relative change, regressed) tuples.
+    '''
+
+    comparison = []
+
+    for mode, results in current['modes'].items():
+        if mode not in baseline.get('modes', {}):
+            continue
+
+        for path, higher_is_better in COMPARED_METRICS:
+            before, after = baseline['modes'][mode], results
+            for key in path:
+                before, after = before[key], after[key]
+
+            change = (after - before) / before if before else 0.0
+            regressed = -change > threshold if higher_is_better else change > threshold
+
+            comparison.append((mode, '.'.join(path), before, after, change, regressed))
+
+    return comparison
@@ -0,0 +1,145 @@
+from logging.handlers import QueueHandler
+import atexit, datetime, json, logging, queue, threading, weakref
+
+_handlers = weakref.WeakSet()
+
+class JSON_Formatter(logging.Formatter):
+    ''' Format log records as single JSON lines. Any structured fields passed with the record
+        (logger.error(msg, extra={'fields': {...}})) are merged into the line.
+    '''
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        line.update(getattr(record, 'fields', None) or {})
+
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(line, default=str)
+
+
+class Async_File_Handler(QueueHandler):
+    ''' Log handler that only puts records on a bounded in-memory queue. A background thread drains the
+        queue and appends the records to a file in batches (one write per batch), so logging on a request
+        thread never waits on the disk. When the queue is full new records are dropped (and counted)
+        rather than blocking. A batch that fails to write (e.g. the disk is full) is reported through
+        handleError() and counted, and the file is reopened before the next batch.
+
+        * @filename is the file to append records to *
+        * @queue_size bounds the number of records waiting to be written *
+        * @batch_size is the maximum number of records written at a time *
+        * @flush_interval is the maximum number of seconds the writer waits for a batch to fill *
+    '''
+
+    def __init__(self, filename: str, queue_size: int = 10000, batch_size: int = 256, flush_interval: float = 0.5, encoding: str = 'utf-8'):
+        super(Async_File_Handler, self).__init__(queue.Queue(queue_size))
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._filename = filename
+        self._encoding = encoding
+        self._stream = open(filename, 'a', encoding=encoding)
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._write_batches, name='api-log-writer', daemon=True)
+        self._writer.start()
+
+        _handlers.add(self)
+        atexit.register(self.close)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        ''' Merge the record's arguments into its message so it can be formatted later on the writer thread. '''
+
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.queued += 1
+
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        ''' Write every queued record and stop the writer thread. '''
+
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._writer.join()
+
+            if self._stream is not None:
+                self._stream.close()
+
+        super(Async_File_Handler, self).close()
+
+    def stats(self) -> dict:
+        return {'queued': self.queued, 'written': self.written, 'dropped': self.dropped, 'failed': self.failed, 'pending': self.queue.qsize()}
+
+    def _write_batches(self):
+        while not (self._stopped.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+
+            if lines:
+                self._write(lines, batch[-1])
+
+    def _write(self, lines: list, record: logging.LogRecord):
+        try:
+            if self._stream is None:
+                self._stream = open(self._filename, 'a', encoding=self._encoding)
+
+            self._stream.write('\n'.join(lines) + '\n')
+            self._stream.flush()
+            self.written += len(lines)
+
+        except Exception:
+            # Reported like logging.StreamHandler does, the writer keeps running and reopens the file
+            self.failed += len(lines)
+            self.handleError(record)
+
+            if self._stream is not None:
+                try:
+                    self._stream.close()
+                except Exception:
+                    pass
+
+                self._stream = None
+
+
+def async_logging_stats() -> dict:
+    ''' Snapshot the counters of every async log handler.
+
+        <-- The queued, written, dropped and pending record counts of each handler keyed by its log file.
+    '''
+
+    return {handler._filename: handler.stats() for handler in list(_handlers)}
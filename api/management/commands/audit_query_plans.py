@@ -0,0 +1,139 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection
+from api.benchmarks import benchmark_database
+from api.errors import API_Error
+from api.query_plans import Query_Plan, compile_filter, compile_sort
+from api.registry import model_registry
+import json, os
+
+def recorded_queries(path: str) -> list:
+    ''' Read the queries recorded by the API (see query_plans.query_logger). Only the filter keys are
+        recorded, so each is given a placeholder value (the plan does not depend on it).
+
+        --> path : The query log file.
+
+        <-- A list of (model name, filter, sort) tuples.
+    '''
+
+    queries = []
+
+    with open(path) as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+                model_filter = {key: placeholder(key) for key in record['filter']}
+                queries.append((record['model'], model_filter, ','.join(record['sort'])))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    return queries
+
+
+def placeholder(key: str):
+    # A value accepted by the lookup of a filter key (e.g. name__icontains)
+    lookup = key.rsplit('__', 1)[-1]
+
+    if lookup == 'isnull':
+        return True
+
+    return {'in': ['1'], 'range': ['1', '1']}.get(lookup, '1')
+
+
+def declared_queries() -> list:
+    ''' Build a query for every field each API model declares filterable or sortable.
+
+        <-- A list of (model name, filter, sort) tuples.
+    '''
+
+    queries = []
+
+    for model_type in model_registry.model_types():
+        for name in model_type.filterable_fields or []:
+            queries.append((model_type.__name__, '{}:1'.format(name), ''))
+
+        for name in model_type.sortable_fields or []:
+            queries.append((model_type.__name__, '', name))
+
+    return queries
+
+
+def explain(model_type, model_filter, model_sort) -> list:
+    ''' Run EXPLAIN QUERY PLAN for the query the API builds from filter and sort parameters.
+
+        <-- The details of each step of the query plan.
+    '''
+
+    plan = Query_Plan(model_type, compile_filter(model_type, model_filter), compile_sort(model_type, model_sort))
+    sql, params = plan.order(plan.filter(model_type.objects.all())).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(steps: list) -> list:
+    ''' Flag the steps of a query plan that read a whole table or sort without an index. '''
+
+    flagged = []
+
+    for step in steps:
+        if step.startswith('SCAN') and 'INDEX' not in step:
+            flagged.append('full table scan ({})'.format(step))
+
+        elif 'TEMP B-TREE' in step:
+            flagged.append('sort without an index ({})'.format(step))
+
+    return flagged
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN over the filtered/sorted queries recorded by the API (and every declared filterable/sortable field) and flag table scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=os.path.join(settings.BASE_DIR, 'logs/queries.log'), help='The query log written by the API.')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if any query scans.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN auditing is only supported on SQLite.')
+
+        queries = declared_queries()
+        if os.path.exists(options['log']):
+            queries += recorded_queries(options['log'])
+
+        # Only filtered or sorted queries can use an index
+        unique = []
+        for query in queries:
+            if (query[1] or query[2]) and query not in unique:
+                unique.append(query)
+
+        queries = unique
+
+        flagged = 0
+
+        with benchmark_database():
+            for model_name, model_filter, model_sort in queries:
+                entry = model_registry.get(model_name)
+                if entry is None:
+                    continue
+
+                description = '{} filter={} sort={}'.format(model_name, model_filter or '-', model_sort or '-')
+
+                try:
+                    found = problems(explain(entry.model_type, model_filter, model_sort))
+                except API_Error as error:
+                    self.stdout.write('  SKIP {} ({})'.format(description, error))
+                    continue
+
+                flagged += bool(found)
+                self.stdout.write('  {} {}'.format('SCAN' if found else 'OK  ', description))
+
+                for problem in found:
+                    self.stdout.write('         {}'.format(problem))
+
+        self.stdout.write('{} of {} queries flagged.'.format(flagged, len(queries)))
+
+        if flagged and options['fail']:
+            raise CommandError('{} queries scan a table or sort without an index.'.format(flagged))
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import override_settings
+from api.benchmarks import benchmark_database, seed_models
+from api.load_testing import DEFAULT_MIX, parse_mix, build_workload, run_in_process, run_over_http, compare_results
+import datetime, json, os, tempfile
+
+MODES = {
+    'in-process': run_in_process,
+    'http': run_over_http,
+}
+
+class Command(BaseCommand):
+    help = 'Load test the /api/ endpoint with a mixed GET/POST/PUT/DELETE workload (in-process and over HTTP), optionally saving the results and comparing them to an earlier run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=1000, help='The number of Category rows to seed.')
+        parser.add_argument('--projects', type=int, default=200, help='The number of Project rows to seed.')
+        parser.add_argument('--widgets', type=int, default=20, help='The number of Widget rows to seed.')
+        parser.add_argument('--requests', type=int, default=2000, help='The number of requests sent per mode.')
+        parser.add_argument('--concurrency', type=int, default=8, help='The number of requests in flight at once.')
+        parser.add_argument('--mix', default=','.join('{}={}'.format(method, share) for method, share in DEFAULT_MIX.items()), help='The share of each method (e.g. GET=70,POST=10,PUT=15,DELETE=5).')
+        parser.add_argument('--mode', choices=list(MODES) + ['both'], default='both', help='Send requests straight to the view, over HTTP or both.')
+        parser.add_argument('--seed', type=int, default=0, help='The random seed of the workload.')
+        parser.add_argument('--cache', action='store_true', help='Keep the GET response cache enabled.')
+        parser.add_argument('--output', help='Save the results to this JSON file.')
+        parser.add_argument('--compare', help='Compare the results to an earlier run saved with --output.')
+        parser.add_argument('--threshold', type=float, default=0.1, help='The relative change a metric may get worse by before it is a regression.')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if a regression is found (use with --compare).')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        modes = list(MODES) if options['mode'] == 'both' else [options['mode']]
+        cache = {} if options['cache'] else {'API_RESPONSE_CACHE': None}
+
+        results = {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'config': {key: options[key] for key in ('categories', 'projects', 'widgets', 'requests', 'concurrency', 'seed', 'cache')},
+            'mix': mix,
+            'modes': {},
+        }
+
+        # A database file (rather than memory) so concurrent writers lock like they do in production
+        with tempfile.TemporaryDirectory() as directory, override_settings(STATIC_ROOT=os.path.join(settings.BASE_DIR, 'static'), **cache):
+            for mode in modes:
+                with benchmark_database(os.path.join(directory, '{}.sqlite3'.format(mode))):
+                    seed_models(categories=options['categories'], projects=options['projects'], widgets=options['widgets'])
+
+                    workload = build_workload(options['requests'], mix, options['categories'], options['seed'])
+                    results['modes'][mode] = MODES[mode](workload, options['concurrency'])
+
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+            self.stdout.write('Saved results to {}'.format(options['output']))
+
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = self.report_comparison(compare_results(json.load(baseline), results, options['threshold']))
+
+            if regressions and options['fail']:
+                raise CommandError('{} metric(s) regressed by more than {:.0%}'.format(regressions, options['threshold']))
+
+    def report(self, results: dict):
+        config = results['config']
+        self.stdout.write('{} requests, {} concurrent ({}):'.format(config['requests'], config['concurrency'], ', '.join('{}={:g}'.format(method, share) for method, share in results['mix'].items())))
+
+        for mode, summary in results['modes'].items():
+            latency = summary['latency_ms']
+            self.stdout.write('  {:<12} {:>8.1f} req/s   p50 {:>7.2f} ms   p95 {:>7.2f} ms   p99 {:>7.2f} ms   errors {}   peak rss {} KB'.format(
+                mode, summary['rps'], latency['p50'], latency['p95'], latency['p99'], summary['errors'], summary['peak_rss_kb']))
+
+            for method, stats in summary['methods'].items():
+                self.stdout.write('    {:<10} {:>6} requests   p50 {:>7.2f} ms   p99 {:>7.2f} ms   {:.1f} queries/request'.format(
+                    method, stats['count'], stats['p50'], stats['p99'], stats['queries'] or 0))
+
+    def report_comparison(self, comparison: list) -> int:
+        self.stdout.write('Compared to baseline:')
+
+        for mode, metric, before, after, change, regressed in comparison:
+            self.stdout.write('  {:<12} {:<16} {:>10.2f} -> {:>10.2f} ({:+.1%}){}'.format(mode, metric, before, after, change, '   REGRESSION' if regressed else ''))
+
+        return sum(regressed for *_, regressed in comparison)
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+from concurrent.futures import ThreadPoolExecutor
+from api.benchmarks import benchmark_database, seed_models, latency_percentiles
+from api.asgi import ASGI_Handler
+from urllib.parse import urlencode
+import asyncio, time
+
+# Mix of GETs the page sends to the API (per model type, filtered and sorted)
+QUERIES = [
+    {'model': 'Category'},
+    {'model': 'Project', 'sort': 'project_name'},
+    {'model': 'Category', 'filter': '{"icon": "icon_1"}'},
+    {'model': 'Widget', 'filter': '{"name": "header"}'},
+]
+
+def query_string(index: int) -> str:
+    return urlencode(QUERIES[index % len(QUERIES)])
+
+
+def run_wsgi(application, requests: int, concurrency: int) -> tuple:
+    ''' Serve requests with the WSGI application on a pool of @concurrency threads (like a threaded WSGI server). '''
+
+    def request(index):
+        environ = ASGI_Handler.environ({'method': 'GET', 'path': '/api/', 'query_string': query_string(index).encode(), 'headers': []}, b'')
+
+        start = time.perf_counter()
+        b''.join(application(environ, lambda status, headers, exc_info=None: None))
+
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = list(pool.map(request, range(requests)))
+
+    return timings, time.perf_counter() - start
+
+
+def run_asgi(application, requests: int, concurrency: int) -> tuple:
+    ''' Serve requests with the ASGI application, @concurrency of them in flight at once on one event loop. '''
+
+    async def request(index, limit):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/', 'query_string': query_string(index).encode(), 'headers': []}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            pass
+
+        async with limit:
+            start = time.perf_counter()
+            await application(scope, receive, send)
+
+            return (time.perf_counter() - start) * 1000
+
+    async def run():
+        limit = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(request(index, limit) for index in range(requests)))
+
+    start = time.perf_counter()
+    timings = asyncio.run(run())
+
+    return list(timings), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Benchmark throughput and tail latency of the /api/ endpoint under concurrent load served through WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='The number of requests sent to each application.')
+        parser.add_argument('--concurrency', type=int, default=32, help='The number of requests in flight at once.')
+        parser.add_argument('--rows', type=int, default=500, help='The number of Category (and Project) rows to seed.')
+        parser.add_argument('--cache', action='store_true', help='Leave the GET response cache enabled.')
+
+    def handle(self, *args, **options):
+        cache = override_settings() if options['cache'] else override_settings(API_RESPONSE_CACHE=None)
+
+        with benchmark_database(), cache:
+            seed_models(categories=options['rows'], projects=options['rows'], widgets=8)
+
+            wsgi_application = get_wsgi_application()
+            applications = {
+                'WSGI (threads)': lambda: run_wsgi(wsgi_application, options['requests'], options['concurrency']),
+                'ASGI (event loop)': lambda: run_asgi(ASGI_Handler(wsgi_application), options['requests'], options['concurrency']),
+            }
+
+            results = {name: run() for name, run in applications.items()}
+
+        self.stdout.write('{} requests, {} concurrent:'.format(options['requests'], options['concurrency']))
+        for name, (timings, elapsed) in results.items():
+            latency = latency_percentiles(timings)
+            self.stdout.write('  {:<18} {:>8.1f} req/s   p50 {:>8.2f} ms   p99 {:>8.2f} ms   max {:>8.2f} ms'.format(
+                name, len(timings) / elapsed, latency['p50'], latency['p99'], latency['max']))
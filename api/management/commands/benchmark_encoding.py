@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.test import override_settings
+from api.benchmarks import benchmark_database, seed_models, time_call
+from api.utilities import stdlib_json_encoder, orjson_encoder, orjson, brotli, GZIP_LEVEL, BROTLI_QUALITY
+from api.serializers import serializer_plan
+from api.models import Category, Widget
+import gzip, os
+
+class Command(BaseCommand):
+    help = 'Benchmark encoding realistic GET result sets (Category and Widget) with each JSON encoder and the bytes sent with each compression.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=2000, help='The number of Category rows in the result set.')
+        parser.add_argument('--widgets', type=int, default=50, help='The number of Widget rows (with templates) in the result set.')
+        parser.add_argument('--repeat', type=int, default=20, help='The number of timed runs of each encoder.')
+
+    def handle(self, *args, **options):
+        # Widget templates are read from the source static directory (no collectstatic needed)
+        with benchmark_database(), override_settings(STATIC_ROOT=os.path.join(settings.BASE_DIR, 'static')):
+            seed_models(categories=options['categories'], widgets=options['widgets'])
+
+            result_sets = {
+                '{} categories'.format(options['categories']): {'models': serializer_plan(Category).serialize(Category.objects.all()), 'code': 200},
+                '{} widgets'.format(options['widgets']): {'models': serializer_plan(Widget).serialize(Widget.objects.all()), 'code': 200},
+            }
+
+        encoders = {'json (stdlib)': stdlib_json_encoder}
+        if orjson is not None:
+            encoders['orjson'] = orjson_encoder
+
+        compressions = {'gzip': lambda content: gzip.compress(content, compresslevel=GZIP_LEVEL)}
+        if brotli is not None:
+            compressions['br'] = lambda content: brotli.compress(content, quality=BROTLI_QUALITY)
+
+        for name, content in result_sets.items():
+            self.stdout.write('{}:'.format(name))
+
+            for encoder_name, encoder in encoders.items():
+                timing = time_call(lambda: encoder(content), options['repeat'])
+                self.stdout.write('  encode {:<16} median {:>8.2f} ms'.format(encoder_name, timing['median']))
+
+            if orjson is None:
+                self.stdout.write('  encode orjson           (not installed)')
+
+            encoded = stdlib_json_encoder(content)
+            self.stdout.write('  bytes  {:<16} {:>10}'.format('identity', len(encoded)))
+
+            for compression_name, compress in compressions.items():
+                compressed = compress(encoded)
+                timing = time_call(lambda: compress(encoded), options['repeat'])
+                self.stdout.write('  bytes  {:<16} {:>10} ({:.1%}, median {:.2f} ms)'.format(compression_name, len(compressed), len(compressed) / len(encoded), timing['median']))
+
+            if brotli is None:
+                self.stdout.write('  bytes  br               (brotli not installed)')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from api.benchmarks import time_call
+from api.query_plans import Query_Plan, Query_Plan_Cache, compile_filter, compile_sort
+from api.models import Category, Project
+
+# Filter/sort strings of typical dashboard queries
+QUERIES = [
+    (Category, 'name__icontains:py,icon:python', '-name'),
+    (Category, 'id__in:1|2|3|4', 'name,-icon'),
+    (Project, 'project_category__name__startswith:Py', None),
+]
+
+class Command(BaseCommand):
+    help = 'Benchmark compiling GET filter/sort strings on every request against the cached query plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=20000, help='The number of queries compiled per timed run.')
+        parser.add_argument('--repeat', type=int, default=5, help='The number of timed runs of each path.')
+
+    def handle(self, *args, **options):
+        queries = [QUERIES[index % len(QUERIES)] for index in range(options['queries'])]
+        cache = Query_Plan_Cache()
+
+        paths = {
+            'compiled per query': lambda: [Query_Plan(model_type, compile_filter(model_type, model_filter), compile_sort(model_type, model_sort)) for model_type, model_filter, model_sort in queries],
+            'cached plans': lambda: [cache.get(model_type, model_filter, model_sort) for model_type, model_filter, model_sort in queries],
+        }
+
+        results = {name: time_call(path, options['repeat']) for name, path in paths.items()}
+
+        self.stdout.write('Compiling {} queries ({} runs):'.format(options['queries'], options['repeat']))
+        for name, timing in results.items():
+            self.stdout.write('  {:<20} min {:>9.2f} ms   median {:>9.2f} ms'.format(name, timing['min'], timing['median']))
+
+        self.stdout.write('Speedup: {:.2f}x'.format(results['compiled per query']['median'] / results['cached plans']['median']))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.db import models
+from api.benchmarks import benchmark_database, seed_models, time_call
+from api.serializers import serializer_plan
+from api.models import Category
+import json
+
+def legacy_to_json(model) -> str:
+    ''' The per-row serializer API_Model.to_json used before serializer plans (kept for comparison). '''
+
+    attrs_map = {}
+    ignore_field_types = [
+        models.fields.AutoField,
+        models.fields.related.OneToOneField,
+        models.fields.related.ManyToManyField,
+        models.fields.related.ForeignKey,
+    ]
+
+    for field in model._meta.fields:
+        if type(field) not in ignore_field_types:
+            attrs_map[field.name] = getattr(model, field.name, 'None')
+
+    return json.dumps(attrs_map)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serializing a GET result set with the per-row to_json path against the compiled serializer plan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='The number of Category rows to serialize.')
+        parser.add_argument('--repeat', type=int, default=5, help='The number of timed runs of each path.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_models(categories=options['rows'])
+
+            queryset = Category.objects.all()
+            plan = serializer_plan(Category)
+
+            paths = {
+                'to_json (per row)': lambda: JsonResponse({'models': [legacy_to_json(model) for model in queryset.all()]}),
+                'serializer plan': lambda: JsonResponse({'models': plan.serialize(queryset.all())}),
+            }
+
+            results = {name: time_call(path, options['repeat']) for name, path in paths.items()}
+
+        self.stdout.write('Serializing {} rows ({} runs):'.format(options['rows'], options['repeat']))
+        for name, timing in results.items():
+            self.stdout.write('  {:<20} min {:>9.2f} ms   median {:>9.2f} ms'.format(name, timing['min'], timing['median']))
+
+        baseline, planned = results['to_json (per row)']['median'], results['serializer plan']['median']
+        self.stdout.write('Speedup: {:.2f}x'.format(baseline / planned))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.test import override_settings
+from api.benchmarks import benchmark_database, seed_models, time_call
+from api.snapshots import model_snapshot
+from api.models import Category, Widget
+from api.views import fetch_and_serialize_models
+import os
+
+# GET queries of typical page views
+QUERIES = [
+    (Category, {'sort': 'name'}),
+    (Category, {'filter': 'name:Category 7'}),
+    (Category, {'filter': 'name__icontains:category 1,icon:icon_1', 'sort': '-name'}),
+    (Category, {'filter': 'icon__in:icon_1|icon_2|icon_3', 'sort': 'icon,name'}),
+    (Widget, {'filter': 'name:header'}),
+]
+
+class Command(BaseCommand):
+    help = 'Benchmark answering GET queries of snapshot models (Category and Widget) through the ORM against their in-memory snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=500, help='The number of Category rows to seed.')
+        parser.add_argument('--widgets', type=int, default=20, help='The number of Widget rows to seed.')
+        parser.add_argument('--queries', type=int, default=200, help='The number of times each query is run per timed run.')
+        parser.add_argument('--repeat', type=int, default=5, help='The number of timed runs of each path.')
+
+    def handle(self, *args, **options):
+        static_root = os.path.join(settings.BASE_DIR, 'static')
+
+        with benchmark_database(), override_settings(STATIC_ROOT=static_root, API_RESPONSE_CACHE=None, API_SNAPSHOT_MAX_AGE=3600):
+            seed_models(categories=options['categories'], widgets=options['widgets'])
+
+            self.stdout.write('{} categories, {} widgets, {} runs of each query ({} runs):'.format(options['categories'], options['widgets'], options['queries'], options['repeat']))
+
+            for model_type, params in QUERIES:
+                params = dict(params, model=model_type.__name__)
+                timings = {}
+
+                for name, enabled in (('orm', False), ('snapshot', True)):
+                    with override_settings(API_SNAPSHOTS=enabled):
+                        fetch_and_serialize_models(model_type, params)
+                        timings[name] = time_call(lambda: [fetch_and_serialize_models(model_type, params) for _ in range(options['queries'])], options['repeat'])
+
+                rows = len(fetch_and_serialize_models(model_type, params)[0]['models'])
+                self.stdout.write('  {:<8} {:<64} {:>5} rows   orm {:>8.2f} ms   snapshot {:>8.2f} ms   ({:.1f}x)'.format(
+                    model_type.__name__, str({key: value for key, value in params.items() if key != 'model'}), rows,
+                    timings['orm']['median'], timings['snapshot']['median'], timings['orm']['median'] / timings['snapshot']['median']))
+
+            self.stdout.write('Snapshots: {}'.format({model_type.__name__: model_snapshot(model_type).stats() for model_type in (Category, Widget)}))
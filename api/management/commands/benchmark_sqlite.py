@@ -0,0 +1,108 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from api.benchmarks import seed_models, latency_percentiles
+import json, os, random, tempfile, time
+
+def database_configs(directory: str) -> dict:
+    ''' The database configurations compared (each with its own database file in @directory): Django's
+        stock SQLite backend and the tuned api.sqlite backend with a separate pool of read-only connections.
+    '''
+
+    stock, tuned = os.path.join(directory, 'stock.sqlite3'), os.path.join(directory, 'tuned.sqlite3')
+
+    return {
+        'stock sqlite3': {
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': stock},
+        },
+        'api.sqlite (WAL + read pool)': {
+            'default': {'ENGINE': 'api.sqlite', 'NAME': tuned, 'POOL_SIZE': 1},
+            'read': {'ENGINE': 'api.sqlite', 'NAME': tuned, 'READ_ONLY': True, 'POOL_SIZE': 32},
+        },
+    }
+
+
+@contextmanager
+def use_databases(databases: dict):
+    ''' Temporarily replace the configured databases (closing every open connection). '''
+
+    original = dict(connections.databases)
+
+    def reset(configured):
+        connections.close_all()
+        for alias in list(connections.databases):
+            if hasattr(connections._connections, alias):
+                delattr(connections._connections, alias)
+
+        connections.databases.clear()
+        connections.databases.update(configured)
+
+        for alias in connections.databases:
+            connections.ensure_defaults(alias)
+            connections.prepare_test_settings(alias)
+
+    reset(databases)
+
+    try:
+        yield
+
+    finally:
+        reset(original)
+
+
+def run_mixed_load(requests: int, concurrency: int, write_ratio: float, rows: int) -> tuple:
+    ''' Send a mix of GETs and PUTs to the API from @concurrency threads.
+
+        <-- The request latencies (ms), the number of failed requests and the elapsed time (s).
+    '''
+
+    def request(index):
+        generator = random.Random(index)
+        name = 'Category {}'.format(generator.randrange(rows))
+        client = Client()
+
+        start = time.perf_counter()
+
+        if generator.random() < write_ratio:
+            body = {'model': 'category', 'bulk': True, 'filter': {'name': name}, 'fields': {'icon': 'icon_{}'.format(index)}}
+            response = client.put('/api/', json.dumps(body), content_type='application/json')
+        else:
+            response = client.get('/api/', {'model': 'category', 'filter': 'name:' + name})
+
+        return (time.perf_counter() - start) * 1000, response.status_code != 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(request, range(requests)))
+
+    return [latency for latency, _ in results], sum(failed for _, failed in results), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Benchmark mixed GET/PUT throughput against an on-disk database with the stock SQLite backend and the tuned api.sqlite backend.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='The number of requests sent per backend.')
+        parser.add_argument('--concurrency', type=int, default=16, help='The number of requests in flight at once.')
+        parser.add_argument('--writes', type=float, default=0.2, help='The fraction of requests that are PUTs.')
+        parser.add_argument('--rows', type=int, default=1000, help='The number of Category rows to seed.')
+
+    def handle(self, *args, **options):
+        results = {}
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(API_RESPONSE_CACHE=None):
+            for name, databases in database_configs(directory).items():
+                with use_databases(databases):
+                    call_command('migrate', verbosity=0)
+                    seed_models(categories=options['rows'])
+
+                    results[name] = run_mixed_load(options['requests'], options['concurrency'], options['writes'], options['rows'])
+
+        self.stdout.write('{} requests ({:.0%} PUT), {} concurrent:'.format(options['requests'], options['writes'], options['concurrency']))
+        for name, (timings, failed, elapsed) in results.items():
+            latency = latency_percentiles(timings)
+            self.stdout.write('  {:<30} {:>8.1f} req/s   p50 {:>8.2f} ms   p99 {:>8.2f} ms   failed {}'.format(
+                name, len(timings) / elapsed, latency['p50'], latency['p99'], failed))
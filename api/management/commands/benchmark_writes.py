@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from concurrent.futures import ThreadPoolExecutor
+from api.benchmarks import benchmark_database, seed_models, latency_percentiles
+from api.write_queue import write_queue_stats
+import json, os, tempfile, time
+
+def run_writers(writes: int, concurrency: int, rows: int) -> tuple:
+    ''' Send single-model POSTs and PUTs (alternating) to the API from @concurrency threads.
+
+        <-- The request latencies (ms), the number of failed requests and the elapsed time (s).
+    '''
+
+    def write(index):
+        client = Client()
+        start = time.perf_counter()
+
+        try:
+            if index % 2:
+                body = {'model': 'category', 'filter': {'name': 'Category {}'.format(index % rows)}, 'fields': {'icon': 'icon_{}'.format(index)}}
+                response = client.put('/api/', json.dumps(body), content_type='application/json')
+            else:
+                body = {'model': 'category', 'fields': {'name': 'Written {}'.format(index), 'icon': 'written'}}
+                response = client.post('/api/', json.dumps(body), content_type='application/json')
+
+        finally:
+            connections.close_all()
+
+        return (time.perf_counter() - start) * 1000, response.status_code != 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(write, range(writes)))
+
+    return [latency for latency, _ in results], sum(failed for _, failed in results), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent single-model POST/PUT throughput with writes committed on each request thread against the group-commit write queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writes', type=int, default=2000, help='The number of writes sent per configuration.')
+        parser.add_argument('--concurrency', type=int, default=16, help='The number of writers at once.')
+        parser.add_argument('--rows', type=int, default=1000, help='The number of Category rows to seed (updated by PUTs).')
+        parser.add_argument('--max-batch', type=int, default=64, help='The maximum number of writes committed together.')
+        parser.add_argument('--max-delay', type=float, default=0.002, help='The maximum number of seconds the writer waits for a batch to fill.')
+        parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL'], default='FULL', help='The SQLite synchronous PRAGMA (FULL syncs to disk on every commit).')
+
+    def handle(self, *args, **options):
+        configs = {
+            'commit per request': None,
+            'group commit': {'MAX_BATCH': options['max_batch'], 'MAX_DELAY': options['max_delay']},
+        }
+
+        self.stdout.write('{} writes (POST/PUT), {} concurrent writers, synchronous={}:'.format(options['writes'], options['concurrency'], options['synchronous']))
+
+        database = connections['default'].settings_dict
+        pragmas = database.get('PRAGMAS', {})
+        database['PRAGMAS'] = dict(pragmas, synchronous=options['synchronous'])
+
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for index, (name, config) in enumerate(configs.items()):
+                    # A database file, so commits pay for the write lock and the disk like they do in production
+                    with benchmark_database(os.path.join(directory, '{}.sqlite3'.format(index))), override_settings(API_RESPONSE_CACHE=None, API_WRITE_QUEUE=config):
+                        seed_models(categories=options['rows'])
+
+                        timings, failed, elapsed = run_writers(options['writes'], options['concurrency'], options['rows'])
+                        latency = latency_percentiles(timings)
+                        stats = write_queue_stats()
+
+                        self.stdout.write('  {:<20} {:>8.1f} writes/s   p50 {:>8.2f} ms   p99 {:>8.2f} ms   failed {}{}'.format(
+                            name, len(timings) / elapsed, latency['p50'], latency['p99'], failed,
+                            '   mean batch {:.1f}'.format(stats['mean_batch']) if stats else ''))
+
+        finally:
+            database['PRAGMAS'] = pragmas
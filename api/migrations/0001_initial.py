@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The schema the API used before it had migrations. Databases created before then already have these
+# tables: apply this migration with `manage.py migrate api --fake-initial` (the tables are detected and
+# the migration recorded without running it), then 0002_field_indexes adds the indexes
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='API_Model',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('api_model_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.API_Model')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('icon', models.CharField(blank=True, max_length=255)),
+            ],
+            bases=('api.api_model',),
+        ),
+        migrations.CreateModel(
+            name='Widget',
+            fields=[
+                ('api_model_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.API_Model')),
+                ('name', models.CharField(blank=True, max_length=255)),
+            ],
+            bases=('api.api_model',),
+        ),
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('api_model_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.API_Model')),
+                ('project_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.Category')),
+            ],
+            bases=('api.api_model',),
+        ),
+    ]
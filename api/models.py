@@ -1,32 +1,52 @@
 from django.db import models
 from django.conf import settings
-import json, os
+from .template_cache import template_cache
+from .serializers import serializer_plan
+from .signals import model_written
+import os
 
 class API_Model(models.Model):
     ''' The base model for all models the API can interact with.
 
         * @supported_methods can be overidden to restrict API interaction with a model to specific methods *
+        * @aliases can be overidden with other names the model can be requested by (e.g. /api/?model=<<alias>>) *
+        * @filterable_fields and @sortable_fields can be overidden to restrict the fields queries filter and sort by.
+          Each listed field is indexed (see declare_indexes()). Fields that are already indexed are always allowed *
+        * @snapshot can be set on small, read-mostly models to answer GET queries from an in-memory copy of
+          every row instead of the database (see snapshots.Model_Snapshot) *
     ''' 
     
     supported_methods = ['ALL']
+    aliases = []
+    filterable_fields = None
+    sortable_fields = None
+    snapshot = False
 
     def to_json(self):
-        ''' Write all non-relational model data to JSON '''
+        ''' Write all non-relational model data to a JSON serializable dictionary '''
 
-        attrs_map = {}
-        ignore_field_types = [
-            models.fields.AutoField,
-            models.fields.related.OneToOneField,
-            models.fields.related.ManyToManyField,
-            models.fields.related.ForeignKey,
-        ]
-        ignore_attrs = []
+        return serializer_plan(type(self)).serialize_model(self)
 
-        for field in self._meta.fields:
-            if type(field) not in ignore_field_types:
-                attrs_map[field.name] = getattr(self, field.name, 'None')
+    @classmethod
+    def extend_json(cls, data: dict) -> dict:
+        ''' Hook to add to (or replace) the serialized data of a single model. Called by the model's
+            serializer plan for every serialized row when overridden.
 
-        return json.dumps(attrs_map)
+            --> data : The model's serialized non-relational fields.
+
+            <-- The data to return from the API.
+        '''
+
+        return data
+
+    @classmethod
+    def poll_changes(cls):
+        ''' Hook to detect changes to data a model serializes from outside the database (e.g. files).
+            Called before the model's queries are served, should record a write (see signals.model_written())
+            if anything changed.
+        '''
+
+        pass
 
     def __str__(self):
         return str(self.__class__.__name__)
@@ -34,23 +54,63 @@ class API_Model(models.Model):
     def __repr__(self):
         return '<{}: {}>'.format(self.__class__.__name__, self.__str__())
 
+
+def declare_indexes(sender, **kwargs):
+    ''' Index every field an API model declares filterable or sortable, so the indexes are picked up
+        by makemigrations.
+
+        --> sender : The model type (class) that was just created.
+    '''
+
+    if not issubclass(sender, API_Model) or sender._meta.abstract:
+        return
+
+    for name in set(sender.filterable_fields or []) | set(sender.sortable_fields or []):
+        field = sender._meta.get_field(name)
+
+        if not (field.primary_key or field.unique):
+            field.db_index = True
+
+models.signals.class_prepared.connect(declare_indexes)
+
+
 class Category(API_Model):
     name = models.CharField(max_length=255, blank=True)
     icon = models.CharField(max_length=255, blank=True)
 
+    filterable_fields = ['name', 'icon']
+    sortable_fields = ['name', 'icon']
+    snapshot = True
+
     def __str__(self):
         return str(self.name)
 
 class Project(API_Model):
     project_category = models.ForeignKey(Category, on_delete=models.CASCADE)
 
+    filterable_fields = ['project_category']
+    sortable_fields = ['project_category']
+
 class Widget(API_Model):
     name = models.CharField(max_length=255, blank=True)
 
-    def to_json(self):
+    filterable_fields = ['name']
+    sortable_fields = ['name']
+    snapshot = True
+
+    @classmethod
+    def extend_json(cls, data: dict) -> dict:
         ''' Overload to load the template as if it were any other model '''
 
-        if self.name:
-            with open(os.path.join(settings.STATIC_ROOT, 'widgets/{}.html'.format(self.name, self.name))) as template:
-                return {'name': self.name, 'template': template.read()}
+        if data.get('name'):
+            template = template_cache.get(os.path.join(settings.STATIC_ROOT, 'widgets/{}.html'.format(data['name'])))
+
+            return {'name': data['name'], 'template': template}
+
+    @classmethod
+    def poll_changes(cls):
+        ''' Overload to treat edits to the template files as writes to the widgets '''
+
+        if template_cache.poll_directory(os.path.join(settings.STATIC_ROOT, 'widgets')):
+            model_written(cls)
 
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+import bisect, threading, time
+
+# Upper bounds (in milliseconds) of the histogram buckets stage timings are aggregated into
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_state = threading.local()
+
+class Request_Profile:
+    ''' The timing breakdown of a single API request: wall time per stage, SQL query count and time
+        and the response size.
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def add_stage(self, name: str, elapsed: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        ''' Database execute wrapper timing every query run during the request. '''
+
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.sql_count += 1
+            self.sql_time += (time.perf_counter() - start) * 1000
+
+    def server_timing(self, total: float) -> str:
+        ''' Format the profile as a Server-Timing header (https://www.w3.org/TR/server-timing/). '''
+
+        metrics = ['{};dur={:.3f}'.format(name, elapsed) for name, elapsed in self.stages.items()]
+        metrics.append('sql;dur={:.3f};desc="{} queries"'.format(self.sql_time, self.sql_count))
+        metrics.append('total;dur={:.3f}'.format(total))
+
+        return ', '.join(metrics)
+
+
+class Stage_Histograms:
+    ''' Process-wide histograms of the stage timings, SQL query counts and response sizes of every
+        profiled request.
+    '''
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, value: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(BUCKETS)}
+
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['buckets'][bisect.bisect_left(BUCKETS, value)] += 1
+
+    def record_profile(self, profile: Request_Profile, total: float, response_bytes: int):
+        for name, elapsed in profile.stages.items():
+            self.record(name, elapsed)
+
+        self.record('sql', profile.sql_time)
+        self.record('sql_queries', profile.sql_count)
+        self.record('total', total)
+        self.record('response_bytes', response_bytes)
+
+    def stats(self) -> dict:
+        ''' Snapshot the histograms.
+
+            <-- The count, sum and bucket counts ({ <<upper bound>>: <<count>> }) of every histogram.
+        '''
+
+        with self._lock:
+            return {
+                name: {
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                    'buckets': {str(bound): count for bound, count in zip(BUCKETS, histogram['buckets'])},
+                }
+                for name, histogram in self._histograms.items()
+            }
+
+
+stage_histograms = Stage_Histograms()
+
+
+def profile_stage(name: str):
+    ''' Decorator timing a function as a stage of the current API request's profile. When no request is
+        being profiled the only overhead is a thread-local lookup.
+
+        --> name : The name of the stage (e.g. filter). Timings of repeated calls are added up.
+    '''
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_state, 'profile', None)
+            if profile is None:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+
+            finally:
+                profile.add_stage(name, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
+
+
+def current_profile() -> Request_Profile:
+    ''' The profile of the API request being handled on this thread (None if it is not profiled). '''
+
+    return getattr(_state, 'profile', None)
+
+
+@contextmanager
+def profiling(profile: Request_Profile):
+    ''' Record the stages and SQL queries run on this thread in a request's profile, for work done on
+        behalf of a request on another thread (e.g. writes committed by the write queue).
+
+        --> profile : The request's profile (nothing is recorded if None).
+    '''
+
+    if profile is None:
+        yield
+        return
+
+    previous, _state.profile = getattr(_state, 'profile', None), profile
+
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+
+            yield
+
+    finally:
+        _state.profile = previous
+
+
+class Profiling_Middleware:
+    ''' Profile every request to the API (paths starting with settings.API_PROFILING_PREFIX) when
+        settings.API_PROFILING is True. Each response gets a Server-Timing header and every profile is
+        aggregated into the histograms exposed at /api/stats/. Removed from the middleware chain
+        entirely when profiling is disabled.
+    '''
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_PROFILING', False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'API_PROFILING_PREFIX', '/api/')
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        profile = _state.profile = Request_Profile()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+
+                response = self.get_response(request)
+
+        finally:
+            _state.profile = None
+
+        total = (time.perf_counter() - profile.start) * 1000
+        response_bytes = 0 if response.streaming else len(response.content)
+
+        response['Server-Timing'] = profile.server_timing(total)
+        stage_histograms.record_profile(profile, total, response_bytes)
+
+        return response
@@ -0,0 +1,281 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError, FieldDoesNotExist
+from django.db.models.query import QuerySet
+from collections import OrderedDict, namedtuple
+from .errors import API_Error
+from .registry import model_registry
+import json, logging, threading
+
+# Lookups whose values are converted to the field's Python type (other lookups take the raw value)
+COERCED_LOOKUPS = frozenset(['exact', 'gt', 'gte', 'lt', 'lte', 'in', 'range'])
+
+# Separator of the values of in and range lookups in query strings (e.g. filter=id__in:1|2|3)
+VALUE_SEPARATOR = '|'
+
+# Every newly compiled query is recorded here at DEBUG level when API_LOG_QUERIES is set (see the
+# audit_query_plans command). Only the filter keys are recorded, never the values sent with a request
+query_logger = logging.getLogger('api.queries')
+
+# A single validated filter: the field path (e.g. project_category__name), the lookup and the coerced value
+Filter_Term = namedtuple('Filter_Term', ['path', 'lookup', 'value'])
+
+class Query_Plan:
+    ''' A validated, immutable GET query: the filter terms and sort fields of one model type. Compiled
+        once from the filter and sort strings sent with a request (see compile_query()) and shared by
+        every request sending the same strings.
+    '''
+
+    __slots__ = ('model_type', 'filters', 'sort', 'filter_kwargs')
+
+    def __init__(self, model_type, filters: tuple, sort: tuple):
+        self.model_type = model_type
+        self.filters = filters
+        self.sort = sort
+        self.filter_kwargs = tuple((term.path + '__' + term.lookup, term.value) for term in filters)
+
+    def filter(self, models: QuerySet) -> QuerySet:
+        ''' Apply the plan's filter to a queryset.
+
+            --> models : The queryset of models to filter.
+
+            <-- The filtered queryset.
+        '''
+
+        return models.filter(**dict(self.filter_kwargs)) if self.filters else models
+
+    def order(self, models: QuerySet) -> QuerySet:
+        ''' Apply the plan's sort to a queryset.
+
+            --> models : The queryset of models to sort.
+
+            <-- The sorted queryset.
+        '''
+
+        return models.order_by(*self.sort) if self.sort else models
+
+
+class Query_Plan_Cache:
+    ''' A process-wide, size bounded LRU cache of compiled query plans keyed by model type and the raw
+        filter and sort parameters, so repeated queries skip parsing and validation entirely.
+
+        * @max_entries bounds the number of plans held in memory (least recently used are evicted) *
+    '''
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_type, model_filter, model_sort) -> Query_Plan:
+        ''' Fetch the compiled plan of a query, compiling it on a miss.
+
+            --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+            --> model_filter : The filter parameter (a key:value string or a dictionary). Optional.
+
+            --> model_sort : The sort parameter (a comma separated string or a list). Optional.
+
+            <-- The query plan.
+        '''
+
+        key = (model_type, self._raw(model_filter), self._raw(model_sort))
+
+        with self._lock:
+            plan = self._plans.get(key)
+
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+
+                return plan
+
+            self.misses += 1
+
+        plan = Query_Plan(model_type, compile_filter(model_type, model_filter), compile_sort(model_type, model_sort))
+        if query_logger.isEnabledFor(logging.DEBUG):
+            query_logger.debug('Compiled query plan', extra={'fields': {
+                'model': model_type.__name__,
+                'filter': [term.path + '__' + term.lookup for term in plan.filters],
+                'sort': list(plan.sort),
+            }})
+
+        with self._lock:
+            self._plans[key] = plan
+
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._plans), 'max_entries': self.max_entries}
+
+    @staticmethod
+    def _raw(param) -> str:
+        if param is None or type(param) == str:
+            return param or ''
+
+        return json.dumps(param, sort_keys=True, default=str)
+
+
+query_plan_cache = Query_Plan_Cache(getattr(settings, 'API_QUERY_PLAN_CACHE_SIZE', 256))
+
+
+def compile_query(model_type, request_params: dict) -> Query_Plan:
+    ''' Fetch the compiled plan of the filter and sort parameters sent in an HTTP request
+        (e.g. /api/?model=category&filter=name__icontains:py&sort=-name).
+
+        --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+        --> request_params : The parameters sent with the request (in querystring or body).
+
+        <-- The (cached) query plan.
+    '''
+
+    return query_plan_cache.get(model_type, request_params.get('filter') or None, request_params.get('sort') or None)
+
+
+def compile_filter(model_type, model_filter) -> tuple:
+    ''' Parse and validate a filter parameter. Keys are field paths with an optional lookup
+        (e.g. name, name__icontains, project_category__name__startswith).
+
+        --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+        --> model_filter : The filter parameter (a key:value string or a dictionary). Optional.
+
+        <-- A tuple of filter terms.
+    '''
+
+    from .utilities import parse_query_pairs
+
+    if not model_filter:
+        return ()
+
+    if type(model_filter) == str:
+        model_filter = parse_query_pairs(model_filter)
+
+    if not isinstance(model_filter, dict):
+        raise API_Error('Filter must be a list of key:value pairs! (param: filter)', 400)
+
+    return tuple(compile_filter_term(model_type, str(key), value) for key, value in model_filter.items())
+
+
+def compile_filter_term(model_type, key: str, value) -> Filter_Term:
+    ''' Validate a single filter key against the model (and related models) and coerce its value
+        to the field's type.
+
+        --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+        --> key : The filter key (a field path with an optional lookup).
+
+        --> value : The value to filter by.
+
+        <-- The filter term.
+    '''
+
+    from .utilities import parse_query_flag
+
+    parts = key.split('__')
+    check_filterable(model_type, parts[0])
+
+    field = model_type._meta.get_field(parts[0])
+    path, parts = [parts[0]], parts[1:]
+
+    # Follow relations while the next part names a field of the related model
+    while parts and field.is_relation and field.related_model is not None:
+        try:
+            related_field = field.related_model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            break
+
+        if not related_field.concrete:
+            break
+
+        check_filterable(field.related_model, parts[0])
+
+        field = related_field
+        path.append(parts.pop(0))
+
+    lookup = parts.pop(0) if parts else 'exact'
+    if parts or lookup not in field.get_lookups():
+        raise API_Error('Lookup \'{}\' not supported for field: \'{}\''.format('__'.join([lookup] + parts), '__'.join(path)), 400)
+
+    if lookup == 'isnull':
+        value = value if type(value) == bool else parse_query_flag(value)
+
+    elif lookup in COERCED_LOOKUPS:
+        value = coerce_value(field, lookup, value, key)
+
+    return Filter_Term('__'.join(path), lookup, value)
+
+
+def check_filterable(model_type, name: str):
+    ''' Ensure a field exists for a model and may be filtered by (see API_Model.filterable_fields). '''
+
+    entry = model_registry.entry(model_type)
+
+    if name not in entry.fields:
+        raise API_Error('Field \'{}\' not found for model: \'{}\''.format(name, model_type.__name__), 400)
+
+    if name not in entry.filterable:
+        raise API_Error('Field \'{}\' cannot be filtered for model: \'{}\''.format(name, model_type.__name__), 400)
+
+
+def coerce_value(field, lookup: str, value, key: str):
+    ''' Convert a filter value (or the values of in and range lookups) to a field's Python type. '''
+
+    if lookup in ('in', 'range'):
+        values = value.split(VALUE_SEPARATOR) if type(value) == str else value
+        if not isinstance(values, (list, tuple)) or (lookup == 'range' and len(values) != 2):
+            raise API_Error('Invalid value for filter: \'{}\''.format(key), 400)
+
+        return tuple(coerce_value(field, 'exact', item, key) for item in values)
+
+    if field.is_relation:
+        field = field.target_field
+
+    try:
+        return field.to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        raise API_Error('Invalid value for filter: \'{}\''.format(key), 400)
+
+
+def compile_sort(model_type, model_sort) -> tuple:
+    ''' Parse and validate a sort parameter (e.g. name,-icon).
+
+        --> model_type Type[API_Model] : The type (class) of the model being queried.
+
+        --> model_sort : The sort parameter (a comma separated string or a list). Optional.
+
+        <-- A tuple of sort fields (prefixed with - for descending order).
+    '''
+
+    from .utilities import parse_query_params
+
+    if not model_sort:
+        return ()
+
+    if type(model_sort) == str:
+        model_sort = parse_query_params(model_sort)
+
+    if not isinstance(model_sort, (list, tuple)):
+        raise API_Error('Sort must be a list of fields! (param: sort)', 400)
+
+    entry = model_registry.entry(model_type)
+    for param in model_sort:
+        if type(param) != str or param.lstrip('-') not in entry.fields or param.startswith('--'):
+            raise API_Error('Field \'{}\' not found for model: \'{}\''.format(param, model_type.__name__), 400)
+
+        if param.lstrip('-') not in entry.sortable:
+            raise API_Error('Field \'{}\' cannot be sorted for model: \'{}\''.format(param, model_type.__name__), 400)
+
+    return tuple(model_sort)
@@ -0,0 +1,128 @@
+from django.db.models.signals import class_prepared
+import threading
+
+class Model_Entry:
+    ''' Everything request dispatch needs to know about one API model type, computed once.
+
+        * @fields is the frozenset of the model's field names (what validate_fields() accepts) *
+        * @lookups maps each field name to the frozenset of lookups it supports (e.g. icontains) *
+        * @filterable and @sortable are the frozensets of field names queries may filter and sort by *
+        * @methods is the frozenset of HTTP methods the model supports (see API_Model.supported_methods) *
+    '''
+
+    def __init__(self, model_type):
+        self.model_type = model_type
+        self.name = model_type.__name__
+
+        fields = model_type._meta.fields
+        self.fields = frozenset(field.name for field in fields)
+        self.lookups = {field.name: frozenset(field.get_lookups()) for field in fields}
+
+        indexed = frozenset(field.name for field in fields if field.primary_key or field.unique or field.db_index)
+        self.filterable = self._declared(getattr(model_type, 'filterable_fields', None), indexed)
+        self.sortable = self._declared(getattr(model_type, 'sortable_fields', None), indexed)
+
+        self.methods = frozenset(model_type.supported_methods)
+        self.all_methods = 'ALL' in self.methods
+
+    def allows(self, method: str) -> bool:
+        ''' Check whether the model supports an HTTP method.
+
+            --> method : The method of the HTTP request (e.g. POST).
+
+            <-- True if the model supports the method.
+        '''
+
+        return self.all_methods or method in self.methods
+
+    def _declared(self, names: list, indexed: frozenset) -> frozenset:
+        if names is None:
+            return self.fields
+
+        return frozenset(names) | indexed
+
+
+class Model_Registry:
+    ''' Registry of the API model types keyed by every name they can be requested by: the class name,
+        the lower case model name and any aliases the model declares (see API_Model.aliases). Built when
+        the app is ready (see ApiConfig.ready()) so resolving a request's model is a dictionary lookup.
+
+        * API model types defined after the registry is built (e.g. in tests) are registered as they are prepared *
+    '''
+
+    def __init__(self):
+        self._names = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, model_type):
+        ''' Add a model type (and its aliases) to the registry.
+
+            --> model_type Type[API_Model] : The type (class) of the model.
+        '''
+
+        entry = Model_Entry(model_type)
+        names = [model_type.__name__, model_type._meta.model_name] + list(getattr(model_type, 'aliases', []))
+
+        with self._lock:
+            self._entries[model_type] = entry
+            for name in names:
+                self._names[name] = entry
+                self._names[name.lower()] = entry
+
+    def get(self, model_name: str) -> Model_Entry:
+        ''' Fetch the entry of a model type by name (case insensitive).
+
+            --> model_name : The name (or alias) of the model type.
+
+            <-- The model type's entry or None if no model type is registered under the name (or it is not a string).
+        '''
+
+        if not isinstance(model_name, str):
+            return None
+
+        entry = self._names.get(model_name)
+        if entry is None:
+            entry = self._names.get(model_name.lower())
+
+        return entry
+
+    def entry(self, model_type) -> Model_Entry:
+        ''' Fetch the entry of a model type, registering it first if needed.
+
+            --> model_type Type[API_Model] : The type (class) of the model.
+
+            <-- The model type's entry.
+        '''
+
+        entry = self._entries.get(model_type)
+        if entry is None:
+            self.register(model_type)
+            entry = self._entries[model_type]
+
+        return entry
+
+    def model_types(self) -> list:
+        return list(self._entries)
+
+
+model_registry = Model_Registry()
+
+
+def build_model_registry(model_types: list):
+    ''' Register every API model type. Called once from ApiConfig.ready().
+
+        --> model_types : The types (classes) of the models to register.
+    '''
+
+    for model_type in model_types:
+        model_registry.register(model_type)
+
+    class_prepared.connect(_register_prepared_model)
+
+
+def _register_prepared_model(sender, **kwargs):
+    from .models import API_Model
+
+    if issubclass(sender, API_Model) and sender._meta.app_label == 'api' and not sender._meta.abstract:
+        model_registry.register(sender)
@@ -0,0 +1,28 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# Database alias reads are routed to when it is configured (see settings.DATABASES)
+READ_ALIAS = 'read'
+
+class Read_Write_Router:
+    ''' Route reads to the read-only connections of the 'read' database and writes to the default
+        (writer) database. Reads inside a transaction on the default database stay on it, so a
+        transaction always sees its own writes.
+
+        * Without a 'read' database every query goes to the default database *
+    '''
+
+    def db_for_read(self, model, **hints):
+        if READ_ALIAS not in connections.databases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The read database is the same database file
+        return db != READ_ALIAS
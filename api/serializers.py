@@ -0,0 +1,171 @@
+from django.db import models
+from django.db.models.query import QuerySet
+from django.core.serializers.json import DjangoJSONEncoder
+from .profiling import profile_stage
+from typing import Type
+import datetime, decimal, uuid
+
+# Relational (and auto primary key) fields are never serialized
+IGNORED_FIELD_TYPES = (
+    models.fields.AutoField,
+    models.fields.related.OneToOneField,
+    models.fields.related.ManyToManyField,
+    models.fields.related.ForeignKey,
+)
+
+# Python types that need converting before they can be written out by any JSON encoder
+CONVERTED_TYPES = {
+    models.DateTimeField: datetime.datetime,
+    models.DateField: datetime.date,
+    models.TimeField: datetime.time,
+    models.DurationField: datetime.timedelta,
+    models.DecimalField: decimal.Decimal,
+    models.UUIDField: uuid.UUID,
+}
+
+# Maximum number of field projections cached per serializer plan
+MAX_PROJECTIONS = 64
+
+_plans = {}
+
+class Serializer_Plan:
+    ''' A precomputed plan for serializing one API model type to JSON objects. The exported field
+        names, the attributes they are read from and any value converters are resolved once per model
+        type instead of once per row.
+
+        * The plan calls the model type's extend_json() hook on each row if it is overridden (e.g. Widget) *
+    '''
+
+    def __init__(self, model_type, names: tuple = None):
+        fields = [field for field in model_type._meta.fields if type(field) not in IGNORED_FIELD_TYPES]
+        if names is not None:
+            fields = [model_type._meta.get_field(name) for name in names]
+
+        self.model_type = model_type
+        self.names = tuple(field.name for field in fields)
+        self.attnames = tuple(field.attname for field in fields)
+        self.converters = tuple(self._converter(field) for field in fields)
+
+        self._convert = any(self.converters)
+        self._extend = model_type.extend_json if self._overrides_extend_json(model_type) else None
+        self._projections = {}
+
+    def project(self, names: tuple) -> 'Serializer_Plan':
+        ''' Fetch the plan serializing only some of this plan's fields (e.g. for GET /api/?fields=name,icon).
+            Projections are cached on the plan (up to MAX_PROJECTIONS of them).
+
+            --> names : The names of the fields to serialize (must be serialized by this plan).
+
+            <-- The projected serializer plan.
+        '''
+
+        if names == self.names:
+            return self
+
+        plan = self._projections.get(names)
+        if plan is None:
+            plan = Serializer_Plan(self.model_type, names)
+
+            if len(self._projections) < MAX_PROJECTIONS:
+                self._projections[names] = plan
+
+        return plan
+
+    def serialize_model(self, model: models.Model) -> dict:
+        ''' Serialize a single model instance.
+
+            --> model : The model instance to serialize.
+
+            <-- The model's non-relational fields as a JSON serializable dictionary.
+        '''
+
+        return self._finish(tuple(getattr(model, attname) for attname in self.attnames))
+
+    @profile_stage('serialize')
+    def serialize(self, models: QuerySet) -> list:
+        ''' Serialize a queryset of models in one pass over its raw values (no model instances are built).
+
+            --> models : The queryset of models to serialize.
+
+            <-- A list of JSON serializable dictionaries.
+        '''
+
+        return self.serialize_rows(models.values_list(*self.attnames))
+
+    def iterate(self, models: QuerySet, chunk_size: int):
+        ''' Lazily serialize a queryset of models while reading it from the database in chunks.
+
+            --> models : The queryset of models to serialize.
+
+            --> chunk_size : The number of rows to read from the database at a time.
+
+            <-- A generator of JSON serializable dictionaries.
+        '''
+
+        rows = models.values_list(*self.attnames).iterator(chunk_size=chunk_size)
+
+        if not self._convert and not self._extend:
+            names = self.names
+            return (dict(zip(names, row)) for row in rows)
+
+        return (self._finish(row) for row in rows)
+
+    def serialize_rows(self, rows) -> list:
+        ''' Serialize rows of raw values already read (e.g. from a model snapshot).
+
+            --> rows : The values of the plan's attributes (attnames) for each model.
+
+            <-- A list of JSON serializable dictionaries.
+        '''
+
+        if not self._convert and not self._extend:
+            names = self.names
+            return [dict(zip(names, row)) for row in rows]
+
+        return [self._finish(row) for row in rows]
+
+    def _finish(self, row: tuple) -> dict:
+        if self._convert:
+            row = [value if converter is None or value is None else converter(value) for converter, value in zip(self.converters, row)]
+
+        data = dict(zip(self.names, row))
+
+        return self._extend(data) if self._extend else data
+
+    @staticmethod
+    def _converter(field: models.Field):
+        for field_type in CONVERTED_TYPES:
+            if isinstance(field, field_type):
+                return DjangoJSONEncoder().default
+
+    @staticmethod
+    def _overrides_extend_json(model_type) -> bool:
+        from .models import API_Model
+
+        return getattr(model_type.extend_json, '__func__', None) is not API_Model.extend_json.__func__
+
+
+def serializer_plan(model_type: Type[models.Model]) -> Serializer_Plan:
+    ''' Fetch the serializer plan for a model type. Plans are built for every API model when the
+        app is ready (see build_serializer_plans()) and lazily for any model type defined later.
+
+        --> model_type : The type (class) of the model to serialize.
+
+        <-- The model type's serializer plan.
+    '''
+
+    plan = _plans.get(model_type)
+    if plan is None:
+        plan = _plans[model_type] = Serializer_Plan(model_type)
+
+    return plan
+
+
+def build_serializer_plans(model_types: list):
+    ''' Build the serializer plan of every API model type. Called once from ApiConfig.ready().
+
+        --> model_types : The types (classes) of the models to build plans for.
+    '''
+
+    for model_type in model_types:
+        _plans[model_type] = Serializer_Plan(model_type)
@@ -0,0 +1,273 @@
+from django.conf import settings
+import hashlib, mmap, os, struct, threading, time, uuid, zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b'APISHM01'
+
+# Header: magic, token, version slots, cache buckets, data size, next write position
+HEADER = struct.Struct('<8s16sIIQQ')
+HEADER_SIZE = 4096
+POSITION_OFFSET = HEADER.size - 8
+
+# Version slot: counter and name (NUL padded)
+SLOT = struct.Struct('<Q56s')
+
+# Cache bucket: key hash, record offset, record length, expiry time
+BUCKET = struct.Struct('<QQI4xd')
+
+# Cache record (followed by the key, a newline and the payload): key hash, payload length, CRC-32
+RECORD = struct.Struct('<QII')
+
+class Shared_Memory_Store:
+    ''' A memory-mapped file shared by every worker process on the host, holding per-name version counters
+        and a cache of payloads (bytes) keyed by string.
+
+        Reads never lock: counters are aligned 8-byte words, and cached payloads are checked against the
+        hash and CRC-32 stored with them (a record overwritten while it is read is a miss). Writes (bumping
+        counters, caching payloads) take an exclusive lock on the file, so they are atomic across processes.
+
+        Payloads are appended to a ring buffer; the oldest payloads are overwritten once it is full. Each
+        key hashes to a single bucket, the newest payload cached under a colliding key wins.
+
+        * @path is the file to map (created and initialized if it does not exist) *
+        * @size is the number of bytes available to cached payloads *
+        * @version_slots is the maximum number of counters *
+        * @cache_buckets is the maximum number of cached payloads *
+    '''
+
+    def __init__(self, path: str, size: int = 64 * 1024 * 1024, version_slots: int = 1024, cache_buckets: int = 16384):
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with self._locked():
+            header = os.pread(self._descriptor, HEADER.size, 0)
+
+            if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+                layout_size = HEADER_SIZE + version_slots * SLOT.size + cache_buckets * BUCKET.size
+                os.ftruncate(self._descriptor, 0)
+                os.ftruncate(self._descriptor, layout_size + size)
+                os.pwrite(self._descriptor, HEADER.pack(MAGIC, uuid.uuid4().bytes, version_slots, cache_buckets, size, 0), 0)
+
+            # An existing store keeps the layout it was created with
+            _, token, self.version_slots, self.cache_buckets, self.size, _ = HEADER.unpack(os.pread(self._descriptor, HEADER.size, 0))
+
+        self.token = token.hex()
+
+        self._slots_offset = HEADER_SIZE
+        self._buckets_offset = self._slots_offset + self.version_slots * SLOT.size
+        self._data_offset = self._buckets_offset + self.cache_buckets * BUCKET.size
+
+        self.memory = mmap.mmap(self._descriptor, self._data_offset + self.size)
+
+    def counter(self, name: str) -> int:
+        ''' Read a counter (without locking).
+
+            --> name : The name of the counter.
+
+            <-- The counter's value (0 if it was never bumped).
+        '''
+
+        slot = self._find_slot(self._encode_name(name))
+
+        return SLOT.unpack_from(self.memory, slot)[0] if slot is not None else 0
+
+    def bump(self, names: list):
+        ''' Atomically increment one or more counters (across every process sharing the store).
+
+            --> names : The names of the counters.
+        '''
+
+        with self._locked():
+            for name in names:
+                encoded = self._encode_name(name)
+                slot = self._find_slot(encoded, insert=True)
+                counter, _ = SLOT.unpack_from(self.memory, slot)
+
+                struct.pack_into('<Q', self.memory, slot, counter + 1)
+                if counter == 0:
+                    self.memory[slot + 8:slot + SLOT.size] = encoded
+
+    def counters(self) -> dict:
+        ''' Read every counter (without locking).
+
+            <-- The value of every counter bumped so far, keyed by name.
+        '''
+
+        counters = {}
+        for index in range(self.version_slots):
+            counter, name = SLOT.unpack_from(self.memory, self._slots_offset + index * SLOT.size)
+            name = name.rstrip(b'\0')
+
+            if counter and name:
+                counters[name.decode('utf-8')] = counter
+
+        return counters
+
+    def get(self, key: str) -> bytes:
+        ''' Read a cached payload (without locking).
+
+            --> key : The payload's key.
+
+            <-- The payload or None if it is not cached, expired or was overwritten.
+        '''
+
+        encoded = key.encode('utf-8')
+        key_hash = self._hash(encoded)
+
+        bucket_hash, offset, length, expires = BUCKET.unpack_from(self.memory, self._bucket(key_hash))
+        if bucket_hash != key_hash or expires < time.time() or offset + length > self.size:
+            self.misses += 1
+            return None
+
+        start = self._data_offset + offset
+        record_hash, payload_length, crc = RECORD.unpack_from(self.memory, start)
+        record = self.memory[start + RECORD.size:start + RECORD.size + payload_length]
+
+        if record_hash != key_hash or RECORD.size + payload_length != length or zlib.crc32(record) != crc:
+            self.misses += 1
+            return None
+
+        record_key, _, payload = record.partition(b'\n')
+        if record_key != encoded:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return payload
+
+    def set(self, key: str, payload: bytes, timeout: float):
+        ''' Cache a payload, overwriting the oldest payloads if the store is full. Payloads larger than a
+            quarter of the store are not cached.
+
+            --> key : The payload's key (must not contain a newline).
+
+            --> payload : The payload.
+
+            --> timeout : The number of seconds the payload is kept.
+        '''
+
+        encoded = key.encode('utf-8')
+        key_hash = self._hash(encoded)
+        record = encoded + b'\n' + payload
+        length = RECORD.size + len(record)
+
+        if length > self.size // 4:
+            return
+
+        with self._locked():
+            position = struct.unpack_from('<Q', self.memory, POSITION_OFFSET)[0]
+            if position + length > self.size:
+                position = 0
+
+            start = self._data_offset + position
+            RECORD.pack_into(self.memory, start, key_hash, len(record), zlib.crc32(record))
+            self.memory[start + RECORD.size:start + length] = record
+
+            BUCKET.pack_into(self.memory, self._bucket(key_hash), key_hash, position, length, time.time() + timeout)
+            struct.pack_into('<Q', self.memory, POSITION_OFFSET, (position + length + 7) // 8 * 8)
+
+    def clear(self):
+        ''' Drop every cached payload (counters are kept). '''
+
+        with self._locked():
+            self.memory[self._buckets_offset:self._data_offset] = bytes(self._data_offset - self._buckets_offset)
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes': self.size,
+            'used': struct.unpack_from('<Q', self.memory, POSITION_OFFSET)[0],
+            'counters': len(self.counters()),
+        }
+
+    def _locked(self):
+        return _File_Lock(self._lock, self._descriptor)
+
+    def _find_slot(self, encoded: bytes, insert: bool = False) -> int:
+        start = zlib.crc32(encoded) % self.version_slots
+
+        for probe in range(self.version_slots):
+            slot = self._slots_offset + (start + probe) % self.version_slots * SLOT.size
+            counter, name = SLOT.unpack_from(self.memory, slot)
+
+            if name == encoded:
+                return slot
+
+            if not counter:
+                return slot if insert else None
+
+        if insert:
+            raise RuntimeError('Shared memory store has no free version slots: \'{}\''.format(self.path))
+
+    def _bucket(self, key_hash: int) -> int:
+        return self._buckets_offset + key_hash % self.cache_buckets * BUCKET.size
+
+    @staticmethod
+    def _encode_name(name: str) -> bytes:
+        encoded = name.encode('utf-8')
+        if len(encoded) > SLOT.size - 8:
+            encoded = hashlib.blake2b(encoded, digest_size=16).hexdigest().encode('ascii')
+
+        return encoded.ljust(SLOT.size - 8, b'\0')
+
+    @staticmethod
+    def _hash(encoded: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little') | 1
+
+
+class _File_Lock:
+    ''' Excludes other threads (threading lock) and other processes (POSIX record lock, which unlike
+        flock() is not shared with forked workers).
+    '''
+
+    def __init__(self, lock: threading.Lock, descriptor: int):
+        self.lock = lock
+        self.descriptor = descriptor
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self.descriptor, fcntl.LOCK_EX)
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.lockf(self.descriptor, fcntl.LOCK_UN)
+
+        self.lock.release()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def shared_memory_store() -> Shared_Memory_Store:
+    ''' Fetch the store shared by the worker processes (settings.API_SHARED_MEMORY: the path of the
+        file to map, API_SHARED_MEMORY_SIZE: the bytes available to cached payloads).
+
+        <-- The shared memory store or None if it is not configured.
+    '''
+
+    path = getattr(settings, 'API_SHARED_MEMORY', None)
+    if not path:
+        return None
+
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+
+            if store is None:
+                store = _stores[path] = Shared_Memory_Store(path, getattr(settings, 'API_SHARED_MEMORY_SIZE', 64 * 1024 * 1024))
+
+    return store
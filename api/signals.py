@@ -0,0 +1,93 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from contextlib import contextmanager
+from .cache import get_response_cache
+from .versions import model_versions
+from .snapshots import invalidate_snapshots
+from .change_feed import record_change
+import threading
+
+_batches = threading.local()
+
+def affected_model_types(model_type) -> set:
+    ''' Find every model type whose query results may change when a model type is written to: the 
+        model type itself, the model types it inherits from and the model types that reference it 
+        (which may be cascaded to).
+
+        --> model_type Type[API_Model] : The type (class) of the model written to.
+
+        <-- The affected model types.
+    '''
+
+    model_types = [model_type] + model_type._meta.get_parent_list()
+    model_types += [relation.related_model for relation in model_type._meta.related_objects]
+
+    return set(model_types)
+
+
+def model_written(model_type, pk = None):
+    ''' Record a write to a model type: bump the version of every affected model type and invalidate
+        their cached queries and snapshots. Inside a transaction this is repeated once it commits, so reads
+        racing the transaction cannot re-cache uncommitted state.
+
+        --> model_type Type[API_Model] : The type (class) of the model written to.
+
+        --> pk : The primary key of the single model saved or deleted. Optional - any model of the type may
+                 have changed if not set.
+    '''
+
+    model_types = affected_model_types(model_type)
+
+    def notify():
+        model_versions.bump([affected_type.__name__ for affected_type in model_types])
+        get_response_cache().invalidate(model_types)
+        invalidate_snapshots(model_types, model_type, pk)
+
+    notify()
+
+    # Single models saved or deleted are streamed by the change feed as they are, any other write as a refresh
+    if pk is None:
+        record_change(model_type, 'refresh')
+
+    if connection.in_atomic_block:
+        transaction.on_commit(notify)
+
+
+@contextmanager
+def batched_writes():
+    ''' Defer the write records of every model saved or deleted by this thread inside the block
+        and record each written model type once on exit (e.g. for bulk requests). Nothing is recorded
+        if the block raises (its writes were rolled back).
+    '''
+
+    if getattr(_batches, 'model_types', None) is not None:
+        yield
+        return
+
+    _batches.model_types = set()
+
+    try:
+        yield
+        model_types = _batches.model_types
+
+    finally:
+        _batches.model_types = None
+
+    for model_type in model_types:
+        model_written(model_type)
+
+
+def _model_written(sender, **kwargs):
+    from .models import API_Model
+
+    if issubclass(sender, API_Model):
+        batch = getattr(_batches, 'model_types', None)
+
+        if batch is not None:
+            batch.add(sender)
+        else:
+            model_written(sender, kwargs['instance'].pk)
+
+# Every saved or deleted model instance (through the API, the admin or cascades) is recorded
+post_save.connect(_model_written, dispatch_uid='api_post_save')
+post_delete.connect(_model_written, dispatch_uid='api_post_delete')
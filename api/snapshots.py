@@ -0,0 +1,377 @@
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_migrate
+from .registry import model_registry
+from .versions import model_versions
+import bisect, operator, threading, time
+
+# Lookups answered from snapshots (any other lookup, or a filter across a relation, is run by the database)
+COMPARISONS = {'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+TEXT_LOOKUPS = frozenset(['iexact', 'contains', 'icontains', 'startswith', 'istartswith', 'endswith', 'iendswith'])
+
+# SQLite's LIKE (used for all text lookups) only folds the case of ASCII letters
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+class Max_Key:
+    ''' Sorts after every primary key (the upper bound of an index range). '''
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+MAX_KEY = Max_Key()
+
+def sort_key(value) -> tuple:
+    ''' The key a column value is sorted by: NULLs first (as in SQLite), then by value. '''
+
+    return (value is not None, value)
+
+
+class Model_Snapshot:
+    ''' An in-process, columnar copy of every row of one API model type (see API_Model.snapshot), so the
+        filters and sorts of GET queries on small, read-mostly models are answered without SQL.
+
+        Each column is a list holding one value per row slot. Every filterable and sortable field (and the
+        primary key) also has an index: a sorted list of (value, primary key) pairs, searched with bisect
+        for exact, in, range and comparison lookups.
+
+        The snapshot is loaded on first use and kept up to date with the writes this process records
+        (see signals.model_written()): rows saved or deleted one at a time are re-read individually before the
+        next query, any other write reloads every row. Writes made by other processes are picked up from the
+        model's version when versions are shared (see settings.API_SHARED_MEMORY), and by reloading at least
+        once every @max_age seconds.
+
+        * @model_type is the type (class) of the models held *
+    '''
+
+    def __init__(self, model_type, max_age: float = 5.0):
+        self.model_type = model_type
+        self.max_age = max_age
+
+        fields = model_type._meta.concrete_fields
+        entry = model_registry.entry(model_type)
+
+        self.fields = {field.name: field for field in fields}
+        self.attnames = tuple(field.attname for field in fields)
+        self.pk = model_type._meta.pk.attname
+
+        self.columns = {attname: [] for attname in self.attnames}
+        self.indexes = {field.attname: [] for field in fields if field.primary_key or field.name in entry.filterable | entry.sortable}
+        self.slots = {}  # primary key -> row slot
+        self.free = []
+
+        self.loads = 0
+        self.updates = 0
+        self.queries = 0
+        self.fallbacks = 0
+
+        self._loaded_at = None
+        self._version = None
+        self._touched = set()
+        self._lock = threading.Lock()
+
+    def invalidate(self, pk = None):
+        ''' Record a write to the model type.
+
+            --> pk : The primary key of the single row saved or deleted. Optional - every row is reloaded if not set.
+        '''
+
+        with self._lock:
+            if pk is None:
+                self._loaded_at = None
+            elif self._loaded_at is not None:
+                self._touched.add(pk)
+
+    def query(self, plan, attnames: tuple) -> list:
+        ''' Run a compiled GET query (see query_plans.Query_Plan) against the snapshot.
+
+            --> plan : The query plan (filter terms and sort fields).
+
+            --> attnames : The attributes (columns) to return for each row.
+
+            <-- The values of each matching row in sorted order, or None if the query cannot be answered
+                from the snapshot (it must then be run by the database).
+        '''
+
+        predicates = [self._predicate(term) for term in plan.filters]
+        sort = [(self.fields[param.lstrip('-')].attname, param.startswith('-')) for param in plan.sort]
+
+        if None in predicates:
+            self.fallbacks += 1
+            return None
+
+        with self._lock:
+            self._refresh()
+
+            slots = self._candidates(plan.filters, sort)
+            for attname, test in predicates:
+                column = self.columns[attname]
+                slots = [slot for slot in slots if test(column[slot])]
+
+            if len(sort) > 1 or (sort and not self._sorted_by(slots, sort)):
+                for attname, descending in reversed(sort):
+                    column = self.columns[attname]
+                    slots.sort(key=lambda slot: sort_key(column[slot]), reverse=descending)
+
+            columns = [self.columns[attname] for attname in attnames]
+            rows = [tuple(column[slot] for column in columns) for slot in slots]
+
+            self.queries += 1
+
+        return rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'rows': len(self.slots), 'loads': self.loads, 'updates': self.updates, 'queries': self.queries, 'fallbacks': self.fallbacks}
+
+    def _predicate(self, term) -> tuple:
+        ''' Build the test a column value must pass to match a filter term (None if unsupported). '''
+
+        field = self.fields.get(term.path)
+        lookup, value = term.lookup, term.value
+
+        if field is None:
+            return None
+
+        if lookup == 'isnull' or (lookup == 'exact' and value is None):
+            expected = value if lookup == 'isnull' else True
+            return field.attname, lambda column_value: (column_value is None) == expected
+
+        if value is None:
+            return None
+
+        if lookup == 'exact':
+            return field.attname, lambda column_value: column_value == value
+
+        if lookup in COMPARISONS:
+            compare = COMPARISONS[lookup]
+            return field.attname, lambda column_value: column_value is not None and compare(column_value, value)
+
+        if lookup == 'in':
+            values = frozenset(value)
+            return field.attname, lambda column_value: column_value in values
+
+        if lookup == 'range':
+            low, high = value
+            return field.attname, lambda column_value: column_value is not None and low <= column_value <= high
+
+        if lookup in TEXT_LOOKUPS and isinstance(field, (models.CharField, models.TextField)) and type(value) == str:
+            value = value.translate(ASCII_LOWER)
+            match = {
+                'iexact': operator.eq,
+                'contains': operator.contains,
+                'icontains': operator.contains,
+                'startswith': str.startswith,
+                'istartswith': str.startswith,
+                'endswith': str.endswith,
+                'iendswith': str.endswith,
+            }[lookup]
+
+            return field.attname, lambda column_value: column_value is not None and match(column_value.translate(ASCII_LOWER), value)
+
+        return None
+
+    def _candidates(self, terms: tuple, sort: list) -> list:
+        ''' Narrow the rows to scan with the index of the first indexed filter term (every row otherwise,
+            in the order of the first sort field if it is indexed, or by primary key).
+        '''
+
+        for term in terms:
+            attname = self.fields[term.path].attname
+            index = self.indexes.get(attname)
+
+            if index is not None and term.value is not None and term.lookup in ('exact', 'in', 'range', 'gt', 'gte', 'lt', 'lte'):
+                ranges = self._index_ranges(index, term.lookup, term.value)
+                return [self.slots[pk] for start, end in ranges for _, pk in index[start:end]]
+
+        attname, descending = sort[0] if sort and sort[0][0] in self.indexes else (self.pk, False)
+        pks = [pk for _, pk in self.indexes[attname]]
+
+        return [self.slots[pk] for pk in (reversed(pks) if descending else pks)]
+
+    @staticmethod
+    def _index_ranges(index: list, lookup: str, value) -> list:
+        def lower(value):
+            return bisect.bisect_left(index, (sort_key(value),))
+
+        def upper(value):
+            return bisect.bisect_left(index, (sort_key(value), MAX_KEY))
+
+        first, end = bisect.bisect_left(index, ((True,),)), len(index)
+
+        if lookup == 'exact':
+            return [(lower(value), upper(value))]
+
+        if lookup == 'in':
+            return [(lower(item), upper(item)) for item in sorted(set(value))]
+
+        if lookup == 'range':
+            return [(lower(value[0]), upper(value[1]))]
+
+        return [{
+            'gt': (upper(value), end),
+            'gte': (lower(value), end),
+            'lt': (first, lower(value)),
+            'lte': (first, upper(value)),
+        }[lookup]]
+
+    def _sorted_by(self, slots: list, sort: list) -> bool:
+        # Candidates read from the sort field's own index are already in order
+        attname, descending = sort[0]
+        column = self.columns[attname]
+        keys = [sort_key(column[slot]) for slot in slots]
+
+        return all((a >= b) if descending else (a <= b) for a, b in zip(keys, keys[1:]))
+
+    def _refresh(self):
+        # A version bumped without rows being touched is a write recorded by another worker process
+        version = model_versions.get(self.model_type.__name__)
+        changed_elsewhere = version != self._version and not self._touched
+
+        if self._loaded_at is None or changed_elsewhere or time.monotonic() - self._loaded_at >= self.max_age:
+            self._load()
+
+        elif self._touched:
+            touched, self._touched = self._touched, set()
+            self._update(touched)
+
+        self._version = version
+
+    def _load(self):
+        rows = list(self.model_type.objects.order_by().values_list(*self.attnames))
+        pk_position = self.attnames.index(self.pk)
+
+        self.columns = {attname: [row[position] for row in rows] for position, attname in enumerate(self.attnames)}
+        self.slots = {row[pk_position]: slot for slot, row in enumerate(rows)}
+        self.free = []
+
+        for attname in self.indexes:
+            column = self.columns[attname]
+            self.indexes[attname] = sorted((sort_key(column[slot]), pk) for pk, slot in self.slots.items())
+
+        self._touched = set()
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+
+    def _update(self, pks: set):
+        rows = self.model_type.objects.order_by().filter(pk__in=pks).values_list(*self.attnames)
+        pk_position = self.attnames.index(self.pk)
+
+        for row in rows:
+            pk = row[pk_position]
+            pks.discard(pk)
+
+            if pk in self.slots:
+                self._unindex(pk)
+                slot = self.slots[pk]
+            else:
+                slot = self.free.pop() if self.free else self._append_slot()
+                self.slots[pk] = slot
+
+            for position, attname in enumerate(self.attnames):
+                self.columns[attname][slot] = row[position]
+
+            for attname, index in self.indexes.items():
+                bisect.insort(index, (sort_key(self.columns[attname][slot]), pk))
+
+        # Rows that no longer exist were deleted
+        for pk in pks:
+            if pk in self.slots:
+                self._unindex(pk)
+                slot = self.slots.pop(pk)
+
+                for column in self.columns.values():
+                    column[slot] = None
+
+                self.free.append(slot)
+
+        self.updates += 1
+
+    def _append_slot(self) -> int:
+        for column in self.columns.values():
+            column.append(None)
+
+        return len(self.columns[self.pk]) - 1
+
+    def _unindex(self, pk):
+        slot = self.slots[pk]
+
+        for attname, index in self.indexes.items():
+            del index[bisect.bisect_left(index, (sort_key(self.columns[attname][slot]), pk))]
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def model_snapshot(model_type) -> Model_Snapshot:
+    ''' Fetch the snapshot of a model type (created on first use).
+
+        --> model_type Type[API_Model] : The type (class) of the model.
+
+        <-- The model type's snapshot or None if the model type does not keep one (or snapshots are
+            disabled with settings.API_SNAPSHOTS).
+    '''
+
+    if not getattr(model_type, 'snapshot', False) or not getattr(settings, 'API_SNAPSHOTS', True):
+        return None
+
+    snapshot = _snapshots.get(model_type)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.setdefault(model_type, Model_Snapshot(model_type, getattr(settings, 'API_SNAPSHOT_MAX_AGE', 5.0)))
+
+    return snapshot
+
+
+def query_snapshot(model_type, plan, attnames: tuple) -> list:
+    ''' Answer a compiled GET query from the model type's snapshot, if it keeps one. Queries run inside a
+        transaction are always run by the database (they must see the transaction's own writes).
+
+        --> model_type Type[API_Model] : The type (class) of the models requested.
+
+        --> plan : The compiled query (see query_plans.compile_query()).
+
+        --> attnames : The attributes (columns) to return for each row.
+
+        <-- The values of each matching row in sorted order, or None if the query must be run by the database.
+    '''
+
+    snapshot = model_snapshot(model_type)
+
+    if snapshot is None or transaction.get_connection().in_atomic_block:
+        return None
+
+    return snapshot.query(plan, attnames)
+
+
+def invalidate_snapshots(model_types: set, written_type, pk = None):
+    ''' Record a write in the snapshots it affects (see signals.model_written()).
+
+        --> model_types : The types (classes) of the models whose data may have changed.
+
+        --> written_type : The type (class) of the model written to.
+
+        --> pk : The primary key of the single row saved or deleted. Optional.
+    '''
+
+    for model_type in model_types:
+        snapshot = _snapshots.get(model_type)
+
+        # A row of a parent model type (model inheritance) shares its primary key with the child's row
+        if snapshot is not None:
+            single_row = model_type is written_type or written_type in model_type._meta.get_parent_list()
+            snapshot.invalidate(pk if single_row else None)
+
+
+def snapshot_stats() -> dict:
+    return {model_type.__name__: snapshot.stats() for model_type, snapshot in list(_snapshots.items())}
+
+
+def _reload_snapshots(**kwargs):
+    # Tables may have been rebuilt or flushed
+    for snapshot in list(_snapshots.values()):
+        snapshot.invalidate()
+
+post_migrate.connect(_reload_snapshots, dispatch_uid='api_reload_snapshots')
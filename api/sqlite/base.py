@@ -0,0 +1,98 @@
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+import queue, threading
+
+# PRAGMAs run on every new connection (overridden per database with settings.DATABASES[<<alias>>]['PRAGMAS'])
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',       # Readers never block the writer (or each other)
+    'synchronous': 'NORMAL',     # Safe with WAL, fsyncs at checkpoints instead of every commit
+    'mmap_size': 268435456,      # Read pages through a 256MB memory map instead of read() calls
+    'cache_size': -65536,        # 64MB page cache per connection
+    'busy_timeout': 5000,        # Wait up to 5s for the write lock instead of failing immediately
+    'temp_store': 'MEMORY',
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    ''' SQLite backend tuned for serving the API from a single database file.
+
+        Every new connection is configured with DEFAULT_PRAGMAS (WAL mode, relaxed syncing, memory mapped
+        reads, a larger page cache and a busy timeout). Closed connections are returned to a per-database
+        pool of idle connections and reused instead of being reopened (unless they raised a database error
+        or cannot be reset). Connections of a database with
+        READ_ONLY set are opened with query_only so they can never write, write transactions on other
+        connections take the write lock up front (BEGIN IMMEDIATE) so concurrent writers queue on the
+        busy timeout instead of failing to upgrade their lock.
+
+        * settings.DATABASES[<<alias>>]['POOL_SIZE'] bounds the number of idle connections kept (default 8) *
+        * settings.DATABASES[<<alias>>]['PRAGMAS'] overrides or adds PRAGMAs *
+        * settings.DATABASES[<<alias>>]['READ_ONLY'] makes every connection read-only *
+    '''
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool().get_nowait()
+        except queue.Empty:
+            pass
+
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        pragmas = dict(DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {}))
+        if self.settings_dict.get('READ_ONLY'):
+            pragmas['query_only'] = 'ON'
+
+        for name, value in pragmas.items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        # Connections that raised database errors or fail to reset are really closed, never reused
+        if self.errors_occurred or not self.reset_connection():
+            return super(DatabaseWrapper, self)._close()
+
+        try:
+            self.pool().put_nowait(self.connection)
+        except queue.Full:
+            super(DatabaseWrapper, self)._close()
+
+    def reset_connection(self) -> bool:
+        ''' Return the connection to an idle state (roll back any open transaction) and check it still works.
+
+            <-- True if the connection can be reused.
+        '''
+
+        try:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+
+            self.connection.execute('SELECT 1').fetchone()
+
+        except Database.Error:
+            return False
+
+        return not self.connection.in_transaction
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN' if self.settings_dict.get('READ_ONLY') else 'BEGIN IMMEDIATE')
+
+    def pool(self) -> queue.LifoQueue:
+        ''' Fetch the pool of idle connections to this database (shared by every alias with the same
+            NAME and READ_ONLY setting).
+
+            <-- The pool (most recently used connections first).
+        '''
+
+        key = (self.settings_dict['NAME'], bool(self.settings_dict.get('READ_ONLY')))
+
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.setdefault(key, queue.LifoQueue(self.settings_dict.get('POOL_SIZE', 8)))
+
+        return pool
@@ -0,0 +1,151 @@
+from django.conf import settings
+from collections import OrderedDict
+import os, threading, time
+
+class Template_Cache:
+    ''' A process-wide, size bounded LRU cache of widget template files.
+
+        Templates are served from memory and only re-read from disk when the file's
+        modification time (or size) changes. To keep hits free of syscalls, a cached file
+        is only stat()ed once every @check_interval seconds.
+
+        * @max_entries bounds the number of templates held in memory (least recently used are evicted) *
+        * @check_interval is the number of seconds a cached template is trusted before it is re-validated *
+    '''
+
+    def __init__(self, max_entries: int = 64, check_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()  # path -> [contents, signature, last_checked]
+        self._directories = {}         # directory -> [{file name: signature}, last_checked]
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> str:
+        ''' Fetch the contents of a template file, reading it from disk only on a miss or
+            if the file changed since it was cached.
+
+            --> path : The absolute path of the template file.
+
+            <-- The contents of the template file.
+        '''
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None:
+                if now - entry[2] < self.check_interval or self._is_fresh(path, entry, now):
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+
+                    return entry[0]
+
+                del self._entries[path]
+                self.invalidations += 1
+
+            self.misses += 1
+
+        contents, signature = self._read(path)
+
+        with self._lock:
+            self._entries[path] = [contents, signature, now]
+            self._entries.move_to_end(path)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return contents
+
+    def poll_directory(self, directory: str) -> bool:
+        ''' Check whether any file in a template directory was added, removed or modified since the
+            directory was last polled. The directory is scanned at most once every @check_interval seconds.
+
+            --> directory : The absolute path of the template directory.
+
+            <-- True if the directory changed since the last scan (False on the first scan).
+        '''
+
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._directories.get(directory)
+            if state is not None and now - state[1] < self.check_interval:
+                return False
+
+        try:
+            signatures = {entry.name: self._signature(entry.stat()) for entry in os.scandir(directory) if entry.is_file()}
+        except OSError:
+            signatures = {}
+
+        with self._lock:
+            previous = self._directories.get(directory)
+            self._directories[directory] = [signatures, now]
+
+        return previous is not None and previous[0] != signatures
+
+    def invalidate(self, path: str = None):
+        ''' Drop one template (or every template if no path is supplied) from the cache.
+
+            --> path : The absolute path of the template file to drop. Optional.
+        '''
+
+        with self._lock:
+            if path is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+
+            elif self._entries.pop(path, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        ''' Snapshot the cache counters.
+
+            <-- The hit, miss, eviction and invalidation counts as well as the current and maximum size.
+        '''
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+    def _is_fresh(self, path: str, entry: list, now: float) -> bool:
+        ''' Re-validate a cached entry against the file on disk. Must be called with the lock held. '''
+
+        try:
+            fresh = self._signature(os.stat(path)) == entry[1]
+        except OSError:
+            return False
+
+        if fresh:
+            entry[2] = now
+
+        return fresh
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> tuple:
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, path: str) -> tuple:
+        with open(path) as template:
+            signature = self._signature(os.fstat(template.fileno()))
+
+            return template.read(), signature
+
+
+template_cache = Template_Cache(
+    getattr(settings, 'API_TEMPLATE_CACHE_SIZE', 64),
+    getattr(settings, 'API_TEMPLATE_CACHE_CHECK_INTERVAL', 1.0),
+)
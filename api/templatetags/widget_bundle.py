@@ -0,0 +1,16 @@
+from django import template
+from ..bundles import widget_bundle
+
+register = template.Library()
+
+@register.simple_tag
+def widget_bundle_url(bundle_format: str = 'css') -> str:
+    ''' The versioned URL of the current widget bundle (e.g. {% widget_bundle_url 'css' %}). Versioned
+        URLs are served with long-lived cache headers, so pages always link the current version.
+
+        --> bundle_format : The format of the bundle (css).
+
+        <-- The URL of the bundle.
+    '''
+
+    return '/api/bundle/?v={}&format={}'.format(widget_bundle().version, bundle_format)
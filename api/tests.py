@@ -1,6 +1,31 @@
-from django.test import TestCase, Client
-from django.db import models
-from .models import API_Model
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.conf import settings
+from django.db import models, connection, transaction
+from .models import API_Model, Category, Project, Widget
+from .template_cache import Template_Cache, template_cache
+from .serializers import serializer_plan
+from .registry import model_registry
+from .bundles import Widget_Bundle
+from .utilities import accepted_encodings
+from .query_plans import Query_Plan_Cache, compile_query
+from .errors import API_Error
+from .cache import get_response_cache
+from .profiling import stage_histograms
+from .logging_handlers import Async_File_Handler, JSON_Formatter
+from .asgi import ASGI_Handler
+from .shared_memory import Shared_Memory_Store
+from .versions import Model_Versions, Shared_Model_Versions, model_versions
+from .cache import Response_Cache, File_Backend, Shared_Memory_Backend
+from .write_queue import Write_Queue, get_write_queue
+from .change_feed import Event_Log, event_log
+from .signals import batched_writes
+from .snapshots import Model_Snapshot, model_snapshot
+from .load_testing import parse_mix, build_workload, run_in_process, compare_results
+from django.core.wsgi import get_wsgi_application
+import asyncio, datetime, decimal, gzip, logging, multiprocessing, random, threading, time, uuid
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import json, os, shutil, tempfile
 
 client = Client(HTTP_USER_AGENT='Mozilla/5.0')
 # TODO - UPDATE
@@ -8,6 +33,14 @@ class Test_Model(API_Model):
     _str = models.CharField(max_length=255, blank=True)
     _bool = models.BooleanField(default=False)
     _rel = models.ForeignKey(API_Model, on_delete=models.CASCADE)
+
+    class Meta:
+        managed = False
+
+def setUpModule():
+    # Test_Model has no migration (it is created here), deleting any API model cascades to its table
+    with connection.schema_editor() as editor:
+        editor.create_model(Test_Model)
     
 class API_Test(TestCase):
     _method = None  # VIRTUAL: OVERRIDE FOR SPECIFIC METHOD TESTS
@@ -108,4 +141,1360 @@ class DELETE_Tests(API_Test):
 
         #TODO - TEST DELETING MODEL
 
-        print('4/4 {} Complete!'.format(self.__class__.__name__))
\ No newline at end of file
+        print('4/4 {} Complete!'.format(self.__class__.__name__))
+
+class Template_Cache_Tests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_template(self, name, contents, mtime = None):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as template:
+            template.write(contents)
+
+        if mtime:
+            os.utime(path, (mtime, mtime))
+
+        return path
+
+    def test_hits_and_misses(self):
+        cache = Template_Cache(max_entries=4, check_interval=0)
+        path = self._write_template('header.html', '<h1>HEADER</h1>')
+
+        self.assertEqual(cache.get(path), '<h1>HEADER</h1>')
+        self.assertEqual(cache.get(path), '<h1>HEADER</h1>')
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+
+    def test_mtime_invalidation(self):
+        cache = Template_Cache(max_entries=4, check_interval=0)
+        path = self._write_template('header.html', '<h1>OLD</h1>', mtime=1000)
+        cache.get(path)
+
+        self._write_template('header.html', '<h1>NEW</h1>', mtime=2000)
+
+        self.assertEqual(cache.get(path), '<h1>NEW</h1>')
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_lru_eviction(self):
+        cache = Template_Cache(max_entries=2, check_interval=60)
+        paths = [self._write_template('{}.html'.format(name), name) for name in ('a', 'b', 'c')]
+
+        cache.get(paths[0])
+        cache.get(paths[1])
+        cache.get(paths[0])
+        cache.get(paths[2])
+
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.get(paths[0]), 'a')
+        self.assertEqual(cache.stats()['misses'], 3)
+
+@override_settings(STATIC_ROOT=os.path.join(settings.BASE_DIR, 'static'))
+class GET_Batch_Tests(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name='Python', icon='code')
+        Widget.objects.create(name='header')
+
+    def test_batch_request(self):
+        batch = json.dumps([
+            {'key': 'header', 'model': 'widget', 'filter': 'name:header'},
+            {'model': 'category', 'sort': 'name'},
+            {'key': 'missing', 'model': 'MODEL'},
+        ])
+        result = client.get('/api/', {'batch': batch}).json()
+
+        self.assertEqual(result['code'], 200)
+        self.assertEqual(result['batch']['header']['code'], 200)
+        self.assertIn('HEADER', result['batch']['header']['models'][0]['template'])
+        self.assertEqual(result['batch']['1']['code'], 200)
+        self.assertEqual(result['batch']['missing'], {'msg': 'GET - Model not found: \'MODEL\'', 'code': 404})
+
+    def test_invalid_batch(self):
+        result = client.get('/api/', {'batch': '{"model": "category"}'}).json()
+        self.assertEqual(result['code'], 400)
+
+        result = client.get('/api/', {'batch': json.dumps([{'key': 'a'}, {'key': 'a'}])}).json()
+        self.assertEqual(result['msg'], 'GET - Duplicate batch sub-query key: \'a\'')
+
+    def test_page_batches_widgets(self):
+        # The widgets' queries are answered from one batch request by the Batch_Library module
+        self.assertContains(Client().get('/'), '<script src="resources/js/libraries/batching.js"></script>')
+
+        with open(os.path.join(settings.BASE_DIR, 'static', 'js', 'fixtures.js')) as fixtures:
+            self.assertIn("'Batch_Library'", fixtures.read())
+
+
+class GET_Stream_Tests(TestCase):
+
+    def test_streamed_response(self):
+        for index in range(5):
+            Category.objects.create(name='Category {}'.format(index))
+
+        with self.settings(API_STREAM_CHUNK_SIZE=2):
+            response = client.get('/api/', {'model': 'category', 'sort': '-name', 'stream': 'true'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.status_code, 200)
+        
+        result = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(result['code'], 200)
+        self.assertEqual([model['name'] for model in result['models']], ['Category {}'.format(index) for index in range(4, -1, -1)])
+
+    def test_streamed_chunk_boundaries(self):
+        # Results filling their last chunk exactly (4 and 6 rows) must not leave a trailing separator
+        for count in range(1, 7):
+            Category.objects.create(name='Category {}'.format(count))
+
+            with self.settings(API_STREAM_CHUNK_SIZE=2):
+                response = client.get('/api/', {'model': 'category', 'stream': 'true'})
+
+            self.assertEqual(len(json.loads(b''.join(response.streaming_content))['models']), count)
+
+    def test_empty_streamed_response(self):
+        response = client.get('/api/', {'model': 'category', 'stream': 'true'})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'models': [], 'code': 404})
+
+
+class GET_Pagination_Tests(TestCase):
+
+    def setUp(self):
+        for index in range(7):
+            Category.objects.create(name='Category {}'.format(index % 3), icon=str(index))
+
+    def _fetch_pages(self, params):
+        models, cursor = [], None
+
+        while True:
+            result = client.get('/api/', dict(params, **({'cursor': cursor} if cursor else {}))).json()
+            models.extend(model['icon'] for model in result['models'])
+
+            cursor = result['cursor']
+            if not cursor:
+                return models
+
+    def test_keyset_pages(self):
+        expected = [category.icon for category in Category.objects.order_by('-name', 'pk')]
+        
+        self.assertEqual(self._fetch_pages({'model': 'category', 'sort': '-name', 'limit': 2}), expected)
+        self.assertEqual(len(self._fetch_pages({'model': 'category', 'limit': 3})), 7)
+
+    def test_foreign_key_sort(self):
+        categories = list(Category.objects.order_by('pk'))
+        for category in reversed(categories):
+            Project.objects.create(project_category=category)
+
+        result = client.get('/api/', {'model': 'project', 'sort': 'project_category', 'limit': 4}).json()
+        page = client.get('/api/', {'model': 'project', 'sort': 'project_category', 'limit': 4, 'cursor': result['cursor']}).json()
+
+        self.assertEqual((len(result['models']), len(page['models']), page['cursor']), (4, 3, None))
+
+    def test_invalid_cursor(self):
+        result = client.get('/api/', {'model': 'category', 'limit': 2}).json()
+        
+        self.check_error({'model': 'category', 'limit': 2, 'cursor': 'invalid'}, 'GET - Invalid page cursor! (param: cursor)')
+        self.check_error({'model': 'category', 'sort': 'name', 'limit': 2, 'cursor': result['cursor']}, 'GET - Page cursor does not match the sort parameters! (param: cursor)')
+        self.check_error({'model': 'category', 'limit': 0}, 'GET - Page limit must be between 1 and 1000! (param: limit)')
+
+        # Sub-queries of a batch are decoded JSON, so parameters may be lists or objects
+        batch = client.get('/api/', {'batch': json.dumps([
+            {'key': 'limit', 'model': 'category', 'limit': [2]},
+            {'key': 'cursor', 'model': 'category', 'limit': 2, 'cursor': {'values': []}},
+        ])}).json()['batch']
+        self.assertEqual(batch['limit']['msg'], 'GET - Page limit must be an integer! (param: limit)')
+        self.assertEqual(batch['cursor']['msg'], 'GET - Invalid page cursor! (param: cursor)')
+
+    def check_error(self, params, expected_msg):
+        result = client.get('/api/', params).json()
+
+        self.assertEqual((result['code'], result['msg']), (400, expected_msg))
+
+
+@override_settings(STATIC_ROOT=os.path.join(settings.BASE_DIR, 'static'))
+class Serializer_Plan_Tests(TestCase):
+
+    def test_plan_matches_to_json(self):
+        Category.objects.create(name='Python', icon='code')
+        plan = serializer_plan(Category)
+
+        self.assertEqual(plan.names, ('name', 'icon'))
+        self.assertEqual(plan.serialize(Category.objects.all()), [Category.objects.get().to_json()])
+        self.assertEqual(Category.objects.get().to_json(), {'name': 'Python', 'icon': 'code'})
+
+    def test_plan_extends_json(self):
+        Widget.objects.create(name='footer')
+
+        models = serializer_plan(Widget).serialize(Widget.objects.all())
+
+        self.assertEqual(models[0]['name'], 'footer')
+        self.assertIn('FOOTER', models[0]['template'])
+
+
+class Response_Cache_Tests(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name='Python', icon='code')
+
+    def test_cache_hits(self):
+        response_cache = get_response_cache()
+        hits = response_cache.hits
+
+        first = client.get('/api/', {'model': 'category', 'sort': 'name'}).json()
+        second = client.get('/api/', {'model': 'CATEGORY', 'sort': 'name'}).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(response_cache.hits, hits + 1)
+
+    def test_write_invalidates(self):
+        client.get('/api/', {'model': 'category'})
+        client.post('/api/', {'model': 'category', 'fields': {'name': 'Django'}}, content_type='application/json')
+
+        result = client.get('/api/', {'model': 'category'}).json()
+        self.assertEqual(sorted(model['name'] for model in result['models']), ['Django', 'Python'])
+
+        Category.objects.filter(name='Django').get().delete()
+
+        result = client.get('/api/', {'model': 'category'}).json()
+        self.assertEqual([model['name'] for model in result['models']], ['Python'])
+
+    def test_per_process_backend(self):
+        local = {'BACKEND': 'api.cache.Local_Memory_Backend', 'TIMEOUT': 300}
+
+        with self.settings(API_RESPONSE_CACHE=local):
+            self.assertEqual(get_response_cache().timeout, 300)
+
+            # Other workers' writes are missed until entries expire
+            with self.settings(API_WORKER_PROCESSES=2):
+                self.assertEqual(get_response_cache().timeout, 5.0)
+
+            with self.settings(API_RESPONSE_CACHE=dict(local, BACKEND='api.cache.File_Backend'), API_WORKER_PROCESSES=2):
+                self.assertEqual(get_response_cache().timeout, 300)
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with self.settings(API_RESPONSE_CACHE={'BACKEND': 'api.cache.File_Backend', 'OPTIONS': {'location': location}}):
+                client.get('/api/', {'model': 'category'})
+                self.assertEqual(get_response_cache().hits, 0)
+
+                client.get('/api/', {'model': 'category'})
+                self.assertEqual(get_response_cache().hits, 1)
+
+                Category.objects.create(name='Django')
+
+                result = client.get('/api/', {'model': 'category'}).json()
+                self.assertEqual(len(result['models']), 2)
+
+    def test_file_backend_encoding(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = File_Backend(location)
+            backend.set('Category', '0', 'key', {'at': datetime.datetime(2020, 1, 2, 3, 4, 5), 'price': decimal.Decimal('1.50'), 'id': uuid.UUID(int=1)}, 60)
+
+            self.assertEqual(backend.get('Category', '0', 'key'), {'at': '2020-01-02T03:04:05', 'price': '1.50', 'id': str(uuid.UUID(int=1))})
+
+
+class GET_ETag_Tests(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name='Python', icon='code')
+
+    def test_conditional_requests(self):
+        response = client.get('/api/', {'model': 'category'})
+        etag = response['ETag']
+
+        response = client.get('/api/', {'model': 'category'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag'], response.content), (304, etag, b''))
+
+        Category.objects.create(name='Django')
+
+        response = client.get('/api/', {'model': 'category'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(API_WORKER_PROCESSES=2)
+    def test_per_process_versions(self):
+        # Other workers' writes would be missed, so responses are never validated
+        response = client.get('/api/', {'model': 'category'})
+        self.assertFalse(response.has_header('ETag'))
+
+        response = client.get('/api/', {'model': 'category'}, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch.object(Model_Versions, 'shared', True):
+            self.assertTrue(client.get('/api/', {'model': 'category'}).has_header('ETag'))
+
+    def test_template_changes(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        shutil.copytree(os.path.join(settings.BASE_DIR, 'static', 'widgets'), os.path.join(static_root, 'widgets'))
+
+        check_interval, template_cache.check_interval = template_cache.check_interval, 0
+        self.addCleanup(setattr, template_cache, 'check_interval', check_interval)
+
+        Widget.objects.create(name='header')
+
+        with self.settings(STATIC_ROOT=static_root):
+            etag = client.get('/api/', {'model': 'widget'})['ETag']
+
+            path = os.path.join(static_root, 'widgets', 'header.html')
+            with open(path, 'w') as template:
+                template.write('<h1>NEW HEADER</h1>')
+            os.utime(path, (0, 0))
+
+            response = client.get('/api/', {'model': 'widget'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['models'][0]['template'], '<h1>NEW HEADER</h1>')
+
+
+class Bulk_Tests(TestCase):
+
+    def _send(self, method, body):
+        return method('/api/', json.dumps(body), content_type='application/json').json()
+
+    def test_bulk_create(self):
+        result = self._send(client.post, {'model': 'category', 'bulk': [{'name': 'Category {}'.format(index)} for index in range(50)]})
+
+        self.assertEqual((result['code'], result['count']), (200, 50))
+        self.assertEqual(Category.objects.count(), 50)
+
+    def test_bulk_create_errors(self):
+        result = self._send(client.post, {'model': 'category', 'bulk': [{'name': 'Python'}, {'missing': 'field'}, {'name': 'x' * 300}]})
+
+        self.assertEqual(result['code'], 400)
+        self.assertEqual([error['index'] for error in result['errors']], [1, 2])
+        self.assertEqual(Category.objects.count(), 0)
+
+    def test_bulk_update_and_delete(self):
+        for index in range(4):
+            Category.objects.create(name='Category {}'.format(index), icon='old')
+
+        result = self._send(client.put, {'model': 'category', 'bulk': [
+            {'filter': {'name': 'Category 0'}, 'fields': {'icon': 'zero'}},
+            {'filter': {'name': 'Category 1'}, 'fields': {'icon': 'one'}},
+        ]})
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(Category.objects.get(name='Category 1').icon, 'one')
+
+        result = self._send(client.put, {'model': 'category', 'bulk': True, 'filter': {'icon': 'old'}, 'fields': {'icon': 'new'}})
+        self.assertEqual(result['count'], 2)
+
+        result = self._send(client.put, {'model': 'category', 'bulk': [{'filter': {'name': 'Missing'}, 'fields': {'icon': 'none'}}]})
+        self.assertEqual((result['code'], result['errors'][0]['index']), (400, 0))
+
+        for bulk in (False, None, 0, 'no'):
+            result = self._send(client.delete, {'model': 'category', 'bulk': bulk, 'filter': {'icon': 'new'}})
+            self.assertEqual((result['code'], result['msg']), (400, 'DELETE - Bulk deletes must set bulk to true! (param: bulk)'))
+
+        self.assertEqual(Category.objects.count(), 4)
+
+        result = self._send(client.delete, {'model': 'category', 'bulk': True, 'filter': {'icon': 'new'}})
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(Category.objects.count(), 2)
+
+
+class GET_Projection_Tests(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name='Python', icon='code')
+
+    def test_projected_fields(self):
+        result = client.get('/api/', {'model': 'category', 'fields': 'icon'}).json()
+        self.assertEqual(result['models'], [{'icon': 'code'}])
+
+        result = client.get('/api/', {'model': 'category', 'fields': 'name', 'sort': 'icon', 'limit': 1}).json()
+        self.assertEqual(result['models'], [{'name': 'Python'}])
+
+    def test_invalid_fields(self):
+        result = client.get('/api/', {'model': 'category', 'fields': 'missing'}).json()
+        self.assertEqual((result['code'], result['msg']), (400, 'GET - Field \'missing\' not found for model: \'Category\''))
+
+        result = client.get('/api/', {'model': 'project', 'fields': 'project_category'}).json()
+        self.assertEqual((result['code'], result['msg']), (400, 'GET - Field \'project_category\' cannot be returned for model: \'Project\''))
+
+
+@override_settings(API_RESPONSE_CACHE=None)
+class GET_Expansion_Tests(TestCase):
+
+    def _create_projects(self, count):
+        for index in range(count):
+            category = Category.objects.create(name='Category {}'.format(index), icon='icon')
+            Project.objects.create(project_category=category)
+
+    def test_forward_expansion(self):
+        self._create_projects(3)
+
+        with self.assertNumQueries(1):
+            result = client.get('/api/', {'model': 'project', 'expand': 'project_category'}).json()
+
+        self.assertEqual(result['models'][0]['project_category'], {'name': 'Category 0', 'icon': 'icon'})
+
+        self._create_projects(20)
+
+        with self.assertNumQueries(1):
+            result = client.get('/api/', {'model': 'project', 'expand': 'project_category', 'limit': 15}).json()
+
+        self.assertEqual(len(result['models']), 15)
+
+    def test_reverse_expansion(self):
+        self._create_projects(10)
+
+        with self.assertNumQueries(2):
+            result = client.get('/api/', {'model': 'category', 'expand': 'project_set', 'fields': 'name'}).json()
+
+        self.assertEqual(result['models'][0], {'name': 'Category 0', 'project_set': [{}]})
+
+    def test_invalid_expansion(self):
+        result = client.get('/api/', {'model': 'category', 'expand': 'api_model_ptr'}).json()
+
+        self.assertEqual((result['code'], result['msg']), (400, 'GET - Relation \'api_model_ptr\' not found for model: \'Category\''))
+
+
+@override_settings(API_PROFILING=True, API_RESPONSE_CACHE=None)
+class Profiling_Tests(TestCase):
+
+    def test_server_timing(self):
+        Category.objects.create(name='Python', icon='code')
+        count = stage_histograms.stats().get('total', {}).get('count', 0)
+
+        response = Client().get('/api/', {'model': 'category', 'sort': 'name'})
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+
+        for stage in ('model', 'filter', 'sort', 'serialize', 'encode', 'sql', 'total'):
+            self.assertIn(stage, metrics)
+
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertEqual(stage_histograms.stats()['total']['count'], count + 1)
+
+    @override_settings(API_PROFILING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', Client().get('/api/', {'model': 'category'}))
+
+
+class Async_Logging_Tests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'api.log')
+
+        self.logger = logging.getLogger('api.tests.async')
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _handler(self, **kwargs):
+        handler = Async_File_Handler(self.path, **kwargs)
+        handler.setFormatter(JSON_Formatter())
+
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+
+        return handler
+
+    def test_json_lines(self):
+        handler = self._handler(batch_size=2, flush_interval=0.01)
+
+        for index in range(5):
+            self.logger.error('GET - Error %d', index, extra={'fields': {'code': 400}})
+
+        handler.close()
+
+        with open(self.path) as log:
+            lines = [json.loads(line) for line in log]
+
+        self.assertEqual([line['message'] for line in lines], ['GET - Error {}'.format(index) for index in range(5)])
+        self.assertEqual((lines[0]['code'], lines[0]['level']), (400, 'ERROR'))
+        self.assertEqual(handler.stats()['written'], 5)
+
+    def test_drops_when_full(self):
+        handler = self._handler(queue_size=1)
+        handler._stopped.set()
+        handler._writer.join()
+
+        self.logger.error('kept')
+        self.logger.error('dropped')
+
+        self.assertEqual((handler.stats()['queued'], handler.stats()['dropped']), (1, 1))
+
+    def test_write_errors(self):
+        handler = self._handler(flush_interval=0.01)
+        handler.handleError = mock.Mock()
+
+        stream, handler._stream = handler._stream, mock.Mock(write=mock.Mock(side_effect=OSError('No space left on device')))
+        stream.close()
+
+        self.logger.error('lost')
+        for _ in range(500):
+            if handler.stats()['failed']:
+                break
+            time.sleep(0.01)
+
+        # The writer survives the error and reopens the file
+        self.logger.error('kept')
+        handler.close()
+
+        with open(self.path) as log:
+            self.assertEqual([json.loads(line)['message'] for line in log], ['kept'])
+
+        self.assertEqual((handler.stats()['failed'], handler.stats()['written']), (1, 1))
+        self.assertEqual(handler.handleError.call_args[0][0].getMessage(), 'lost')
+
+
+class ASGI_Tests(TransactionTestCase):
+    # Blocking work runs on pool threads with their own connections, so rows are committed
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        Category.objects.create(name='Python', icon='python')
+        self.application = ASGI_Handler(get_wsgi_application())
+
+    def _request(self, method, path, query_string=b'', body=b'', host=b'localhost', disconnect_after=None):
+        messages = []
+        received = []
+
+        async def receive():
+            # The body, then nothing until the client disconnects (after @disconnect_after body messages)
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': body}
+
+            while disconnect_after is None or len(messages) <= disconnect_after:
+                await asyncio.sleep(0.01)
+
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string, 'headers': [(b'host', host)]}
+        asyncio.run(self.application(scope, receive, send))
+
+        self.headers = {name.decode('latin1').lower(): value.decode('latin1') for name, value in messages[0]['headers']}
+
+        return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_get(self):
+        status, body = self._request('GET', '/api/', b'model=Category')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['models'], [{'name': 'Python', 'icon': 'python'}])
+
+    def test_get_stream(self):
+        status, body = self._request('GET', '/api/', b'model=Category&stream=true')
+
+        self.assertEqual((status, json.loads(body)['models'][0]['name']), (200, 'Python'))
+
+    def test_non_api_path(self):
+        status, body = self._request('GET', '/api/stats/')
+
+        self.assertEqual(status, 200)
+        self.assertIn('template_cache', json.loads(body))
+
+    def test_post_requires_csrf(self):
+        status, _ = self._request('POST', '/api/', body=b'model=Category&params={"name": "Go"}')
+
+        self.assertEqual(status, 403)
+        self.assertFalse(Category.objects.filter(name='Go').exists())
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_api_runs_middleware(self):
+        status, _ = self._request('GET', '/api/', b'model=Category', host=b'evil.example')
+        self.assertEqual(status, 400)
+
+        self._request('GET', '/api/', b'model=Category')
+        self.assertEqual(self.headers['x-frame-options'], 'SAMEORIGIN')
+
+    def test_repeated_headers(self):
+        scope = {'method': 'GET', 'path': '/', 'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2'), (b'accept', b'text/html'), (b'accept', b'*/*')]}
+        environ = ASGI_Handler.environ(scope, b'')
+
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+    @override_settings(API_CHANGE_FEED_HEARTBEAT=60.0, API_CHANGE_FEED_DURATION=60.0)
+    def test_disconnect_ends_stream(self):
+        from . import change_feed
+
+        with mock.patch.object(change_feed, 'stream_slots', threading.BoundedSemaphore(1)):
+            started = time.monotonic()
+            status, body = self._request('GET', '/api/changes/', disconnect_after=1)
+
+            # The stream stopped waiting for changes and gave its slot back
+            self.assertLess(time.monotonic() - started, 10)
+            self.assertEqual((status, body), (200, b'retry: 1000\n\n'))
+            self.assertTrue(change_feed.stream_slots.acquire(blocking=False))
+
+    @override_settings(API_PROFILING=True, API_RESPONSE_CACHE=None)
+    def test_api_profiling(self):
+        self.application = ASGI_Handler(get_wsgi_application())
+
+        status, _ = self._request('GET', '/api/', b'model=Category')
+
+        self.assertEqual(status, 200)
+        self.assertIn('desc="1 queries"', self.headers['server-timing'])
+
+
+class Model_Registry_Tests(TestCase):
+
+    def test_names(self):
+        for name in ('Category', 'category', 'CATEGORY'):
+            self.assertIs(model_registry.get(name).model_type, Category)
+
+        self.assertIsNone(model_registry.get('Nope'))
+        self.assertIsNone(model_registry.get(1))
+        self.assertIsNone(model_registry.get(['category']))
+
+    def test_invalid_model_names(self):
+        response = Client().post('/api/', json.dumps({'model': ['category']}), content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['msg']), (400, 'POST - Invalid model: ["category"] (param: model)'))
+
+        response = Client().get('/api/', {'batch': json.dumps([{'key': 'bad', 'model': 1}])})
+        self.assertEqual(response.json()['batch']['bad']['code'], 400)
+
+    def test_late_models(self):
+        self.assertIs(model_registry.get('test_model').model_type, Test_Model)
+
+    def test_entry(self):
+        entry = model_registry.entry(Category)
+
+        self.assertTrue({'name', 'icon'} <= entry.fields)
+        self.assertIn('icontains', entry.lookups['name'])
+        self.assertTrue(entry.allows('DELETE'))
+
+    def test_unknown_field(self):
+        response = Client().get('/api/', {'model': 'Category', 'sort': 'nope'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class Query_Plan_Tests(TestCase):
+
+    def setUp(self):
+        self.python = Category.objects.create(name='Python', icon='python')
+        Category.objects.create(name='Django', icon='django')
+        Project.objects.create(project_category=self.python)
+
+    def test_lookups(self):
+        plan = compile_query(Category, {'filter': 'name__icontains:PY,icon:python', 'sort': '-name'})
+
+        self.assertEqual(plan.filter_kwargs, (('name__icontains', 'PY'), ('icon__exact', 'python')))
+        self.assertEqual(plan.sort, ('-name',))
+        self.assertEqual(list(plan.filter(Category.objects.all())), [self.python])
+
+    def test_relations_and_coercion(self):
+        plan = compile_query(Project, {'filter': 'project_category__name__startswith:Py'})
+        self.assertEqual(plan.filters[0].path, 'project_category__name')
+        self.assertEqual(plan.filter(Project.objects.all()).count(), 1)
+
+        plan = compile_query(Project, {'filter': 'project_category:{}'.format(self.python.pk)})
+        self.assertEqual(plan.filters[0].value, self.python.pk)
+
+        plan = compile_query(Category, {'filter': 'id__in:1|2'})
+        self.assertEqual(plan.filters[0].value, (1, 2))
+
+    def test_underscored_fields(self):
+        response = Client().get('/api/', {'model': 'Project', 'filter': 'project_category__name:Python'})
+
+        self.assertEqual((response.status_code, len(json.loads(response.content)['models'])), (200, 1))
+
+    def test_invalid(self):
+        for params in ({'filter': 'nope:1'}, {'filter': 'name__nope:1'}, {'filter': 'name'},
+                       {'filter': 'id:abc'}, {'filter': 'id__range:1'}, {'sort': 'nope'}, {'sort': '--name'}):
+            with self.assertRaises(API_Error, msg=params):
+                compile_query(Category, params)
+
+    def test_cached(self):
+        cache = Query_Plan_Cache(max_entries=2)
+
+        plan = cache.get(Category, 'name:Python', 'name')
+        self.assertIs(cache.get(Category, 'name:Python', 'name'), plan)
+
+        cache.get(Category, 'name:Django', None)
+        cache.get(Category, 'icon:django', None)
+
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 3, 'entries': 2, 'max_entries': 2})
+
+    def test_fuzz(self):
+        # Any filter/sort string either compiles to a plan the database accepts or fails with a 400
+        generator = random.Random(15)
+        tokens = ['name', 'icon', 'id', 'nope', '__', '_', ':', ',', '|', '-', 'icontains', 'in', 'isnull', 'gt', 'range', '1', 'x', '']
+
+        for _ in range(500):
+            model_filter = ''.join(generator.choice(tokens) for _ in range(generator.randint(0, 8)))
+            model_sort = ''.join(generator.choice(tokens) for _ in range(generator.randint(0, 4)))
+
+            try:
+                plan = compile_query(Category, {'filter': model_filter, 'sort': model_sort})
+            except API_Error as error:
+                self.assertEqual(error.code, 400)
+                continue
+
+            list(plan.order(plan.filter(Category.objects.all())))
+
+
+class Index_Tests(TestCase):
+
+    def test_declared_fields_indexed(self):
+        self.assertTrue(Widget._meta.get_field('name').db_index)
+        self.assertTrue(Category._meta.get_field('icon').db_index)
+
+    def test_undeclared_fields_rejected(self):
+        from .registry import Model_Entry
+
+        with mock.patch.object(Category, 'sortable_fields', ['name']), mock.patch.object(Category._meta.get_field('icon'), 'db_index', False):
+            entry = Model_Entry(Category)
+
+        self.assertEqual(entry.sortable, {'name', 'id', 'api_model_ptr'})
+
+        with mock.patch.dict(model_registry._entries, {Category: entry}), self.assertRaises(API_Error):
+            compile_query(Category, {'sort': 'icon,name'})
+
+    def test_audit(self):
+        from .management.commands.audit_query_plans import explain, problems
+
+        self.assertEqual(problems(explain(Widget, 'name:header', '')), [])
+        self.assertEqual(len(problems(explain(Category, 'name__icontains:py', ''))), 1)
+
+    def test_logged_keys_only(self):
+        from .management.commands.audit_query_plans import recorded_queries
+        from .query_plans import query_logger
+
+        cache = Query_Plan_Cache(8)
+
+        with self.assertLogs(query_logger, 'DEBUG') as logs:
+            cache.get(Category, {'name__icontains': 'secret', 'id__in': [1, 2]}, '-name')
+
+        fields = logs.records[0].fields
+        self.assertEqual(fields, {'model': 'Category', 'filter': ['name__icontains', 'id__in'], 'sort': ['-name']})
+        self.assertNotIn('secret', json.dumps(fields))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            log.write(json.dumps(fields) + '\n')
+            log.flush()
+
+            model_name, model_filter, model_sort = recorded_queries(log.name)[0]
+
+        self.assertEqual(model_name, 'Category')
+        self.assertEqual(model_sort, '-name')
+        compile_query(Category, {'filter': model_filter, 'sort': model_sort})
+
+
+class SQLite_Backend_Tests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'api.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _connection(self, **settings_dict):
+        from .sqlite.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper(dict({'NAME': self.path, 'OPTIONS': {}, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0,
+                                        'TIME_ZONE': None, 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': ''}, **settings_dict))
+        wrapper.ensure_connection()
+
+        return wrapper
+
+    def test_pragmas_and_pool(self):
+        writer = self._connection(POOL_SIZE=1)
+        raw = writer.connection
+
+        self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(raw.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+
+        writer.close()
+        writer.ensure_connection()
+        self.assertIs(writer.connection, raw)
+
+        writer.connection.execute('CREATE TABLE pooled (id INTEGER)')
+        writer.close()
+
+    def test_unusable_connections_are_not_pooled(self):
+        errored = self._connection(POOL_SIZE=2)
+        errored_raw = errored.connection
+        errored.errors_occurred = True
+        errored.close()
+
+        broken = self._connection(POOL_SIZE=2)
+        broken_raw = broken.connection
+        broken_raw.close()
+        broken.close()
+
+        self.assertTrue(errored.pool().empty())
+
+        # Really closed, not left open outside the pool
+        with self.assertRaises(Exception):
+            errored_raw.execute('SELECT 1')
+
+        errored.ensure_connection()
+        self.assertIsNot(errored.connection, errored_raw)
+        errored.close()
+
+    def test_read_only(self):
+        writer = self._connection()
+        writer.connection.execute('CREATE TABLE pooled (id INTEGER)')
+        writer.close()
+
+        reader = self._connection(READ_ONLY=True)
+
+        with self.assertRaises(Exception):
+            reader.connection.execute('INSERT INTO pooled VALUES (1)')
+
+        reader.close()
+
+    def test_router(self):
+        from .routers import Read_Write_Router
+
+        router = Read_Write_Router()
+
+        # Tests run inside a transaction on the default database
+        self.assertEqual(router.db_for_read(Category), 'default')
+
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Category), 'read')
+
+        self.assertEqual(router.db_for_write(Category), 'default')
+        self.assertFalse(router.allow_migrate('read', 'api'))
+
+
+@override_settings(STATIC_ROOT=os.path.join(settings.BASE_DIR, 'static'))
+class Widget_Bundle_Tests(TestCase):
+
+    def test_bundle(self):
+        response = Client().get('/api/bundle/', HTTP_ACCEPT_ENCODING='gzip')
+        styles = gzip.decompress(response.content).decode('utf-8')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual([name for name in ('footer', 'header', 'page', 'sidebar') if '/* {}.css */'.format(name) in styles], ['footer', 'header', 'page', 'sidebar'])
+
+        versioned = Client().get('/api/bundle/', {'v': Widget_Bundle(os.path.join(settings.STATIC_ROOT, 'widgets')).current().version, 'format': 'css'})
+        self.assertEqual(versioned['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('header {', versioned.content.decode('utf-8'))
+
+        # Templates are sent with the widget models, not bundled
+        self.assertEqual(Client().get('/api/bundle/', {'format': 'json'}).status_code, 400)
+
+        cached = Client().get('/api/bundle/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_page(self):
+        response = Client().get('/')
+
+        self.assertContains(response, '<link rel="stylesheet" href="/api/bundle/?v=')
+        self.assertContains(response, '&amp;format=css')
+        self.assertNotContains(response, 'WIDGET_BUNDLE_URL')
+
+    def test_rebuilt_on_change(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'header.css'), 'w') as style:
+                style.write('header {}')
+
+            bundle = Widget_Bundle(directory, check_interval=0).current()
+            version = bundle.version
+
+            self.assertEqual((bundle.current().version, bundle.builds), (version, 1))
+
+            with open(os.path.join(directory, 'footer.css'), 'w') as style:
+                style.write('footer {}')
+
+            self.assertNotEqual(bundle.current().version, version)
+            self.assertEqual(bundle.builds, 2)
+
+    def test_accept_encoding(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br;q=0'), {'gzip', 'deflate'})
+        self.assertEqual(accepted_encodings(''), set())
+
+
+def upper_encoder(content) -> bytes:
+    return json.dumps(content).upper().encode('utf-8')
+
+
+class Response_Encoding_Tests(TestCase):
+
+    def setUp(self):
+        for index in range(100):
+            Category.objects.create(name='Category {}'.format(index), icon='icon_{}'.format(index))
+
+    def test_compressed(self):
+        response = Client().get('/api/', {'model': 'category'}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['models']), 100)
+
+        cached = Client().get('/api/', {'model': 'category'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_small_or_unaccepted(self):
+        small = Client().get('/api/', {'model': 'category', 'limit': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        identity = Client().get('/api/', {'model': 'category'})
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertEqual(len(identity.json()['models']), 100)
+
+    def test_streamed(self):
+        response = Client().get('/api/', {'model': 'category', 'stream': 'true'}, HTTP_ACCEPT_ENCODING='gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+
+        self.assertEqual(len(json.loads(content)['models']), 100)
+
+    @override_settings(API_JSON_ENCODER='api.tests.upper_encoder', API_RESPONSE_CACHE=None)
+    def test_pluggable_encoder(self):
+        response = Client().get('/api/', {'model': 'category', 'limit': 1})
+
+        self.assertEqual(response.json()['MODELS'][0]['NAME'], 'CATEGORY 0')
+
+    def test_encoders_agree(self):
+        from .utilities import stdlib_json_encoder, orjson_encoder, orjson
+        import datetime, decimal
+
+        if orjson is None:
+            self.skipTest('orjson is not installed')
+
+        content = {'models': [{'when': datetime.datetime(2020, 1, 2, 3, 4, 5, 678901), 'price': decimal.Decimal('1.50'), 'name': 'Caf\u00e9'}]}
+
+        self.assertEqual(json.loads(orjson_encoder(content)), json.loads(stdlib_json_encoder(content)))
+
+
+class Load_Testing_Tests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def test_workload(self):
+        mix = parse_mix('GET=3, post=1')
+        workload = build_workload(200, mix, rows=10, seed=1)
+
+        self.assertEqual(mix, {'GET': 3.0, 'POST': 1.0})
+        self.assertEqual(workload, build_workload(200, mix, rows=10, seed=1))
+        self.assertEqual({method for method, _, _ in workload}, {'GET', 'POST'})
+
+        with self.assertRaises(ValueError):
+            parse_mix('PATCH=1')
+
+    @override_settings(API_RESPONSE_CACHE=None)
+    def test_in_process(self):
+        for index in range(10):
+            Category.objects.create(name='Category {}'.format(index), icon='icon_{}'.format(index))
+
+        summary = run_in_process(build_workload(40, parse_mix('GET=1,PUT=1'), rows=10), concurrency=1)
+
+        self.assertEqual(summary['requests'], 40)
+        self.assertEqual(summary['errors'], 0)
+        self.assertEqual(summary['methods']['PUT']['queries'], 2)
+
+    def test_compare(self):
+        baseline = {'modes': {'http': {'rps': 100.0, 'latency_ms': {'p50': 5.0, 'p95': 10.0, 'p99': 20.0}}}}
+        current = {'modes': {'http': {'rps': 80.0, 'latency_ms': {'p50': 5.0, 'p95': 10.5, 'p99': 30.0}}}}
+
+        regressed = {metric for _, metric, _, _, _, regressed in compare_results(baseline, current, 0.1) if regressed}
+
+        self.assertEqual(regressed, {'rps', 'latency_ms.p99'})
+
+
+class Aggregate_Tests(TestCase):
+
+    def setUp(self):
+        self.categories = [Category.objects.create(name='Category {}'.format(index), icon='icon') for index in range(3)]
+
+        for index in range(6):
+            Project.objects.create(project_category=self.categories[index % 2])
+
+    def test_count_and_exists(self):
+        self.assertEqual(client.get('/api/', {'model': 'project', 'count': 'true'}).json(), {'count': 6, 'code': 200})
+        self.assertEqual(client.get('/api/', {'model': 'category', 'filter': 'name:Missing', 'count': 'true'}).json(), {'count': 0, 'code': 200})
+        self.assertEqual(client.get('/api/', {'model': 'category', 'filter': 'name:Missing', 'exists': 'true'}).json(), {'exists': False, 'code': 200})
+
+    def test_count_does_not_load_models(self):
+        with self.assertNumQueries(1) as context:
+            client.get('/api/', {'model': 'project', 'count': 'true', 'filter': 'project_category:{}'.format(self.categories[0].pk)})
+
+        self.assertIn('COUNT(*)', context.captured_queries[0]['sql'])
+
+    def test_aggregate(self):
+        content = client.get('/api/', {'model': 'category', 'aggregate': 'count:id,max:name'}).json()
+
+        self.assertEqual(content['aggregate'], {'id__count': 3, 'name__max': 'Category 2'})
+
+    def test_group_by(self):
+        content = client.get('/api/', {'model': 'project', 'aggregate': 'count:id', 'group_by': 'project_category'}).json()
+
+        self.assertEqual(content['groups'], [
+            {'project_category': self.categories[0].pk, 'id__count': 3},
+            {'project_category': self.categories[1].pk, 'id__count': 3},
+        ])
+
+    def test_batch(self):
+        batch = json.dumps([{'key': 'projects', 'model': 'project', 'count': True}, {'key': 'icons', 'model': 'category', 'aggregate': ['count:icon']}])
+        content = client.get('/api/', {'batch': batch}).json()
+
+        self.assertEqual(content['batch']['projects']['count'], 6)
+        self.assertEqual(content['batch']['icons']['aggregate'], {'icon__count': 3})
+
+    def test_invalid(self):
+        for params in [
+            {'aggregate': 'avg:id'},
+            {'aggregate': 'sum:name'},
+            {'aggregate': 'count:missing'},
+            {'group_by': 'name'},
+            {'count': 'true', 'exists': 'true'},
+            {'count': 'true', 'limit': '1'},
+            {'count': 'true', 'stream': 'true'},
+        ]:
+            self.assertEqual(client.get('/api/', dict(params, model='category')).status_code, 400, params)
+
+        with mock.patch.object(model_registry.entry(Project), 'sortable', frozenset(['id'])):
+            response = client.get('/api/', {'model': 'project', 'aggregate': 'count:id', 'group_by': 'project_category'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class Snapshot_Tests(TransactionTestCase):
+    # Snapshots are only used outside transactions, so rows are committed
+    databases = {'default', 'read'}
+
+    def setUp(self):
+        self.categories = [Category.objects.create(name=name, icon=icon) for name, icon in
+                           [('Python', 'python'), ('Django', 'python'), ('django', ''), ('R\u00e9sum\u00e9', 'doc'), ('Go', 'go')]]
+
+    def assertMatchesDatabase(self, snapshot: Model_Snapshot, params: dict):
+        plan = compile_query(Category, params)
+        rows = snapshot.query(plan, ('id', 'name', 'icon'))
+
+        expected = list(plan.order(plan.filter(Category.objects.all())).values_list('id', 'name', 'icon'))
+        if not plan.sort:
+            rows, expected = sorted(rows), sorted(expected)
+
+        self.assertEqual(rows, expected, params)
+
+    def test_matches_database(self):
+        snapshot = Model_Snapshot(Category)
+
+        for params in [{}, {'sort': 'name'}, {'sort': '-icon,name'}, {'filter': 'icon:python'}, {'filter': 'name__iexact:DJANGO'},
+                       {'filter': 'name__icontains:\u00c9'}, {'filter': 'name__startswith:d', 'sort': '-name'},
+                       {'filter': 'id__in:{}|{}'.format(self.categories[0].pk, self.categories[4].pk)},
+                       {'filter': 'name__gte:D,name__lt:R', 'sort': 'icon'}, {'filter': 'icon__isnull:false'}]:
+            self.assertMatchesDatabase(snapshot, params)
+
+        self.assertEqual(snapshot.stats()['loads'], 1)
+
+    def test_fuzz(self):
+        generator = random.Random(22)
+        snapshot = Model_Snapshot(Category)
+        lookups = ['', '__iexact', '__contains', '__icontains', '__startswith', '__gt', '__lte', '__in']
+
+        for _ in range(300):
+            field = generator.choice(['name', 'icon'])
+            value = '|'.join(generator.choice(['py', 'Py', 'python', 'D', 'django', 'go', '']) for _ in range(generator.randint(1, 2)))
+            sort = generator.choice(['', 'name', '-name', 'icon,-name'])
+
+            self.assertMatchesDatabase(snapshot, {'filter': '{}{}:{}'.format(field, generator.choice(lookups), value), 'sort': sort})
+
+    def test_incremental_updates(self):
+        snapshot = model_snapshot(Category)
+        snapshot.invalidate()
+
+        self.assertEqual(len(client.get('/api/', {'model': 'category'}).json()['models']), 5)
+        loads = snapshot.stats()['loads']
+
+        python = self.categories[0]
+        python.icon = 'snake'
+        python.save()
+        self.categories[1].delete()
+        Category.objects.create(name='Rust', icon='rust')
+
+        self.assertMatchesDatabase(snapshot, {'sort': 'icon'})
+        self.assertEqual(client.get('/api/', {'model': 'category', 'filter': 'icon:snake'}).json()['models'][0]['name'], 'Python')
+
+        stats = snapshot.stats()
+        self.assertEqual((stats['loads'], stats['rows']), (loads, 5))
+
+        # Writes that are not to a single model reload every row
+        Category.objects.filter(icon='rust').update(icon='crab')
+        client.delete('/api/', json.dumps({'model': 'category', 'bulk': True, 'filter': {'icon': 'go'}}), content_type='application/json')
+
+        self.assertMatchesDatabase(snapshot, {'filter': 'icon:crab'})
+        self.assertEqual(snapshot.stats()['loads'], loads + 1)
+
+    def test_database_fallback(self):
+        snapshot = Model_Snapshot(Category)
+
+        self.assertIsNone(snapshot.query(compile_query(Category, {'filter': 'name__regex:^P'}), ('id',)))
+        self.assertEqual(snapshot.stats()['fallbacks'], 1)
+
+        with mock.patch.object(Model_Snapshot, 'query') as query:
+            with transaction.atomic():
+                client.get('/api/', {'model': 'category'})
+
+            with override_settings(API_SNAPSHOTS=False):
+                client.get('/api/', {'model': 'category'})
+
+        query.assert_not_called()
+
+
+def bump_shared_counter(path: str, times: int):
+    store = Shared_Memory_Store(path, size=4096, version_slots=8, cache_buckets=8)
+    for _ in range(times):
+        store.bump(['Category'])
+
+
+class Shared_Memory_Tests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'store')
+        self.store = Shared_Memory_Store(self.path, size=4096, version_slots=8, cache_buckets=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_counters(self):
+        self.store.bump(['Category', 'Widget'])
+        self.store.bump(['Category'])
+
+        other = Shared_Memory_Store(self.path)
+
+        self.assertEqual((other.counter('Category'), other.counter('Widget'), other.counter('Project')), (2, 1, 0))
+        self.assertEqual(other.counters(), {'Category': 2, 'Widget': 1})
+        self.assertEqual(other.token, self.store.token)
+
+    def test_atomic_bumps_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=bump_shared_counter, args=(self.path, 200)) for _ in range(3)]
+
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.store.counter('Category'), 600)
+
+    def test_cache(self):
+        self.store.set('a', b'{"models": []}', 60)
+        self.store.set('b', b'x' * 100, -1)
+
+        self.assertEqual(Shared_Memory_Store(self.path).get('a'), b'{"models": []}')
+        self.assertIsNone(self.store.get('b'))
+        self.assertIsNone(self.store.get('c'))
+
+        # The ring buffer wraps around, overwritten payloads are misses
+        for index in range(50):
+            self.store.set('key {}'.format(index), b'y' * 200, 60)
+
+        self.assertIsNone(self.store.get('a'))
+        self.assertEqual(self.store.get('key 49'), b'y' * 200)
+
+        self.store.clear()
+        self.assertIsNone(self.store.get('key 49'))
+
+    def test_versions_and_response_cache(self):
+        with override_settings(API_SHARED_MEMORY=self.path):
+            versions = Shared_Model_Versions(self.store)
+            versions.bump(['Category'])
+
+            cache = Response_Cache(Shared_Memory_Backend())
+            key = cache.key(Category, {})
+            cache.set(key, [{'models': []}, 404])
+
+            self.assertEqual(versions.stats(), {'Category': 1})
+            self.assertEqual(cache.get(key), [{'models': []}, 404])
+
+            cache.set(key, [{'models': [{'at': datetime.date(2020, 1, 2), 'price': decimal.Decimal('1.50')}]}, 200])
+            self.assertEqual(cache.get(key), [{'models': [{'at': '2020-01-02', 'price': '1.50'}]}, 200])
+
+            # Invalidated for every process sharing the store
+            cache.invalidate([Category])
+            self.assertIsNone(cache.get(cache.key(Category, {})))
+            self.assertEqual(Shared_Memory_Store(self.path).counter('cache:Category'), 1)
+
+
+@override_settings(API_WRITE_QUEUE={'MAX_BATCH': 16, 'MAX_DELAY': 0.05}, API_RESPONSE_CACHE=None)
+class Write_Queue_Tests(TransactionTestCase):
+    # Writes are committed by the writer thread on its own connection
+    databases = {'default', 'read'}
+
+    def put(self, body: dict):
+        return Client().put('/api/', json.dumps(body), content_type='application/json')
+
+    def test_group_commit(self):
+        def post(index):
+            response = Client().post('/api/', json.dumps({'model': 'category', 'fields': {'name': 'Category {}'.format(index)}}), content_type='application/json')
+            connection.close()
+
+            return response.status_code
+
+        with ThreadPoolExecutor(8) as pool:
+            codes = list(pool.map(post, range(40)))
+
+        stats = get_write_queue().stats()
+
+        self.assertEqual(codes, [200] * 40)
+        self.assertEqual(Category.objects.count(), 40)
+        self.assertEqual(stats['writes'], 40)
+        self.assertLess(stats['batches'], 40)
+
+    def test_errors_are_per_write(self):
+        Category.objects.create(name='Python', icon='python')
+
+        write_queue = Write_Queue(max_batch=3, max_delay=0.5)
+
+        def rename(name, icon):
+            category = Category.objects.get(name=name)
+            category.icon = icon
+            category.save()
+
+            return icon
+
+        with ThreadPoolExecutor(3) as pool:
+            results = [pool.submit(write_queue.submit, rename, name, icon) for name, icon in [('Python', 'a'), ('Missing', 'b'), ('Python', 'c')]]
+
+        self.assertEqual(results[0].result(), 'a')
+        self.assertRaises(Category.DoesNotExist, results[1].result)
+        self.assertEqual(Category.objects.get(name='Python').icon, 'c')
+        self.assertEqual((write_queue.stats()['batches'], write_queue.stats()['failures']), (1, 1))
+
+        write_queue.close()
+
+    def test_close_while_submitting(self):
+        write_queue = Write_Queue(max_batch=4, max_delay=0.001)
+
+        with ThreadPoolExecutor(8) as pool:
+            results = [pool.submit(write_queue.submit, abs, -index) for index in range(200)]
+            write_queue.close()
+
+            # Writes submitted after close() run inline, none is left waiting on the stopped writer
+            self.assertEqual([result.result(timeout=10) for result in results], list(range(200)))
+
+    @override_settings(API_PROFILING=True)
+    def test_queued_writes_are_profiled(self):
+        response = Client().post('/api/', json.dumps({'model': 'category', 'fields': {'name': 'Python'}}), content_type='application/json')
+
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+
+        self.assertTrue({'write_queue', 'write'} <= set(metrics))
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    def test_responses(self):
+        Category.objects.create(name='Python', icon='python')
+
+        self.assertEqual(self.put({'model': 'category', 'filter': {'name': 'Python'}, 'fields': {'icon': 'snake'}}).status_code, 200)
+        self.assertEqual(self.put({'model': 'category', 'filter': {'name': 'Missing'}, 'fields': {'icon': 'snake'}}).json()['msg'], 'PUT - Category matching query does not exist.')
+        self.assertEqual(Client().delete('/api/', json.dumps({'model': 'category', 'filter': {'icon': 'snake'}}), content_type='application/json').status_code, 200)
+        self.assertEqual(Category.objects.count(), 0)
+
+
+@override_settings(API_CHANGE_FEED_DURATION=0)
+class Change_Feed_Tests(TransactionTestCase):
+    # Changes are recorded once committed
+    databases = {'default', 'read'}
+
+    def stream(self, last_id: str, **params) -> list:
+        response = Client().get('/api/changes/', params, HTTP_LAST_EVENT_ID=last_id)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = []
+        for block in b''.join(response.streaming_content).decode('utf-8').split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':') and ': ' in line)
+            if 'event' in fields:
+                events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+
+        return events
+
+    def test_model_changes(self):
+        last_id = event_log.last_id
+
+        category = Category.objects.create(name='Python', icon='python')
+        category.icon = 'snake'
+        category.save()
+        category.delete()
+
+        events = self.stream(last_id, model='category')
+
+        self.assertEqual([(event['action'], event['pk']) for _, _, event in events], [('create', category.id), ('update', category.id), ('delete', category.id)])
+        self.assertEqual(events[1][2]['data']['icon'], 'snake')
+        self.assertIsNone(events[2][2]['data'])
+        self.assertNotIn('API_Model', {event['model'] for _, _, event in self.stream(last_id)})
+
+        # Resuming after the first event
+        self.assertEqual([event['action'] for _, _, event in self.stream(events[0][0], model='category')], ['update', 'delete'])
+
+    def test_bulk_writes_and_filter(self):
+        last_id = event_log.last_id
+
+        Client().post('/api/', json.dumps({'model': 'category', 'bulk': [{'name': 'Python'}, {'name': 'Go'}]}), content_type='application/json')
+        Category.objects.filter(name='Go').update(icon='go')
+
+        self.assertIn({'model': 'Category', 'action': 'refresh', 'pk': None, 'data': None}, [event for _, _, event in self.stream(last_id)])
+        self.assertEqual(self.stream(last_id, model='widget'), [])
+        self.assertEqual(Client().get('/api/changes/', {'model': 'missing'}).status_code, 404)
+
+    def test_rolled_back_changes(self):
+        last_id = event_log.last_id
+
+        try:
+            with transaction.atomic():
+                Category.objects.create(name='Python', icon='python')
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(self.stream(last_id), [])
+
+    def test_rolled_back_bulk_writes(self):
+        last_id, version = event_log.last_id, model_versions.get('Category')
+
+        try:
+            with batched_writes(), transaction.atomic():
+                Category.objects.create(name='Python', icon='python')
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(self.stream(last_id), [])
+        self.assertEqual(model_versions.get('Category'), version)
+
+    def test_resume_after_dropped_events(self):
+        log = Event_Log(max_events=2)
+        for index in range(4):
+            log.append('Category', 'delete', index)
+
+        self.assertEqual([event.pk for event in log.since(2)], [2, 3])
+        self.assertIsNone(log.since(1))
+        self.assertIsNone(log.since(10))
+        self.assertFalse(log.wait(4, 0))
+
+        # A client resuming from a dropped (or unknown) event is told to refetch
+        events = self.stream(event_log.event_id(event_log.sequence + 10))
+        self.assertEqual(events, [(event_log.last_id, 'reset', {})])
+
+    def test_stream_limit(self):
+        from . import change_feed
+
+        with mock.patch.object(change_feed, 'stream_slots', threading.BoundedSemaphore(1)):
+            response = Client().get('/api/changes/')
+            self.assertEqual(Client().get('/api/changes/').status_code, 503)
+
+            # Closing a stream frees its slot
+            response.close()
+            self.assertEqual(Client().get('/api/changes/').status_code, 200)
+
+    def test_ids_unique_to_process(self):
+        Category.objects.create(name='Python', icon='python')
+
+        # Another worker process (or this one before a restart) numbers its events from the same sequence
+        other_log = Event_Log()
+        self.assertNotEqual(other_log.event_id(event_log.sequence - 1), event_log.event_id(event_log.sequence - 1))
+        self.assertIsNone(event_log.parse_id(other_log.event_id(event_log.sequence - 1)))
+
+        for last_id in (other_log.event_id(event_log.sequence - 1), str(event_log.sequence - 1), 'x'):
+            self.assertEqual(self.stream(last_id), [(event_log.last_id, 'reset', {})])
+
+        self.assertEqual(event_log.parse_id(event_log.last_id), event_log.sequence)
@@ -1,14 +1,96 @@
 
-from django.http import JsonResponse, HttpRequest, QueryDict
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseNotModified, HttpRequest, QueryDict
+from django.utils.http import parse_etags
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from django.utils.text import compress_sequence
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models.query import QuerySet
+from django.db.models import Q, Count, Min, Max, Sum, AutoField, IntegerField, FloatField, DecimalField
 from django.conf import settings
-from django.apps import apps
-from .errors import API_Error
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .errors import API_Error, API_Bulk_Error
 from .models import API_Model
+from .serializers import serializer_plan
+from .registry import model_registry
+from .query_plans import compile_query
+from .versions import model_versions
+from .signals import model_written, batched_writes
+from .profiling import profile_stage
 from typing import Type
-import logging, json
+import logging, json, base64, hashlib, gzip
 
-def api_response(content: dict = {}, code: int = 400) -> JsonResponse:
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Aggregate functions GET queries may compute (/api/?model=<<model>>&aggregate=<<function>>:<<field>>)
+AGGREGATE_FUNCTIONS = {'count': Count, 'min': Min, 'max': Max, 'sum': Sum}
+
+# Field types that can be summed
+NUMERIC_FIELDS = (AutoField, IntegerField, FloatField, DecimalField)
+
+# Compression levels of API responses (fast enough to compress every response on the fly)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def stdlib_json_encoder(content) -> bytes:
+    ''' Encode JSON with the standard library (and Django's encoder for dates, decimals and UUIDs). '''
+
+    return json.dumps(content, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def orjson_encoder(content) -> bytes:
+    ''' Encode JSON with orjson. Dates are passed through to Django's encoder so the output matches the standard library's. '''
+
+    return orjson.dumps(content, default=DjangoJSONEncoder().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def load_json_encoder():
+    ''' Load the JSON encoder configured by settings.API_JSON_ENCODER: 'auto' (orjson if installed, otherwise
+        the standard library), 'orjson', 'json' or the dotted path of any function encoding an object to bytes.
+
+        <-- The encoder function.
+    '''
+
+    encoder = getattr(settings, 'API_JSON_ENCODER', 'auto')
+
+    if encoder == 'auto':
+        return orjson_encoder if orjson is not None else stdlib_json_encoder
+
+    if encoder == 'orjson':
+        if orjson is None:
+            raise ImportError('settings.API_JSON_ENCODER is \'orjson\' but orjson is not installed')
+
+        return orjson_encoder
+
+    if encoder == 'json':
+        return stdlib_json_encoder
+
+    return import_string(encoder)
+
+
+def encode_json(content) -> bytes:
+    ''' Encode an object to JSON with the configured encoder (see load_json_encoder()).
+
+        --> content : The JSON serializable object.
+
+        <-- The UTF-8 encoded JSON.
+    '''
+
+    return load_json_encoder()(content)
+
+
+@profile_stage('encode')
+def api_response(content: dict = {}, code: int = 400) -> HttpResponse:
     ''' Format an API JSON response.
 
         --> content [dict] : A dictionary of JSON serializable objects to return. Optional.
@@ -20,7 +102,158 @@ def api_response(content: dict = {}, code: int = 400) -> JsonResponse:
 
     content['code'] = code
     
-    return JsonResponse(content, status=code)
+    return HttpResponse(encode_json(content), status=code, content_type='application/json')
+
+
+def api_stream_response(plan, models: QuerySet) -> StreamingHttpResponse:
+    ''' Format an API JSON response that is serialized and sent incrementally. The queryset is
+        read from the database in chunks (API_STREAM_CHUNK_SIZE rows at a time) and each chunk
+        is written out as soon as it is serialized, so memory use does not grow with the result size.
+
+        --> plan [Serializer_Plan] : The serializer plan of the models (see fetch_serializer_plan()).
+
+        --> models : The queryset of models to serialize.
+        
+        <-- The streamed JSON formatted response. { "models": [<<models>>], "code": <<code>> }
+    '''
+
+    chunk_size = getattr(settings, 'API_STREAM_CHUNK_SIZE', 2000)
+    rows = plan.iterate(models, chunk_size)
+
+    # Read the first row up front so the status code is known before the first byte is sent
+    first = next(rows, None)
+    code = 200 if first is not None else 404
+
+    def stream():
+        if first is None:
+            yield '{{"models": [], "code": {}}}'.format(code).encode('utf-8')
+            return
+
+        encode = load_json_encoder()
+        chunk = [encode(first)]
+
+        # Chunks after the first are prefixed with the separator, so the array never ends in a trailing comma
+        separator = b''
+
+        yield b'{"models": ['
+
+        for model in rows:
+            chunk.append(encode(model))
+
+            if len(chunk) == chunk_size:
+                yield separator + b', '.join(chunk)
+                separator, chunk = b', ', []
+
+        yield (separator + b', '.join(chunk) if chunk else b'') + '], "code": {}}}'.format(code).encode('utf-8')
+
+    return StreamingHttpResponse(stream(), status=code, content_type='application/json')
+
+
+def api_compressed_response(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    ''' Compress an API response with brotli (if installed) or gzip, whichever the client accepts
+        (Accept-Encoding). Responses smaller than settings.API_COMPRESSION_MIN_BYTES are sent as is.
+        Streamed responses are compressed as they are sent.
+
+        --> request : The request sent to the API.
+
+        --> response : The (JSON) response to send.
+
+        <-- The response, compressed if possible.
+    '''
+
+    if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code == 304:
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    if not response.streaming and len(response.content) < getattr(settings, 'API_COMPRESSION_MIN_BYTES', 1024):
+        return response
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    if brotli is not None and 'br' in accepted:
+        coding = 'br'
+        if response.streaming:
+            response.streaming_content = brotli_sequence(response.streaming_content)
+        else:
+            response.content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+
+    elif 'gzip' in accepted:
+        coding = 'gzip'
+        if response.streaming:
+            response.streaming_content = compress_sequence(response.streaming_content)
+        else:
+            response.content = gzip.compress(response.content, compresslevel=GZIP_LEVEL)
+
+    else:
+        return response
+
+    response['Content-Encoding'] = coding
+
+    if response.streaming:
+        del response['Content-Length']
+    else:
+        response['Content-Length'] = str(len(response.content))
+
+    # The compressed representation is not byte for byte the same as the uncompressed one
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+    return response
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    for item in sequence:
+        yield compressor.process(item) + compressor.flush()
+
+    yield compressor.finish()
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    ''' Parse the content codings a client accepts (e.g. "gzip, deflate, br;q=0.5").
+
+        --> accept_encoding : The Accept-Encoding header sent with the request.
+
+        <-- The accepted content codings (without those refused with q=0).
+    '''
+
+    accepted = set()
+
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.strip().partition(';')
+        quality = params.strip()
+
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+
+        if name:
+            accepted.add(name.strip().lower())
+
+    if '*' in accepted:
+        accepted.update(('gzip', 'br'))
+
+    return accepted
+
+
+def api_not_modified_response(etag: str) -> HttpResponseNotModified:
+    ''' Format an API response telling the client its cached copy of the response is still valid.
+
+        --> etag : The ETag of the (unchanged) response.
+
+        <-- The empty 304 response.
+    '''
+
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+
+    return response
 
 
 def api_error_response(method: str, exception: Exception) -> JsonResponse:
@@ -33,23 +266,88 @@ def api_error_response(method: str, exception: Exception) -> JsonResponse:
         <-- A JSON formatted error response : { "msg" <<error_message>>, "code": <<code>> }.
     '''
 
+    content, error_code = api_error_content(method, exception)
+
+    return api_response(content, error_code)
+
+
+def api_error_content(method: str, exception: Exception) -> tuple:
+    ''' Format and log the content of an API error without wrapping it in a response
+        (e.g. for one failed sub-query of a batch request).
+
+        --> method : The HTTP request method that generated the error (e.g. POST).
+        
+        --> exception : The error generated.
+        
+        <-- The error content and the HTTP status code : ({ "msg" <<error_message>> }, <<code>>).
+    '''
+
     error_msg = '{} - {}'.format(method, str(exception)) 
-    error_code = exception.code if type(exception) == API_Error else 500
+    error_code = exception.code if isinstance(exception, API_Error) else 500
     
-    log_error(error_msg)
+    log_error(error_msg, {'method': method, 'code': error_code, 'error': type(exception).__name__})
+
+    if isinstance(exception, API_Bulk_Error):
+        return {'msg': error_msg, 'errors': exception.errors}, error_code
 
-    return api_response({'msg': error_msg}, error_code)
+    return {'msg': error_msg}, error_code
 
 
-def log_error(message : str):
-    ''' Logs an API error to /logs/api.log if DEBUG is True in settings.
+def log_error(message : str, fields: dict = None):
+    ''' Logs an API error to /logs/api.log if DEBUG is True in settings. The record is only queued
+        here, it is written to disk in the background (see api.logging_handlers.Async_File_Handler).
 
         --> message : The message to log.
+
+        --> fields : Structured fields to log with the message (e.g. the status code). Optional.
     '''
 
     if settings.DEBUG:
         logger = logging.getLogger('api')
-        logger.error(message)
+        logger.error(message, extra={'fields': fields})
+
+
+def query_etag(model_types: list, query: str) -> str:
+    ''' Build the (strong) ETag of a GET query's response from the current versions of the model types it reads.
+        The ETag changes whenever any of the model types is written to.
+
+        Per-process versions miss the writes of other workers (a worker would keep answering 304 for data
+        another worker changed), so with more than one worker (settings.API_WORKER_PROCESSES) ETags
+        are only built from versions shared by every worker (settings.API_SHARED_MEMORY).
+
+        --> model_types : The types (classes) of the models the query reads.
+
+        --> query : The query string of the request.
+
+        <-- The quoted ETag or None if responses cannot be validated.
+    '''
+
+    if not model_versions.shared and getattr(settings, 'API_WORKER_PROCESSES', 1) > 1:
+        return None
+
+    versions = ['{}:{}'.format(model_type.__name__, model_versions.get(model_type.__name__)) for model_type in model_types]
+    payload = '\n'.join([model_versions.token, query] + versions)
+
+    return '"{}"'.format(hashlib.sha1(payload.encode('utf-8')).hexdigest())
+
+
+def etag_matches(request: HttpRequest, etag: str) -> bool:
+    ''' Check whether a conditional request's If-None-Match header matches the current ETag of the response.
+
+        --> request : The request sent to the API.
+
+        --> etag : The current (quoted) ETag of the response.
+
+        <-- True if the client's cached copy of the response is still valid.
+    '''
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = parse_etags(if_none_match)
+
+    return '*' in etags or etag in etags or etag in [tag[2:] for tag in etags if tag.startswith('W/')]
 
 
 def handle_unsupported_method(request : HttpRequest):
@@ -75,7 +373,7 @@ def validate_fields(fields: [dict, list], model_type: API_Model):
                                          base API model class defined in api/models.py).
     '''
     
-    model_fields = [field.name for field in model_type._meta.fields]
+    model_fields = model_registry.entry(model_type).fields
     for field in fields:
         if field not in model_fields:
             raise API_Error('Field \'{}\' not found for model: \'{}\''.format(field, model_type.__name__), 400)
@@ -91,8 +389,12 @@ def parse_query_pairs(payload: str) -> dict:
     '''
 
     pairs = {}
-    for pair_tuple in map(lambda pair: pair.split(':'), [pair for pair in payload.split(',')]):
-        pairs[pair_tuple[0]] = pair_tuple[1]
+    for pair in payload.split(','):
+        key, separator, value = pair.partition(':')
+        if not separator:
+            raise API_Error('Invalid key:value pair: \'{}\''.format(pair), 400)
+
+        pairs[key] = value
 
     return pairs
 
@@ -106,7 +408,56 @@ def parse_query_params(payload: str) -> list:
         <-- The parsed values.
     '''
 
-    return [value for value in payload.split(',')]
+    return payload.split(',')
+
+
+def parse_query_flag(payload: str) -> bool:
+    ''' Parse a boolean flag from a query string (e.g. /api/?param=true || /api/?param=1).
+    
+        --> payload : The argument supplied with the parameter. Optional.
+
+        <-- True if the flag is set.
+    '''
+
+    return str(payload).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Parameters of a batch sub-query
+BATCH_PARAMS = ('model', 'filter', 'sort', 'fields', 'expand', 'limit', 'cursor', 'count', 'exists', 'aggregate', 'group_by')
+
+def parse_batch_queries(payload: [str, list]) -> list:
+    ''' Parse out the sub-queries of a batch request
+        (e.g. /api/?batch=[{"key": "header", "model": "widget", "filter": "name:header"}, {"model": "category"}]).
+    
+        --> payload : The JSON list of sub-queries (or the already decoded list). Each sub-query
+                      supports the same parameters as a single GET request (see BATCH_PARAMS) and
+                      an optional key to return its results under (defaults to its index).
+
+        <-- A list of (key, sub-query parameters) tuples.
+    '''
+
+    if type(payload) == str:
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            raise API_Error('Batch sub-queries must be a JSON list! (param: batch)', 400)
+
+    if type(payload) != list or not all(type(query) == dict for query in payload):
+        raise API_Error('Batch sub-queries must be a JSON list! (param: batch)', 400)
+
+    max_queries = getattr(settings, 'API_BATCH_MAX_QUERIES', 20)
+    if len(payload) > max_queries:
+        raise API_Error('Too many batch sub-queries! (max: {})'.format(max_queries), 400)
+
+    queries = []
+    for index, query in enumerate(payload):
+        key = str(query.get('key', index))
+        if key in [existing for existing, _ in queries]:
+            raise API_Error('Duplicate batch sub-query key: \'{}\''.format(key), 400)
+
+        queries.append((key, {param: query[param] for param in BATCH_PARAMS if param in query}))
+
+    return queries
 
 
 def get_model(model_name: str) -> Type[API_Model]:
@@ -118,14 +469,12 @@ def get_model(model_name: str) -> Type[API_Model]:
         <-- The actual class type with access to model methods or None if not found.
     '''
 
-    try:
-        norm_name = '_'.join([chunk.upper() for chunk in model_name.split('_')])
-
-        return apps.get_model('api', norm_name)
-    
-    except LookupError as e: pass
+    entry = model_registry.get(model_name)
+    if entry is not None:
+        return entry.model_type
 
 
+@profile_stage('model')
 def fetch_model_type(method: str, request_params: dict) -> Type[API_Model]:
     ''' Ensures the request references a defined model and fetches that model type if the request method
         is allowed for that model.
@@ -141,17 +490,21 @@ def fetch_model_type(method: str, request_params: dict) -> Type[API_Model]:
         raise API_Error('No model supplied in query parameters! (param: model)', 400)
 
     model_name = request_params['model'] 
-    model_type = get_model(model_name)
+    if not isinstance(model_name, str):
+        raise API_Error('Invalid model: {} (param: model)'.format(json.dumps(model_name)), 400)
+
+    entry = model_registry.get(model_name)
         
-    if not model_type:
+    if not entry:
         raise API_Error('Model not found: \'{}\''.format(model_name), 404)
 
-    if method not in model_type.supported_methods and 'ALL' not in model_type.supported_methods:
+    if not entry.allows(method):
         raise API_Error('Method not supported for model: \'{}\''.format(model_name), 405)
 
-    return model_type
+    return entry.model_type
 
 
+@profile_stage('filter')
 def fetch_and_filter_models(model_type: API_Model, request_params: dict) -> QuerySet:
     ''' Fetch models from the database matching a filter supplied in an HTTP request.
         Ensure fields supplied in the filter exist for the model. If no filter is supplied
@@ -166,17 +519,9 @@ def fetch_and_filter_models(model_type: API_Model, request_params: dict) -> Quer
             supplied model.
     '''
 
-    model_filter = request_params.get('filter', {}) 
-    if model_filter != {}:
-        if type(model_filter) == str:
-            model_filter = parse_query_pairs(model_filter)
-            
-        validate_fields([param.split('_')[0] for param in model_filter], model_type)
-
-        return model_type.objects.filter(**model_filter)
-
-    return model_type.objects.all()
+    return compile_query(model_type, request_params).filter(model_type.objects.all())
     
+@profile_stage('sort')
 def sort_models(model_type: API_Model, models: QuerySet, request_params: dict) -> QuerySet:
     ''' Sorts a queryset of models according to the parameters sent in an HTTP request.
         Ensure fields supplied in the sort exist for the model.
@@ -191,18 +536,405 @@ def sort_models(model_type: API_Model, models: QuerySet, request_params: dict) -
         <-- A queryset containing the sorted models.
     '''
 
-    model_sort = request_params.get('sort', {})
+    return compile_query(model_type, request_params).order(models)
 
-    if model_sort != {}:
-        if type(model_sort) == str:
-            model_sort = parse_query_params(model_sort)
+def fetch_serializer_plan(model_type: API_Model, request_params: dict):
+    ''' Fetch the serializer plan for the models requested by a GET query, projected to the fields
+        sent in the HTTP request if any (e.g. /api/?model=category&fields=name,icon). Ensure the fields
+        exist for the model and are serializable (relational fields are not).
 
-        validate_fields([param if param[0] != '-' else param[1::] for param in model_sort], model_type)
+        --> model_type Type[API_Model] : The type (class) of the models being serialized.
+    
+        --> request_params : The parameters sent with the request (in querystring or body).
 
-        return models.order_by(*model_sort)
+        <-- The (projected) serializer plan.
+    '''
+
+    plan = serializer_plan(model_type)
+    model_fields = request_params.get('fields', [])
+
+    if model_fields:
+        if type(model_fields) == str:
+            model_fields = parse_query_params(model_fields)
+
+        validate_fields(model_fields, model_type)
+
+        for field in model_fields:
+            if field not in plan.names:
+                raise API_Error('Field \'{}\' cannot be returned for model: \'{}\''.format(field, model_type.__name__), 400)
+
+        plan = plan.project(tuple(dict.fromkeys(model_fields)))
+
+    return plan
+
+
+def model_relations(model_type: API_Model) -> dict:
+    ''' Find the relations of a model type that can be expanded in GET responses: forward foreign keys and
+        one-to-ones (joined with select_related()) and reverse relations and many-to-manys (fetched with 
+        prefetch_related()). Links to parent models (model inheritance) are not relations.
+
+        --> model_type Type[API_Model] : The type (class) of the model.
+
+        <-- The relations keyed by name (the accessor for reverse relations, e.g. project_set):
+            { <<name>>: (<<related model type>>, <<many>>) }.
+    '''
+
+    relations = {}
+
+    for field in model_type._meta.fields:
+        if field.is_relation and not (field.one_to_one and field.remote_field.parent_link):
+            relations[field.name] = (field.related_model, False)
+
+    for field in model_type._meta.many_to_many:
+        relations[field.name] = (field.related_model, True)
+
+    for relation in model_type._meta.related_objects:
+        if not relation.parent_link:
+            relations[relation.get_accessor_name()] = (relation.related_model, relation.multiple)
+
+    return relations
+
+
+def fetch_expansions(model_type: API_Model, request_params: dict) -> list:
+    ''' Ensure the relations to expand sent in an HTTP request (e.g. /api/?model=project&expand=project_category)
+        exist for the model.
+
+        --> model_type Type[API_Model] : The type (class) of the models being fetched.
+    
+        --> request_params : The parameters sent with the request (in querystring or body).
+
+        <-- (name, related model type, many) tuples for each relation to expand.
+    '''
+
+    model_expand = request_params.get('expand', [])
+    if type(model_expand) == str:
+        model_expand = parse_query_params(model_expand)
+
+    relations = model_relations(model_type) if model_expand else {}
+
+    expansions = []
+    for name in dict.fromkeys(model_expand):
+        if name not in relations:
+            raise API_Error('Relation \'{}\' not found for model: \'{}\''.format(name, model_type.__name__), 400)
+
+        expansions.append((name,) + relations[name])
+
+    return expansions
+
+
+def expand_models(models: QuerySet, expansions: list) -> QuerySet:
+    ''' Fetch the related models of a queryset along with it: single related models are joined into the
+        query (select_related()) and many related models are fetched with one extra query per relation
+        (prefetch_related()).
+
+        --> models : The queryset of models to expand.
+
+        --> expansions : The relations to expand (see fetch_expansions()).
+
+        <-- The expanded queryset.
+    '''
+
+    single = [name for name, _, many in expansions if not many]
+    multiple = [name for name, _, many in expansions if many]
+
+    if single:
+        models = models.select_related(*single)
+
+    if multiple:
+        models = models.prefetch_related(*multiple)
 
     return models
 
+
+@profile_stage('serialize')
+def serialize_expanded_models(plan, models, expansions: list) -> list:
+    ''' Serialize models with their related models embedded (e.g. {"project_category": {<<category>>}}).
+
+        --> plan [Serializer_Plan] : The serializer plan of the models (see fetch_serializer_plan()).
+
+        --> models : The models to serialize (fetched by a queryset expanded by expand_models()).
+
+        --> expansions : The relations to embed (see fetch_expansions()).
+
+        <-- A list of JSON serializable dictionaries.
+    '''
+
+    related_plans = [(name, serializer_plan(related_type), many) for name, related_type, many in expansions]
+
+    serialized = []
+    for model in models:
+        data = plan.serialize_model(model)
+
+        for name, related_plan, many in related_plans:
+            related = getattr(model, name, None)
+
+            if many:
+                data[name] = [related_plan.serialize_model(related_model) for related_model in related.all()]
+            else:
+                data[name] = related_plan.serialize_model(related) if related is not None else None
+
+        serialized.append(data)
+
+    return serialized
+
+
+@profile_stage('paginate')
+def paginate_models(model_type: API_Model, models: QuerySet, request_params: dict) -> tuple:
+    ''' Limit a sorted queryset of models to one page using keyset (cursor) pagination. Pages are
+        ordered by the sort parameters sent in the HTTP request with the primary key as a tie-breaker,
+        and each page continues from the sort values of the last model of the previous page (passed back
+        in an opaque cursor), so every page costs the same regardless of how deep it is.
+
+        --> model_type Type[API_Model] : The type (class) of the models being paginated.
+
+        --> models : The sorted queryset of models to paginate.
+    
+        --> request_params : The parameters sent with the request (in querystring or body).
+
+        <-- A list containing the models on the requested page and the cursor of the next page 
+            (None if this is the last page).
+    '''
+
+    try:
+        limit = int(request_params['limit'])
+    except (TypeError, ValueError):
+        raise API_Error('Page limit must be an integer! (param: limit)', 400)
+
+    max_limit = getattr(settings, 'API_PAGE_MAX_LIMIT', 1000)
+    if limit < 1 or limit > max_limit:
+        raise API_Error('Page limit must be between 1 and {}! (param: limit)'.format(max_limit), 400)
+
+    model_sort = list(compile_query(model_type, request_params).sort)
+
+    sort_fields = [(model_type._meta.get_field(param.lstrip('-')), param[0] == '-') for param in model_sort]
+    sort_fields.append((model_type._meta.pk, False))
+
+    models = models.order_by(*model_sort, 'pk')
+
+    if request_params.get('cursor'):
+        values = decode_cursor(request_params['cursor'], model_sort)
+
+        if len(values) != len(sort_fields):
+            raise API_Error('Invalid page cursor! (param: cursor)', 400)
+
+        models = models.filter(keyset_filter(sort_fields, values))
+
+    page = list(models[:limit + 1])
+    if len(page) <= limit:
+        return page, None
+
+    last = page[limit - 1]
+
+    return page[:limit], encode_cursor(model_sort, [getattr(last, field.attname) for field, _ in sort_fields])
+
+
+def keyset_filter(sort_fields: list, values: list) -> Q:
+    ''' Build the filter selecting every model sorted after a given position
+        (e.g. sort=a,-b -> a > x OR (a = x AND b < y) OR (a = x AND b = y AND pk > z)).
+        NULLs sort first in ascending order (SQLite).
+
+        --> sort_fields : (field, descending) tuples for each sort field, ending with the primary key.
+
+        --> values : The sort field values of the last model on the previous page.
+
+        <-- The keyset filter.
+    '''
+
+    keyset, equal = Q(pk__in=[]), Q()
+
+    for (field, descending), value in zip(sort_fields, values):
+        name = field.attname
+
+        if value is None:
+            if not descending:
+                keyset |= equal & Q(**{name + '__isnull': False})
+
+            equal &= Q(**{name + '__isnull': True})
+
+        else:
+            after = Q(**{name + ('__lt' if descending else '__gt'): value})
+            if descending:
+                after |= Q(**{name + '__isnull': True})
+
+            keyset |= equal & after
+            equal &= Q(**{name: value})
+
+    return keyset
+
+
+def encode_cursor(model_sort: list, values: list) -> str:
+    ''' Encode the position of a model in a sorted queryset as an opaque page cursor.
+
+        --> model_sort : The sort parameters of the paginated query.
+
+        --> values : The model's sort field values (and primary key).
+
+        <-- The page cursor.
+    '''
+
+    payload = json.dumps({'sort': model_sort, 'values': values}, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, model_sort: list) -> list:
+    ''' Decode a page cursor created by encode_cursor(). The cursor must have been created 
+        by a query with the same sort parameters.
+
+        --> cursor : The page cursor sent with the request.
+
+        --> model_sort : The sort parameters of the paginated query.
+
+        <-- The sort field values (and primary key) of the last model on the previous page.
+    '''
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        sort, values = payload['sort'], payload['values']
+    except (AttributeError, ValueError, TypeError, KeyError):
+        raise API_Error('Invalid page cursor! (param: cursor)', 400)
+
+    if sort != list(model_sort) or type(values) != list:
+        raise API_Error('Page cursor does not match the sort parameters! (param: cursor)', 400)
+
+    return values
+
+
+def fetch_aggregate_mode(request_params: dict) -> str:
+    ''' Find whether a GET query asks for a scalar result computed by the database (count, exists or
+        aggregate) instead of the models themselves, and ensure it is not combined with parameters that
+        only apply to lists of models.
+
+        --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+        <-- The aggregate mode (count, exists or aggregate) or None if the query fetches models.
+    '''
+
+    modes = [mode for mode in ('count', 'exists') if parse_query_flag(request_params.get(mode))]
+    if request_params.get('aggregate'):
+        modes.append('aggregate')
+
+    if request_params.get('group_by') and 'aggregate' not in modes:
+        raise API_Error('Groups must be aggregated! (params: group_by, aggregate)', 400)
+
+    if not modes:
+        return None
+
+    if len(modes) > 1:
+        raise API_Error('Only one of count, exists and aggregate can be requested! (params: {})'.format(', '.join(modes)), 400)
+
+    for param in ('fields', 'expand', 'limit', 'cursor', 'stream'):
+        if param in request_params:
+            raise API_Error('Aggregate queries cannot be projected, expanded, paginated or streamed! (param: {})'.format(param), 400)
+
+    return modes[0]
+
+
+def parse_aggregates(model_type: API_Model, payload: [str, list]) -> dict:
+    ''' Parse and validate the aggregates requested by a GET query
+        (e.g. /api/?model=project&aggregate=count:id,max:id).
+
+        --> model_type Type[API_Model] : The type (class) of the models being aggregated.
+
+        --> payload : The aggregates (a comma separated string or a list of <<function>>:<<field>> strings).
+
+        <-- The aggregate expressions keyed by the name they are returned under (<<field>>__<<function>>).
+    '''
+
+    if type(payload) == str:
+        payload = parse_query_params(payload)
+
+    if not isinstance(payload, (list, tuple)):
+        raise API_Error('Aggregate must be a list of function:field pairs! (param: aggregate)', 400)
+
+    entry = model_registry.entry(model_type)
+
+    aggregates = {}
+    for item in payload:
+        function, separator, name = str(item).partition(':')
+        if not separator or function not in AGGREGATE_FUNCTIONS:
+            raise API_Error('Invalid aggregate: \'{}\' (functions: {})'.format(item, ', '.join(AGGREGATE_FUNCTIONS)), 400)
+
+        if name not in entry.fields:
+            raise API_Error('Field \'{}\' not found for model: \'{}\''.format(name, model_type.__name__), 400)
+
+        field = model_type._meta.get_field(name)
+        if function == 'sum' and (field.is_relation or not isinstance(field, NUMERIC_FIELDS)):
+            raise API_Error('Field \'{}\' cannot be summed for model: \'{}\''.format(name, model_type.__name__), 400)
+
+        aggregates['{}__{}'.format(name, function)] = AGGREGATE_FUNCTIONS[function](name)
+
+    return aggregates
+
+
+def parse_group_by(model_type: API_Model, payload: [str, list]) -> list:
+    ''' Parse and validate the fields a GET query groups its aggregates by (e.g. group_by=project_category).
+        Only sortable fields (see API_Model.sortable_fields) can be grouped by, since they share the indexes
+        GROUP BY uses.
+
+        --> model_type Type[API_Model] : The type (class) of the models being aggregated.
+
+        --> payload : The fields (a comma separated string or a list). Optional.
+
+        <-- The fields to group by.
+    '''
+
+    if not payload:
+        return []
+
+    if type(payload) == str:
+        payload = parse_query_params(payload)
+
+    if not isinstance(payload, (list, tuple)):
+        raise API_Error('Group by must be a list of fields! (param: group_by)', 400)
+
+    entry = model_registry.entry(model_type)
+
+    for name in payload:
+        if name not in entry.fields:
+            raise API_Error('Field \'{}\' not found for model: \'{}\''.format(name, model_type.__name__), 400)
+
+        if name not in entry.sortable:
+            raise API_Error('Field \'{}\' cannot be grouped for model: \'{}\''.format(name, model_type.__name__), 400)
+
+    return list(dict.fromkeys(payload))
+
+
+@profile_stage('aggregate')
+def aggregate_models(model_type: API_Model, mode: str, request_params: dict) -> tuple:
+    ''' Count, check for or aggregate the models matching a GET query's filter in the database
+        (COUNT, EXISTS and GROUP BY queries), without loading the models.
+
+        --> model_type Type[API_Model] : The type (class) of the models requested.
+
+        --> mode : The aggregate mode of the query (see fetch_aggregate_mode()).
+
+        --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+        <-- The response content and the HTTP status code to respond with (always 200, an empty result is a
+            count of 0).
+    '''
+
+    filtered_models = fetch_and_filter_models(model_type, request_params)
+
+    if mode == 'count':
+        return {'count': filtered_models.count()}, 200
+
+    if mode == 'exists':
+        return {'exists': filtered_models.exists()}, 200
+
+    aggregates = parse_aggregates(model_type, request_params['aggregate'])
+    group_by = parse_group_by(model_type, request_params.get('group_by'))
+
+    if not group_by:
+        return {'aggregate': filtered_models.aggregate(**aggregates)}, 200
+
+    groups = filtered_models.order_by(*group_by).values(*group_by).annotate(**aggregates)
+
+    return {'groups': list(groups)}, 200
+
+
+@profile_stage('write')
 def create_or_update_model(model_type: API_Model, model: API_Model = None, request_params: dict = {}) -> QuerySet:
     ''' Create or update a model with the parameters sent in an HTTP request.
         Ensure fields to update exist for the model.
@@ -230,3 +962,206 @@ def create_or_update_model(model_type: API_Model, model: API_Model = None, reque
         model = model_type(**model_fields)
 
     model.save()
+
+
+def update_model(model_type: API_Model, request_params: dict):
+    ''' Update the single model matching the filter sent in an HTTP request (see create_or_update_model()).
+
+        --> model_type Type[API_Model] : The type (class) of the model being updated.
+
+        --> request_params [dict] : The parameters sent with the request (in querystring or body).
+    '''
+
+    model = fetch_and_filter_models(model_type, request_params).get()
+
+    create_or_update_model(model_type, model, request_params)
+
+
+def delete_model(model_type: API_Model, request_params: dict):
+    ''' Delete the single model matching the filter sent in an HTTP request.
+
+        --> model_type Type[API_Model] : The type (class) of the model being deleted.
+
+        --> request_params [dict] : The parameters sent with the request (in querystring or body).
+    '''
+
+    fetch_and_filter_models(model_type, request_params).get().delete()
+
+
+def parse_bulk_items(payload: [str, list]) -> list:
+    ''' Parse out the items of a bulk request (e.g. {"bulk": [{<<field1>>: <<value1>>}, {<<field1>>: <<value2>>}]}).
+
+        --> payload : The JSON list of items (or the already decoded list).
+
+        <-- The list of items.
+    '''
+
+    if type(payload) == str:
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            raise API_Error('Bulk items must be a JSON list! (param: bulk)', 400)
+
+    if type(payload) != list or not all(type(item) == dict for item in payload):
+        raise API_Error('Bulk items must be a JSON list! (param: bulk)', 400)
+
+    max_items = getattr(settings, 'API_BULK_MAX_ITEMS', 5000)
+    if len(payload) > max_items:
+        raise API_Error('Too many bulk items! (max: {})'.format(max_items), 400)
+
+    return payload
+
+
+def format_item_error(index: int, exception: Exception) -> dict:
+    ''' Format the error of a single invalid bulk item.
+
+        --> index : The index of the item in the bulk request.
+
+        --> exception : The error generated by the item.
+
+        <-- The item's error : { "index": <<index>>, "msg": <<error_message>> }.
+    '''
+
+    if isinstance(exception, ValidationError) and hasattr(exception, 'error_dict'):
+        message = '; '.join('{}: {}'.format(field, ' '.join(messages)) for field, messages in exception.message_dict.items())
+    else:
+        message = str(exception)
+
+    return {'index': index, 'msg': message}
+
+
+@profile_stage('write')
+def bulk_create_models(model_type: API_Model, request_params: dict) -> int:
+    ''' Create many models (sent as a list of field dictionaries in an HTTP request) in a single 
+        transaction. Every item is validated before anything is written; if any item is invalid
+        nothing is created and the errors of each invalid item are reported.
+
+        Models are inserted in batches of API_BULK_BATCH_SIZE rows, except models that inherit from
+        another concrete model (every API_Model subclass, e.g. Category). Django cannot bulk insert
+        those, so they are saved one by one (two INSERTs each) in the same transaction.
+
+        --> model_type Type[API_Model] : The type (class) of the models being created.
+    
+        --> request_params [dict] : The parameters sent with the request (in querystring or body).
+
+        <-- The number of models created.
+    '''
+
+    models, errors = [], []
+
+    for index, model_fields in enumerate(parse_bulk_items(request_params['bulk'])):
+        try:
+            validate_fields(list(model_fields), model_type)
+
+            model = model_type(**model_fields)
+            model.clean_fields()
+            models.append(model)
+
+        except Exception as exception:
+            errors.append(format_item_error(index, exception))
+
+    if errors:
+        raise API_Bulk_Error('{} bulk item(s) failed validation, nothing was created'.format(len(errors)), 400, errors)
+
+    with batched_writes(), transaction.atomic():
+        # Django cannot bulk insert models that inherit from another concrete model (e.g. API_Model),
+        # those are saved one by one, but still committed together
+        if model_type._meta.parents:
+            for model in models:
+                model.save()
+
+        else:
+            model_type.objects.bulk_create(models, batch_size=getattr(settings, 'API_BULK_BATCH_SIZE', 500))
+            model_written(model_type)
+
+    return len(models)
+
+
+@profile_stage('write')
+def bulk_update_models(model_type: API_Model, request_params: dict) -> int:
+    ''' Update many models in a single transaction. Either every model matching a filter is updated
+        with the same fields ({"filter": {...}, "fields": {...}, "bulk": true}), or each item of a 
+        list matches exactly one model to update with its own fields 
+        ({"bulk": [{"filter": {...}, "fields": {...}}, ...]}). Every item is validated before anything 
+        is written; if any item is invalid nothing is updated and the errors of each invalid item are reported.
+
+        --> model_type Type[API_Model] : The type (class) of the models being updated.
+    
+        --> request_params [dict] : The parameters sent with the request (in querystring or body).
+
+        <-- The number of models updated.
+    '''
+
+    if request_params['bulk'] in (True, 'true'):
+        if not request_params.get('filter'):
+            raise API_Error('No model filter supplied for bulk update! (param: filter)', 400)
+
+        model_fields = request_params.get('fields', {})
+        if type(model_fields) == str:
+            model_fields = parse_query_pairs(model_fields)
+
+        if not model_fields:
+            raise API_Error('No attributes to update supplied for bulk update! (param: fields)', 400)
+
+        validate_fields(list(model_fields), model_type)
+
+        with batched_writes(), transaction.atomic():
+            count = fetch_and_filter_models(model_type, request_params).update(**model_fields)
+            model_written(model_type)
+
+        return count
+
+    models, updated_fields, errors = [], set(), []
+
+    for index, item in enumerate(parse_bulk_items(request_params['bulk'])):
+        try:
+            if not item.get('filter') or not item.get('fields'):
+                raise API_Error('Bulk update items must supply a filter and fields to update', 400)
+
+            validate_fields(list(item['fields']), model_type)
+
+            model = fetch_and_filter_models(model_type, item).get()
+            [model.__setattr__(field, item['fields'][field]) for field in item['fields']]
+            model.clean_fields()
+
+            models.append(model)
+            updated_fields.update(item['fields'])
+
+        except Exception as exception:
+            errors.append(format_item_error(index, exception))
+
+    if errors:
+        raise API_Bulk_Error('{} bulk item(s) failed validation, nothing was updated'.format(len(errors)), 400, errors)
+
+    with batched_writes(), transaction.atomic():
+        if models:
+            model_type.objects.bulk_update(models, list(updated_fields), batch_size=getattr(settings, 'API_BULK_BATCH_SIZE', 500))
+            model_written(model_type)
+
+    return len(models)
+
+
+@profile_stage('write')
+def bulk_delete_models(model_type: API_Model, request_params: dict) -> int:
+    ''' Delete every model matching a filter in a single transaction.
+
+        --> model_type Type[API_Model] : The type (class) of the models being deleted.
+    
+        --> request_params [dict] : The parameters sent with the request (in querystring or body).
+
+        <-- The number of models of @model_type deleted (models of other types deleted by cascade,
+            including the API_Model parent rows, are not counted).
+    '''
+
+    # Only an explicit true selects the bulk delete, any other value (e.g. false) is rejected rather than deleting every match
+    if request_params['bulk'] not in (True, 'true'):
+        raise API_Error('Bulk deletes must set bulk to true! (param: bulk)', 400)
+
+    if not request_params.get('filter'):
+        raise API_Error('No model filter supplied for bulk delete! (param: filter)', 400)
+
+    with batched_writes(), transaction.atomic():
+        _, deleted = fetch_and_filter_models(model_type, request_params).delete()
+        model_written(model_type)
+
+    return deleted.get(model_type._meta.label, 0)
@@ -0,0 +1,87 @@
+from .shared_memory import shared_memory_store
+import threading, uuid
+
+class Model_Versions:
+    ''' Per-model version counters, bumped every time a model type is written to. A model type's
+        version (with the token identifying this set of counters) changes whenever the result of
+        any query of that model type may have changed, so it can be used to validate cached
+        responses (e.g. ETags) without touching the database.
+
+        The counters are kept in this process: writes handled by other worker processes are not seen.
+    '''
+
+    # Whether writes in every worker process bump the counters
+    shared = False
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> int:
+        ''' Fetch the current version of a model type.
+
+            --> model_name : The name of the model type (class).
+
+            <-- The model type's version.
+        '''
+
+        return self._versions.get(model_name, 0)
+
+    def bump(self, model_names: list):
+        ''' Bump the versions of one or more model types.
+
+            --> model_names : The names of the model types (classes) written to.
+        '''
+
+        with self._lock:
+            for model_name in model_names:
+                self._versions[model_name] = self._versions.get(model_name, 0) + 1
+
+    def stats(self) -> dict:
+        ''' Snapshot the version counters.
+
+            <-- The current version of every model type written to since the process started.
+        '''
+
+        return dict(self._versions)
+
+
+class Shared_Model_Versions:
+    ''' Per-model version counters kept in the shared memory store (see shared_memory.Shared_Memory_Store),
+        so a write in any worker process changes the versions every worker reads. Same interface as
+        Model_Versions.
+    '''
+
+    # Prefix of the store's counters holding model versions
+    PREFIX = 'version:'
+
+    shared = True
+
+    def __init__(self, store):
+        self.store = store
+        self.token = store.token
+
+    def get(self, model_name: str) -> int:
+        return self.store.counter(self.PREFIX + model_name)
+
+    def bump(self, model_names: list):
+        self.store.bump([self.PREFIX + model_name for model_name in model_names])
+
+    def stats(self) -> dict:
+        return {name[len(self.PREFIX):]: counter for name, counter in self.store.counters().items() if name.startswith(self.PREFIX)}
+
+
+def load_model_versions():
+    ''' Build the model version counters: shared by every worker process if settings.API_SHARED_MEMORY
+        is set, otherwise kept in this process.
+
+        <-- The model version counters.
+    '''
+
+    store = shared_memory_store()
+
+    return Shared_Model_Versions(store) if store is not None else Model_Versions()
+
+
+model_versions = load_model_versions()
@@ -1,7 +1,17 @@
 from django.shortcuts import render
-from django.http import HttpRequest, JsonResponse, QueryDict
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse, QueryDict
 from .utilities import *
 from .errors import *
+from .template_cache import template_cache
+from .cache import get_response_cache
+from .profiling import stage_histograms
+from .logging_handlers import async_logging_stats
+from .query_plans import query_plan_cache, compile_query
+from .snapshots import query_snapshot, snapshot_stats
+from .shared_memory import shared_memory_store
+from .write_queue import run_write, write_queue_stats
+from .change_feed import event_log, Change_Stream
+from .bundles import widget_bundle, BUNDLE_FORMATS
 import json
 
 def GET(request: HttpRequest) -> JsonResponse:
@@ -34,21 +44,268 @@ def GET(request: HttpRequest) -> JsonResponse:
                     
                     /api/?model=<<model>>&filter=<<field1>>,<<field2>>:<<value>>&sort=<<field1>> 
 
+                Batch - Run several of the above queries in a single request. Results are keyed by each 
+                        sub-query's (optional) key or its index in the list.
+
+                    /api/?batch=[{"key": <<key>>, "model": <<model>>, "filter": <<filter>>, "sort": <<sort>>}, ...]
+
+                Streaming - Serialize and send the models in chunks as they are read from the database
+                            (for large exports). Combines with filtering and sorting.
+
+                    /api/?model=<<model>>&stream=true
+
+                Pagination - Get at most <<limit>> models per request. Responses include a cursor to pass
+                             back to fetch the next page (null on the last page). Combines with filtering
+                             and sorting.
+
+                    /api/?model=<<model>>&limit=<<limit>>
+                    /api/?model=<<model>>&sort=<<field>>&limit=<<limit>>&cursor=<<cursor>>
+
+                Projection - Only read and return some fields of each model. Combines with all of the above.
+
+                    /api/?model=<<model>>&fields=<<field1>>,<<field2>>
+
+                Expansion - Embed the related models of each model (fetched in the same query for single related 
+                            models, one extra query per relation for many related models). Combines with all of
+                            the above except streaming.
+
+                    /api/?model=<<model>>&expand=<<relation1>>,<<relation2>>
+
+                Aggregates - Count, check for or aggregate (count, min, max, sum) the models matching a filter
+                             in the database instead of fetching them. Aggregates can be grouped by one or more
+                             sortable fields. Combines with filtering and batches.
+
+                    /api/?model=<<model>>&count=true
+                    /api/?model=<<model>>&exists=true
+                    /api/?model=<<model>>&aggregate=<<function>>:<<field1>>,<<function>>:<<field2>>
+                    /api/?model=<<model>>&aggregate=<<function>>:<<field>>&group_by=<<field1>>,<<field2>>
+
             GET Response Format:
                 {"models": [models], "code": <<code>>}            
+
+            GET Aggregate Response Formats:
+                {"count": <<count>>, "code": 200}
+                {"exists": <<exists>>, "code": 200}
+                {"aggregate": {<<field>>__<<function>>: <<value>>}, "code": 200}
+                {"groups": [{<<group field>>: <<value>>, <<field>>__<<function>>: <<value>>}], "code": 200}
+
+            GET Paginated Response Format:
+                {"models": [models], "cursor": <<cursor>>, "code": <<code>>}
+
+            Conditional Requests - Every response carries an ETag that changes whenever any model it reads is 
+                                   written to. Requests sending it back in If-None-Match get an empty 304 response 
+                                   (without querying the database) if nothing changed. Not sent when more than
+                                   one worker process runs without API_SHARED_MEMORY (see utilities.query_etag()).
+
+            GET Batch Response Format:
+                {"batch": {<<key>>: {"models": [models], "code": <<code>>} || {"msg": <<error_message>>, "code": <<code>>}}, "code": <<code>>}
     '''
     
     try:
-        model_type = fetch_model_type('GET', request.GET)
-        filtered_models = fetch_and_filter_models(model_type, request.GET)
-        sorted_models = sort_models(model_type, filtered_models, request.GET)
+        queries, etag = prepare_query(request)
+        if etag and etag_matches(request, etag):
+            return api_not_modified_response(etag)
 
-        return api_response({'models': [model.to_json() for model in sorted_models]}, 200 if len(sorted_models) > 0 else 404)
+        return run_query(request, queries, etag)
     
     except Exception as exception:
         return api_error_response('GET', exception)
 
 
+def prepare_query(request: HttpRequest) -> tuple:
+    ''' Parse and validate a GET query (or the sub-queries of a batch) and build its ETag. Does not
+        touch the database.
+
+        --> request : The GET request sent to the server.
+
+        <-- The (key, query parameters) tuples of the request and the current ETag of its response (None
+            if responses cannot be validated, see utilities.query_etag()).
+    '''
+
+    if 'batch' in request.GET:
+        queries = parse_batch_queries(request.GET['batch'])
+    else:
+        fetch_model_type('GET', request.GET)
+        queries = [(None, request.GET)]
+
+    model_types = fetch_query_model_types(queries)
+
+    return queries, query_etag(model_types, request.GET.urlencode())
+
+
+def run_query(request: HttpRequest, queries: list, etag: str) -> HttpResponse:
+    ''' Run a GET query prepared by prepare_query() and build its response.
+
+        --> request : The GET request sent to the server.
+
+        --> queries : The (key, query parameters) tuples of the request.
+
+        --> etag : The current ETag of the response (None to send none).
+
+        <-- The JSON (or streamed JSON) response.
+    '''
+
+    if 'batch' in request.GET:
+        response = api_response({'batch': fetch_batch(queries)}, 200)
+
+    elif parse_query_flag(request.GET.get('stream')):
+        if 'limit' in request.GET or 'expand' in request.GET:
+            raise API_Error('Streamed responses cannot be paginated or expanded! (params: limit, expand)', 400)
+
+        fetch_aggregate_mode(request.GET)
+
+        model_type = fetch_model_type('GET', request.GET)
+        plan = fetch_serializer_plan(model_type, request.GET)
+        response = api_stream_response(plan, fetch_sorted_models(request.GET, model_type))
+
+    else:
+        response = api_response(*fetch_models(request.GET))
+
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+
+    return api_compressed_response(request, response)
+
+
+def fetch_query_model_types(queries: list) -> list:
+    ''' Find every model type a GET query (or each sub-query of a batch) reads, including the model types
+        of expanded relations, and poll each of them for changes made outside the database.
+
+        --> queries : The (key, query parameters) tuples of the request (see parse_batch_queries()).
+
+        <-- The types (classes) of the models read. Sub-queries of unknown models or relations are skipped
+            (they fail when they are run).
+    '''
+
+    model_types = []
+
+    for _, request_params in queries:
+        model_type = get_model(str(request_params.get('model', '')))
+        if not model_type:
+            continue
+
+        model_types.append(model_type)
+
+        try:
+            model_types += [related_type for _, related_type, _ in fetch_expansions(model_type, request_params)]
+        except API_Error:
+            pass
+
+    for model_type in set(model_types):
+        model_type.poll_changes()
+
+    return model_types
+
+
+def fetch_sorted_models(request_params: dict, model_type: Type[API_Model] = None) -> QuerySet:
+    ''' Fetch, filter and sort the models requested by a GET query.
+
+        --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+        --> model_type Type[API_Model] : The type (class) of the models requested. Optional - fetched
+                                         from the request parameters if not set.
+
+        <-- A (lazy) queryset of the models matching the query.
+    '''
+
+    model_type = model_type or fetch_model_type('GET', request_params)
+    filtered_models = fetch_and_filter_models(model_type, request_params)
+
+    return sort_models(model_type, filtered_models, request_params)
+
+
+def fetch_models(request_params: dict) -> tuple:
+    ''' Fetch, filter, sort (and paginate if a limit is supplied) and serialize the models requested 
+        by a GET query. Results are served from (and stored in) the response cache when it is enabled.
+
+        --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+        <-- The response content and the HTTP status code to respond with (404 if nothing matched).
+    '''
+
+    model_type = fetch_model_type('GET', request_params)
+    response_cache = get_response_cache()
+
+    if response_cache.enabled:
+        related_types = [related_type for _, related_type, _ in fetch_expansions(model_type, request_params)]
+        key = response_cache.key(model_type, request_params, related_types)
+        cached = response_cache.get(key)
+
+        if cached is not None:
+            return dict(cached[0]), cached[1]
+
+        content, code = fetch_and_serialize_models(model_type, request_params)
+        response_cache.set(key, [content, code])
+
+        return dict(content), code
+
+    return fetch_and_serialize_models(model_type, request_params)
+
+
+def fetch_and_serialize_models(model_type: Type[API_Model], request_params: dict) -> tuple:
+    ''' Query the database for and serialize the models requested by a GET query (see fetch_models()).
+
+        --> model_type Type[API_Model] : The type (class) of the models requested.
+
+        --> request_params : The parameters sent with the request (in querystring or a batch sub-query).
+
+        <-- The response content and the HTTP status code to respond with (404 if nothing matched,
+            aggregate queries always respond with 200).
+    '''
+
+    mode = fetch_aggregate_mode(request_params)
+    if mode:
+        return aggregate_models(model_type, mode, request_params)
+
+    sorted_models = fetch_sorted_models(request_params, model_type)
+    plan = fetch_serializer_plan(model_type, request_params)
+    expansions = fetch_expansions(model_type, request_params)
+
+    if not expansions and 'limit' not in request_params:
+        rows = query_snapshot(model_type, compile_query(model_type, request_params), plan.attnames)
+        content = {'models': plan.serialize(sorted_models) if rows is None else plan.serialize_rows(rows)}
+
+    else:
+        # Pages and expanded models are serialized from model instances, only load the projected fields
+        if plan.names != serializer_plan(model_type).names:
+            joined = [name for name, _, many in expansions if not many and model_type._meta.get_field(name).concrete]
+            sorted_models = sorted_models.only(*plan.attnames, *joined, *[param.lstrip('-') for param in sorted_models.query.order_by])
+
+        sorted_models = expand_models(sorted_models, expansions)
+
+        if 'limit' in request_params:
+            page, cursor = paginate_models(model_type, sorted_models, request_params)
+            content = {'models': serialize_expanded_models(plan, page, expansions), 'cursor': cursor}
+
+        else:
+            content = {'models': serialize_expanded_models(plan, sorted_models, expansions)}
+
+    return content, 200 if len(content['models']) > 0 else 404
+
+
+def fetch_batch(queries: list) -> dict:
+    ''' Run every sub-query of a batch GET request. A failing sub-query does not fail the batch,
+        its error is returned in place of its models.
+
+        --> queries : The (key, sub-query parameters) tuples of the request (see parse_batch_queries()).
+
+        <-- The results of each sub-query keyed by the sub-query's key.
+    '''
+
+    results = {}
+    for key, request_params in queries:
+        try:
+            content, code = fetch_models(request_params)
+            results[key] = dict(content, code=code)
+
+        except Exception as exception:
+            content, code = api_error_content('GET', exception)
+            results[key] = dict(content, code=code)
+
+    return results
+
+
 def POST(request: HttpRequest) -> JsonResponse:
     ''' Create a new model or respond with the appropriate HTTP status code on error. 
         
@@ -66,8 +323,17 @@ def POST(request: HttpRequest) -> JsonResponse:
                 With Fields - Create a new <<model>> with the provided fields set.
                     { "model": <<model>>, "fields": {<<field1>>: <<value1>>, <<field2>>: <<value2>>} }
 
+                Bulk - Create a new <<model>> for each set of fields in a single transaction. Nothing is 
+                       created if any set of fields is invalid. Models inheriting from API_Model are
+                       saved one by one (see utilities.bulk_create_models()), not bulk inserted.
+                    { "model": <<model>>, "bulk": [{<<field1>>: <<value1>>}, {<<field1>>: <<value2>>}, ...] }
+
             POST Response Format:
                 {"code": <<code>>}            
+
+            POST Bulk Response Format:
+                {"count": <<models created>>, "code": <<code>>}
+                {"msg": <<error_message>>, "errors": [{"index": <<item index>>, "msg": <<item error>>}, ...], "code": <<code>>}
     '''
 
     try:
@@ -75,7 +341,11 @@ def POST(request: HttpRequest) -> JsonResponse:
             handle_unsupported_method(request)
 
         model_type = fetch_model_type('POST', request.POST)
-        create_or_update_model(model_type, request_params=request.POST)
+
+        if 'bulk' in request.POST:
+            return api_response({'count': bulk_create_models(model_type, request.POST)}, 200)
+
+        run_write(create_or_update_model, model_type, request_params=request.POST)
 
         return api_response(code=200)
 
@@ -104,17 +374,30 @@ def PUT(request: HttpRequest) -> JsonResponse:
                     "fields": {<<field1>>: <<value1>>, <<field3>>: <<value3>>} 
                 }
 
+            PUT Bulk Body Formats (single transaction, nothing is updated if any item is invalid):
+                Filter - Update every model matching the filter with the same fields.
+                    { "model": <<model>>, "bulk": true, "filter": {...}, "fields": {...} }
+
+                Items - Update the single model matching each item's filter with the item's fields.
+                    { "model": <<model>>, "bulk": [{"filter": {...}, "fields": {...}}, ...] }
+
             PUT Response Format:
                 {"code": <<code>>}            
+
+            PUT Bulk Response Format:
+                {"count": <<models updated>>, "code": <<code>>}
+                {"msg": <<error_message>>, "errors": [{"index": <<item index>>, "msg": <<item error>>}, ...], "code": <<code>>}
     '''
 
     try:
         handle_unsupported_method(request)
 
         model_type = fetch_model_type('PUT', request.POST)
-        model = fetch_and_filter_models(model_type, request.POST).get()
 
-        create_or_update_model(model_type, model, request.POST)
+        if 'bulk' in request.POST:
+            return api_response({'count': bulk_update_models(model_type, request.POST)}, 200)
+
+        run_write(update_model, model_type, request.POST)
 
         return api_response(code=200)
 
@@ -138,17 +421,26 @@ def DELETE(request: HttpRequest) -> JsonResponse:
             DELETE Body Format:
                 { "model": <<model>>, "filter": {<<field1>>: <<value1>>, <<field2>>: <<value2>>} }
 
+            DELETE Bulk Body Format (every model matching the filter is deleted in a single transaction,
+            bulk must be true):
+                { "model": <<model>>, "bulk": true, "filter": {<<field1>>: <<value1>>} }
+
             DELETE Response Format:
                 {"code": <<code>>}            
+
+            DELETE Bulk Response Format:
+                {"count": <<models deleted>>, "code": <<code>>}
     '''
 
     try:
         handle_unsupported_method(request)
 
         model_type = fetch_model_type('DELETE', request.POST)
-        model = fetch_and_filter_models(model_type, request.POST).get()
 
-        model.delete()
+        if 'bulk' in request.POST:
+            return api_response({'count': bulk_delete_models(model_type, request.POST)}, 200)
+
+        run_write(delete_model, model_type, request.POST)
 
         return api_response(code=200)
 
@@ -179,3 +471,140 @@ def api(request: HttpRequest) -> JsonResponse:
         return DELETE(request)
 
     return api_error_response('HTTP', API_Error('Invalid method: {}'.format(request.method), 405))
+
+
+def bundle(request: HttpRequest) -> HttpResponse:
+    ''' Called when the /api/bundle/ endpoint is sent an HTTP request. Serves every widget style sheet in
+        a single precompressed payload (see bundles.Widget_Bundle).
+
+        Requests for the current version of the bundle (/api/bundle/?v=<<version>>) can be cached forever,
+        unversioned requests must be revalidated (ETag).
+
+        --> request : The HTTP request sent to the server.
+
+        <-- The bundle (compressed with the smallest encoding the client accepts).
+
+            Bundle Request Format:
+                /api/bundle/?v=<<version>>&format=css
+
+            Bundle Response Format (css):
+                Every widget style sheet, concatenated (linked by the page, see templatetags.widget_bundle)
+    '''
+
+    try:
+        if request.method != 'GET':
+            raise API_Error('Invalid method: {}'.format(request.method), 405)
+
+        current = widget_bundle()
+
+        bundle_format = request.GET.get('format', 'css')
+        if bundle_format not in BUNDLE_FORMATS:
+            raise API_Error('Invalid bundle format: \'{}\' (param: format)'.format(bundle_format), 400)
+
+        etag = '"{}-{}"'.format(current.version, bundle_format)
+        if etag_matches(request, etag):
+            return api_not_modified_response(etag)
+
+        coding, content = current.payloads[bundle_format].encode(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+        response = HttpResponse(content, content_type=BUNDLE_FORMATS[bundle_format])
+        if coding:
+            response['Content-Encoding'] = coding
+
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, max-age=31536000, immutable' if request.GET.get('v') == current.version else 'no-cache'
+
+        return response
+
+    except Exception as exception:
+        return api_error_response('GET', exception)
+
+
+def changes(request: HttpRequest) -> StreamingHttpResponse:
+    ''' Called when the /api/changes/ endpoint is sent an HTTP request. Streams every committed change to
+        the requested models as server-sent events, so clients can apply them instead of refetching.
+
+        --> request : The GET request sent to the server.
+
+        <-- A stream of server-sent events (text/event-stream). The stream ends after API_CHANGE_FEED_DURATION
+            seconds, clients (e.g. EventSource) reconnect with the Last-Event-ID header to resume after the
+            last event they received. At most API_CHANGE_FEED_MAX_STREAMS streams are open at once (503 once
+            they are all taken).
+
+            Change Feed Request Formats:
+                All models - /api/changes/
+                Some models - /api/changes/?model=<<model1>>,<<model2>>
+                Resume - Last-Event-ID: <<id>> header or /api/changes/?last_event_id=<<id>>
+
+            Change Event Format:
+                id: <<id>>
+                event: change
+                data: {"model": <<model>>, "action": "create" || "update" || "delete" || "refresh", "pk": <<pk>>, "data": {<<model fields>>}}
+
+                (data is null for deletes and refreshes, a refresh means any number of models changed and must be refetched)
+
+            Event ids are <<process token>>-<<sequence>>, a stream resuming from an id sent by another worker
+            process (or before a restart) starts with a reset event.
+
+            Reset Event Format (changes were missed, every model must be refetched):
+                id: <<id>>
+                event: reset
+                data: {}
+    '''
+
+    if request.method != 'GET':
+        return api_error_response('HTTP', API_Error('Invalid method: {}'.format(request.method), 405))
+
+    try:
+        model_names = set()
+        if request.GET.get('model'):
+            model_names = {fetch_model_type('GET', {'model': name}).__name__ for name in parse_query_params(request.GET['model'])}
+
+        # An id this process did not send (another worker, a restart) resumes with a reset
+        last_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+        sequence = event_log.parse_id(last_id) if last_id else event_log.sequence
+
+        stream = Change_Stream(model_names, sequence, encode_json, getattr(settings, 'API_CHANGE_FEED_HEARTBEAT', 15.0), getattr(settings, 'API_CHANGE_FEED_DURATION', 300.0))
+
+    except Exception as exception:
+        return api_error_response('GET', exception)
+
+    # Served by the ASGI application, the stream ends as soon as the client disconnects (see asgi.ASGI_Handler)
+    request.META.get('api.disconnect_callbacks', []).append(stream.close)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+def stats(request: HttpRequest) -> JsonResponse:
+    ''' Called when the /api/stats/ endpoint is sent an HTTP request. Exposes the API's
+        internal counters so they can be scraped by monitoring.
+
+        --> request : The HTTP request sent to the server.
+
+        <-- JSON containing the counters of each instrumented component.
+
+            Stats Response Format:
+                {"template_cache": {"hits": <<hits>>, "misses": <<misses>>, ...}, "response_cache": {...}, "code": <<code>>}
+    '''
+
+    if request.method != 'GET':
+        return api_error_response('HTTP', API_Error('Invalid method: {}'.format(request.method), 405))
+
+    return api_response({
+        'template_cache': template_cache.stats(),
+        'response_cache': get_response_cache().stats(),
+        'query_plans': query_plan_cache.stats(),
+        'widget_bundle': widget_bundle().stats(),
+        'model_versions': model_versions.stats(),
+        'snapshots': snapshot_stats(),
+        'write_queue': write_queue_stats(),
+        'change_feed': event_log.stats(),
+        'shared_memory': shared_memory_store().stats() if shared_memory_store() else None,
+        'profiling': stage_histograms.stats(),
+        'logging': async_logging_stats(),
+    }, 200)
@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connections, transaction
+from concurrent.futures import Future
+from .profiling import current_profile, profile_stage, profiling
+import atexit, queue, threading, time
+
+class Write_Queue:
+    ''' Funnels single-model writes (POST/PUT/DELETE) from every request thread into one writer thread,
+        which commits them in small batches (group commit): one transaction, and one acquisition of
+        SQLite's write lock, for up to @max_batch writes arriving within @max_delay seconds of each other.
+
+        Each write runs in its own savepoint, so a write that fails (e.g. validation) is rolled back alone
+        and its error is raised in the request that submitted it. If the batch fails to commit every write
+        in it fails. A write's stages and queries are recorded in the profile of the request that submitted
+        it (see profiling.Profiling_Middleware), as is the time it waited on the queue (write_queue).
+
+        * @max_batch is the maximum number of writes committed together *
+        * @max_delay is the maximum number of seconds the writer waits for a batch to fill *
+    '''
+
+    def __init__(self, max_batch: int = 64, max_delay: float = 0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self.writes = 0
+        self.failures = 0
+        self.batches = 0
+
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_batches, name='api-writer', daemon=True)
+        self._writer.start()
+
+        atexit.register(self.close)
+
+    def submit(self, function, *args, **kwargs):
+        ''' Run a write on the writer thread and wait for its batch to commit.
+
+            --> function : The function writing to the database.
+
+            --> args, kwargs : The arguments to call it with.
+
+            <-- The function's return value (its exception is raised if it or the batch's commit failed).
+        '''
+
+        future = Future()
+
+        # Checked and queued together, so no write is queued after close() stopped the writer
+        with self._submit_lock:
+            stopped = self._stopped.is_set()
+            if not stopped:
+                self._queue.put((future, current_profile(), function, args, kwargs))
+
+        if stopped:
+            return function(*args, **kwargs)
+
+        return self._wait(future)
+
+    @profile_stage('write_queue')
+    def _wait(self, future: Future):
+        return future.result()
+
+    def close(self):
+        ''' Commit every queued write and stop the writer thread. '''
+
+        with self._submit_lock:
+            if self._stopped.is_set():
+                return
+
+            self._stopped.set()
+
+        self._writer.join()
+
+        # Only left over if the writer thread died, their requests must not wait forever
+        while not self._queue.empty():
+            future = self._queue.get_nowait()[0]
+            future.set_exception(RuntimeError('The write queue was closed before the write was committed'))
+
+    def stats(self) -> dict:
+        return {
+            'writes': self.writes,
+            'failures': self.failures,
+            'batches': self.batches,
+            'mean_batch': self.writes / self.batches if self.batches else 0,
+            'pending': self._queue.qsize(),
+        }
+
+    def _write_batches(self):
+        while not (self._stopped.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            try:
+                close_old_connections()
+                self._commit(batch)
+
+            except Exception as exception:
+                for future in (write[0] for write in batch):
+                    if not future.done():
+                        future.set_exception(exception)
+
+        connections.close_all()
+
+    def _commit(self, batch: list):
+        results = []
+
+        try:
+            with transaction.atomic():
+                for future, profile, function, args, kwargs in batch:
+                    try:
+                        # The write's stages and queries are recorded in the profile of the request that queued it
+                        with profiling(profile), transaction.atomic():
+                            results.append((future, function(*args, **kwargs), None))
+
+                    except Exception as exception:
+                        results.append((future, None, exception))
+
+        except Exception as exception:
+            results = [(write[0], None, exception) for write in batch]
+
+        self.batches += 1
+
+        for future, result, exception in results:
+            self.writes += 1
+
+            if exception is not None:
+                self.failures += 1
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue() -> Write_Queue:
+    ''' Fetch the process-wide write queue configured by settings.API_WRITE_QUEUE ({'MAX_BATCH': <<writes>>,
+        'MAX_DELAY': <<seconds>>}), started on first use.
+
+        <-- The write queue or None if writes are not queued.
+    '''
+
+    global _write_queue
+
+    config = getattr(settings, 'API_WRITE_QUEUE', None)
+    if not config:
+        return None
+
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = Write_Queue(config.get('MAX_BATCH', 64), config.get('MAX_DELAY', 0.002))
+
+    return _write_queue
+
+
+def run_write(function, *args, **kwargs):
+    ''' Run a single-model write through the write queue if it is enabled. Writes made inside a
+        transaction run in it directly (the writer thread could not see its uncommitted state).
+
+        --> function : The function writing to the database.
+
+        --> args, kwargs : The arguments to call it with.
+
+        <-- The function's return value.
+    '''
+
+    write_queue = get_write_queue()
+
+    if write_queue is None or transaction.get_connection().in_atomic_block:
+        return function(*args, **kwargs)
+
+    return write_queue.submit(function, *args, **kwargs)
+
+
+def write_queue_stats() -> dict:
+    return _write_queue.stats() if _write_queue is not None else None
+
+
+def _reload_write_queue(setting, **kwargs):
+    global _write_queue
+
+    if setting == 'API_WRITE_QUEUE' and _write_queue is not None:
+        _write_queue.close()
+        _write_queue = None
+
+setting_changed.connect(_reload_write_queue)
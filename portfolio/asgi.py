@@ -0,0 +1,25 @@
+"""
+ASGI config for portfolio project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Every request is served by the WSGI application (and its middleware) on a
+bounded thread pool, the event loop only handles I/O (see api.asgi).
+
+There are no async views: every request holds a pool thread from start to
+finish, so ASGI serves no more requests at once than a threaded WSGI server
+with API_BLOCKING_THREADS threads. It brings no concurrency benefit here.
+
+Run with any ASGI server, e.g. ``uvicorn portfolio.asgi:application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio.settings')
+
+application = get_wsgi_application()
+
+from api.asgi import ASGI_Handler  # noqa: E402 (needs the app registry loaded above)
+
+application = ASGI_Handler(application)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.Profiling_Middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,13 +70,25 @@ WSGI_APPLICATION = 'portfolio.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Writes (and transactions) use the default database, other reads are routed to a pool of read-only
+# connections to the same file. Both are tuned for concurrency by the api.sqlite backend (WAL mode)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'api.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'POOL_SIZE': 1,
+    },
+    'read': {
+        'ENGINE': 'api.sqlite',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'READ_ONLY': True,
+        'POOL_SIZE': 8,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['api.routers.Read_Write_Router']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -113,19 +126,40 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
 
+# Record the filter keys and sort fields of every distinct GET query in logs/queries.log (read by
+# manage.py audit_query_plans). Off by default
+API_LOG_QUERIES = bool(os.environ.get("API_LOG_QUERIES"))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'api.logging_handlers.JSON_Formatter',
+        },
+    },
     'handlers': {
         'console_handler': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/console.log'),
         },
+        # API errors are queued on the request thread and written in batches by a background thread
         'api_handler': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'api.logging_handlers.Async_File_Handler',
             'filename': os.path.join(BASE_DIR, 'logs/api.log'),
+            'formatter': 'json',
+            'queue_size': 10000,
+            'batch_size': 256,
+        },
+        # Every distinct query compiled by the API (filter keys and sort fields only), audited with
+        # manage.py audit_query_plans. Only written when API_LOG_QUERIES is set
+        'queries_handler': {
+            'level': 'DEBUG',
+            'class': 'api.logging_handlers.Async_File_Handler',
+            'filename': os.path.join(BASE_DIR, 'logs/queries.log'),
+            'formatter': 'json',
         },
     },
     'loggers': {
@@ -139,5 +173,99 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'api.queries': {
+            'handlers': ['queries_handler'],
+            'level': 'DEBUG' if API_LOG_QUERIES else 'INFO',
+            'propagate': False,
+        },
     },
-}
\ No newline at end of file
+}
+
+# API
+# Widget templates are cached in memory (LRU) and re-validated against their mtime
+# at most once every API_TEMPLATE_CACHE_CHECK_INTERVAL seconds
+API_TEMPLATE_CACHE_SIZE = 64
+API_TEMPLATE_CACHE_CHECK_INTERVAL = 1.0
+
+# Maximum number of sub-queries accepted by a single batch GET (/api/?batch=[...])
+API_BATCH_MAX_QUERIES = 20
+
+# Rows read from the database (and serialized) per chunk by streamed GETs (/api/?stream=true)
+API_STREAM_CHUNK_SIZE = 2000
+
+# Largest page size accepted by paginated GETs (/api/?limit=<<limit>>)
+API_PAGE_MAX_LIMIT = 1000
+
+# Compiled filter/sort query plans cached in memory (LRU), keyed by the raw query parameters
+API_QUERY_PLAN_CACHE_SIZE = 256
+
+# Memory-mapped file shared by the worker processes on the host (e.g. /dev/shm/portfolio-api). When set,
+# model versions are shared and GET responses are cached in it once for every worker.
+# API_SHARED_MEMORY_SIZE is the number of bytes available to cached responses
+API_SHARED_MEMORY = os.environ.get("API_SHARED_MEMORY")
+API_SHARED_MEMORY_SIZE = 64 * 1024 * 1024
+
+# Worker processes serving the API (WEB_CONCURRENCY, as set for gunicorn/uvicorn). GET responses carry
+# ETags built from model versions (conditional requests get a 304 if nothing changed). Without
+# API_SHARED_MEMORY the versions are kept per process and miss other workers' writes, so with more
+# than one worker no ETags are sent (a worker would answer 304 for data another worker changed)
+API_WORKER_PROCESSES = int(os.environ.get("WEB_CONCURRENCY") or 1)
+
+# GET response cache. Backends: api.cache.Local_Memory_Backend (per process), api.cache.Shared_Memory_Backend
+# (API_SHARED_MEMORY), api.cache.File_Backend (OPTIONS: location) or api.cache.Django_Cache_Backend (OPTIONS: alias).
+# Entries of the per-process backend are not invalidated by other workers' writes, so with more than one
+# worker the shared memory or file backend is used (a per-process backend configured anyway keeps its
+# entries at most API_LOCAL_CACHE_MAX_TIMEOUT seconds, how stale its responses can be)
+API_RESPONSE_CACHE = {
+    'BACKEND': 'api.cache.Shared_Memory_Backend',
+    'TIMEOUT': 300,
+} if API_SHARED_MEMORY else {
+    'BACKEND': 'api.cache.File_Backend',
+    'TIMEOUT': 300,
+} if API_WORKER_PROCESSES > 1 else {
+    'BACKEND': 'api.cache.Local_Memory_Backend',
+    'OPTIONS': {'max_entries': 1024},
+    'TIMEOUT': 300,
+}
+API_LOCAL_CACHE_MAX_TIMEOUT = 5.0
+
+# GET queries of models with API_Model.snapshot set are answered from an in-memory copy of their rows,
+# fully reloaded at least once every API_SNAPSHOT_MAX_AGE seconds (to pick up other processes' writes)
+API_SNAPSHOTS = True
+API_SNAPSHOT_MAX_AGE = 5.0
+
+# JSON encoder of API responses: 'auto' (orjson if installed), 'orjson', 'json' or a dotted path
+API_JSON_ENCODER = 'auto'
+
+# GET responses at least this large are compressed (brotli if installed, otherwise gzip) per Accept-Encoding
+API_COMPRESSION_MIN_BYTES = 1024
+
+# Bulk POST/PUT/DELETE: maximum items per request and rows written per query (bulk POSTs of models
+# inheriting from API_Model are saved one by one, see utilities.bulk_create_models())
+API_BULK_MAX_ITEMS = 5000
+API_BULK_BATCH_SIZE = 500
+
+# Per-request API profiling (Server-Timing headers and histograms at /api/stats/)
+API_PROFILING = bool(os.environ.get("API_PROFILING"))
+API_PROFILING_PREFIX = '/api/'
+
+# Single-model POST/PUT/DELETE writes are committed by one writer thread in batches (group commit) of up to
+# MAX_BATCH writes arriving within MAX_DELAY seconds of each other. None writes on the request thread
+API_WRITE_QUEUE = None
+
+# Change feed (/api/changes/): committed changes kept for clients to resume from (Last-Event-ID), seconds
+# between keep-alive comments and seconds before a stream ends (and the client reconnects)
+API_CHANGE_FEED_MAX_EVENTS = 1000
+API_CHANGE_FEED_HEARTBEAT = 15.0
+API_CHANGE_FEED_DURATION = 300.0
+
+# Change feed streams open at once per process (more are refused with a 503). Each open stream holds a
+# thread while it waits for changes, so this must stay below API_BLOCKING_THREADS (ASGI) or the number
+# of worker threads (WSGI), or open streams starve every other request
+API_CHANGE_FEED_MAX_STREAMS = 4
+
+# Threads the ASGI application (portfolio.asgi) runs database queries and other blocking work on.
+# Bounds the number of concurrent database connections under load. Every request runs on one of these
+# threads (there are no async views), so ASGI handles no more requests at once than a WSGI server
+# with as many threads
+API_BLOCKING_THREADS = 8
@@ -1,11 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
-from api.views import api
+from api.views import api, bundle, changes, stats
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api),
+    path('api/stats/', stats),
+    path('api/bundle/', bundle),
+    path('api/changes/', changes),
 
     path('', TemplateView.as_view(template_name='index.html')),
 ]
@@ -3,6 +3,8 @@
         modules
             Custom Angular modules defined in any script included in the DOM should be
             registered here. This allows any number of modules to be mixed and matched.
+            (Batch_Library answers every widget's api_template and api_models queries from a
+            single batch request, see js/libraries/batching.js).
         
 
         widgets
@@ -16,7 +18,8 @@
 var Fixtures = {
 
     modules: [
-        'Animation_Library'
+        'Animation_Library',
+        'Batch_Library'
     ],
 
     widgets: [ 
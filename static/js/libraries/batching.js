@@ -0,0 +1,88 @@
+// Library answering the widgets' API queries from a single batch request (/api/?batch=[...])
+//
+// Every query declared by the fixtures (each widget's api_template.params and api_models) is sent in
+// one batch GET the first time any of them is requested. The widget loader's own requests for those
+// queries are then answered from the batch result, so a page takes one round trip instead of one per
+// widget and model. Any other request (or every request, if the batch fails) goes to the server as usual.
+angular.module('Batch_Library', [])
+.config(['$provide', function($provide) {
+    $provide.decorator('$httpBackend', ['$delegate', function($httpBackend) {
+        var api_urls = [Fixtures.settings.default_api_url, Fixtures.settings.default_template_url];
+        var queries = [];
+        var batch = null;
+
+        // The key of a query: its model, filter and sort (queries with any other parameter are not batched)
+        var queryKey = (params) => {
+            var names = Object.keys(params).filter((name) => ['model', 'filter', 'sort'].indexOf(name) == -1);
+            return (params.model && !names.length) ? JSON.stringify([params.model, params.filter || '', params.sort || '']) : null;
+        };
+
+        var addQuery = (params) => {
+            var key = queryKey(params);
+            if (key && queries.indexOf(key) == -1)
+                queries.push(key);
+        };
+
+        Fixtures.widgets.forEach((widget) => {
+            if (widget.api_template && widget.api_template.params)
+                addQuery(widget.api_template.params);
+
+            (widget.api_models || []).forEach((api_model) => addQuery(api_model.params || {'model': api_model.model}));
+        });
+
+        var parseParams = (query) => {
+            var params = {};
+            query.split('&').filter((pair) => pair).forEach((pair) => {
+                var parts = pair.split('=');
+                params[decodeURIComponent(parts[0].replace(/\+/g, ' '))] = decodeURIComponent((parts[1] || '').replace(/\+/g, ' '));
+            });
+
+            return params;
+        };
+
+        // Send every declared query in one batch request (once), resolves to the results by sub-query index
+        var fetchBatch = () => {
+            if (!batch) {
+                var payload = queries.map((key) => {
+                    var query = JSON.parse(key);
+                    var params = {'model': query[0]};
+
+                    if (query[1]) params.filter = query[1];
+                    if (query[2]) params.sort = query[2];
+
+                    return params;
+                });
+
+                batch = new Promise((resolve) => {
+                    var url = Fixtures.settings.default_api_url + '?batch=' + encodeURIComponent(JSON.stringify(payload));
+                    $httpBackend('GET', url, null, (status, response) => {
+                        try {
+                            resolve(status == 200 ? JSON.parse(response).batch : null);
+                        } catch (error) {
+                            resolve(null);
+                        }
+                    }, {'Accept': 'application/json'});
+                });
+            }
+
+            return batch;
+        };
+
+        return function(method, url, post, callback, headers, timeout, withCredentials, responseType, eventHandlers, uploadEventHandlers) {
+            var send = () => $httpBackend.apply(null, arguments);
+            var parts = url.split('?');
+            var key = (method == 'GET' && api_urls.indexOf(parts[0]) != -1) ? queryKey(parseParams(parts[1] || '')) : null;
+
+            if (!key || queries.indexOf(key) == -1)
+                return send();
+
+            fetchBatch().then((results) => {
+                var result = results && results[queries.indexOf(key)];
+                if (!result)
+                    return send();
+
+                callback(result.code, JSON.stringify(result), 'Content-Type: application/json', '', 'complete');
+            });
+        };
+    }]);
+}]);